@@ -0,0 +1,156 @@
+"""Память при переключении каналов и защита исходника от изменений.
+
+Запуск без графического интерфейса:
+
+    python benchmarks/bench_buffers.py --size 6000x4000
+    python benchmarks/bench_buffers.py --size 1920x1080 --max-channel-frames 1.1 -o buffers.json
+
+Пиковый прирост памяти (tracemalloc) при выборе канала сравнивается с прежней
+реализацией через cv2.split/np.zeros_like/cv2.merge и выражается в кадрах
+(peak_frames = пик / размер кадра). Проверки изменяемости пытаются записать
+в исходник, срезы обрезки, результаты стадий и вывод процессора; любая успешная
+запись или изменение исходника — ошибка (код возврата 1).
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "image_editor"))
+
+from editor.image_processor import ImageProcessor, isolate_channel, CHANNELS  # noqa: E402
+from bench_operations import metadata, synthetic_image  # noqa: E402
+
+SWITCHES = ("Красный", "Зеленый", "Синий", "Оригинал", "Синий")
+
+
+def legacy_isolate_channel(image, channel):
+    """Прежний выбор канала: три плоскости, пустая плоскость и сборка кадра"""
+    channels = cv2.split(image)
+    blank = np.zeros_like(channels[0])
+    planes = {"Красный": [blank, blank, channels[2]], "Зеленый": [blank, channels[1], blank],
+              "Синий": [channels[0], blank, blank]}
+    return cv2.merge(planes[channel])
+
+
+def peak_bytes(call):
+    """Пиковый прирост памяти за вызов (результат вызова освобождается после замера)"""
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - start
+
+
+def channel_memory(image):
+    """Пик памяти выбора канала: отдельная операция (прежняя и новая) и переключения в процессоре.
+       При переключении в пике живут прежний результат и новый — 2 кадра"""
+    results = {
+        "legacy_isolate": peak_bytes(lambda: legacy_isolate_channel(image, "Красный")),
+        "isolate_channel": peak_bytes(lambda: isolate_channel(image, "Красный")),
+    }
+    processor = ImageProcessor(cache_budget=0)
+    processor.set_image(image)
+
+    def switch():
+        for channel in SWITCHES:
+            processor.show_channel(channel)
+
+    results["processor_switches"] = peak_bytes(switch)
+    for name, value in results.items():
+        print(f"{name:20s} {value / (1024 * 1024):9.1f} МБ  {value / image.nbytes:5.2f} кадр.")
+    return {name: value / image.nbytes for name, value in results.items()}
+
+
+def _rejects_write(array):
+    try:
+        array[(0,) * array.ndim] = 0
+    except ValueError:
+        return True
+    return False
+
+
+def mutation_checks(image):
+    """Список (проверка, пройдена)"""
+    snapshot = image.copy()
+    h, w = image.shape[:2]
+    processor = ImageProcessor()
+    processor.set_image(image)
+    checks = [("set_image копирует изменяемый массив", not np.shares_memory(processor.original_image, image))]
+
+    image[:16] = 255 - image[:16]
+    checks.append(("изменение массива вызывающим не попадает в документ",
+                   np.array_equal(processor.original_image, snapshot)))
+    image[:16] = snapshot[:16]
+
+    processor.apply_crop(w // 4, h // 4, 3 * w // 4, 3 * h // 4)
+    crop = processor.image
+    checks.append(("обрезка — срез исходника без копии", np.shares_memory(crop, processor.original_image)))
+    checks.append(("срез обрезки только для чтения", _rejects_write(crop)))
+    checks.append(("исходник только для чтения", _rejects_write(processor.original_image)))
+
+    processor.show_channel(CHANNELS[1])
+    processor.apply_rotation(15)
+    processor.apply_filter("gaussian_blur", 2.0)
+    cache = processor.pipeline.cache
+    checks.append(("результаты стадий в кэше только для чтения",
+                   all(_rejects_write(cache.get(key)) for key in cache.keys())))
+    checks.append(("вывод без аннотаций только для чтения", _rejects_write(processor.output())))
+    processor.draw_circle(10, 10, 5)
+    checks.append(("вывод с аннотациями только для чтения", _rejects_write(processor.output())))
+
+    # Смена источника сжимает ключевой кадр; после отмены исходник распаковывается заново
+    processor.set_image(np.zeros_like(image), copy=False)
+    processor.undo()
+    checks.append(("исходник после отмены только для чтения", _rejects_write(processor.original_image)))
+
+    processor.reset_image()
+    checks.append(("сброс возвращает исходник без копии", processor.image is processor.original_image))
+    checks.append(("исходник не изменился после всех операций", np.array_equal(processor.original_image, snapshot)))
+    checks.append(("массив вызывающего не изменился", np.array_equal(image, snapshot)))
+
+    for name, passed in checks:
+        print(f"{'OK  ' if passed else 'FAIL'} {name}")
+    return checks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Память при выборе канала и защита исходника от изменений")
+    parser.add_argument("--size", default="6000x4000", help="размер изображения ШxВ")
+    parser.add_argument("--max-channel-frames", type=float, default=1.1,
+                        help="вернуть код 1, если пик выбора канала больше стольких кадров")
+    parser.add_argument("-o", "--output", default=None, help="файл JSON с результатами")
+    args = parser.parse_args(argv)
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    image = synthetic_image(width, height, 3)
+    print(f"Изображение {width}x{height}x3, кадр {image.nbytes / (1024 * 1024):.1f} МБ")
+
+    frames = channel_memory(image)
+    checks = mutation_checks(image)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": metadata(), "image": [width, height, 3], "peak_frames": frames,
+                       "checks": {name: passed for name, passed in checks}}, f, ensure_ascii=False, indent=2)
+
+    status = 0
+    if frames["isolate_channel"] > args.max_channel_frames:
+        print(f"Пик выбора канала {frames['isolate_channel']:.2f} кадр. выше порога {args.max_channel_frames:.2f}",
+              file=sys.stderr)
+        status = 1
+    if not all(passed for _, passed in checks):
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
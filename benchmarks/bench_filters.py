@@ -0,0 +1,132 @@
+"""Масштабирование фильтров по числу потоков.
+
+Запуск без графического интерфейса:
+
+    python benchmarks/bench_filters.py --mp 40 --workers 1 2 4 8 --output filters.json
+    python benchmarks/bench_filters.py --mp 12 --min-efficiency 0.7
+
+Для каждого фильтра и числа потоков записываются время (минимум и медиана),
+ускорение относительно одного потока и эффективность (ускорение / потоки).
+Результат каждого запуска сравнивается с однопоточным побитно; расхождение — ошибка.
+Встроенная многопоточность OpenCV по умолчанию отключается (--opencv-threads),
+чтобы замерялось масштабирование самого движка полос, а не вложенных пулов.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "image_editor"))
+
+from editor import filters  # noqa: E402
+from bench_operations import metadata, synthetic_image  # noqa: E402
+
+MIN_TOTAL_SECONDS = 1.0
+MAX_REPEATS = 10
+
+FILTERS = {
+    "gaussian_blur": lambda image, workers: filters.gaussian_blur(image, 3.0, workers),
+    "box_blur": lambda image, workers: filters.box_blur(image, 5, workers),
+    "unsharp_mask": lambda image, workers: filters.unsharp_mask(image, 1.5, 1.0, workers),
+    "sobel_edges": lambda image, workers: filters.sobel_edges(image, workers),
+    "adjust_colors": lambda image, workers: filters.adjust_colors(image, 10, 1.2, 0.8, workers),
+}
+
+
+def measure(func, image, workers):
+    times = []
+    started = time.perf_counter()
+    while len(times) < MAX_REPEATS:
+        t0 = time.perf_counter()
+        result = func(image, workers)
+        times.append(time.perf_counter() - t0)
+        if time.perf_counter() - started >= MIN_TOTAL_SECONDS and len(times) >= 3:
+            break
+    return times, result
+
+
+def run(image, worker_counts, only=None, log=sys.stdout):
+    results = []
+    mismatches = []
+    for name, func in FILTERS.items():
+        if only and name not in only:
+            continue
+        reference = None
+        base_time = None
+        for workers in worker_counts:
+            times, output = measure(func, image, workers)
+            median = statistics.median(times)
+            if reference is None:
+                reference, base_time = output, median
+            elif not np.array_equal(reference, output):
+                mismatches.append((name, workers))
+            speedup = base_time / median
+            result = {
+                "filter": name,
+                "workers": workers,
+                "repeats": len(times),
+                "time_min_ms": min(times) * 1000,
+                "time_median_ms": median * 1000,
+                "speedup": speedup,
+                "efficiency": speedup / workers * worker_counts[0],
+            }
+            results.append(result)
+            print(f"{name:14s} {workers:3d} потоков  {result['time_median_ms']:9.2f} мс  "
+                  f"x{speedup:5.2f}  эффективность {result['efficiency']:.0%}", file=log)
+        del reference
+    return results, mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Масштабирование фильтров по числу потоков")
+    parser.add_argument("--mp", type=float, default=40.0, help="размер изображения, мегапикселей")
+    parser.add_argument("--channels", type=int, choices=(1, 3), default=3)
+    parser.add_argument("--workers", nargs="+", type=int, default=None,
+                        help="числа потоков (по умолчанию 1, 2, 4, ... до числа ядер)")
+    parser.add_argument("--filters", nargs="+", choices=list(FILTERS), default=None)
+    parser.add_argument("--opencv-threads", type=int, default=1,
+                        help="потоков у самого OpenCV (0 — оставить как есть)")
+    parser.add_argument("--min-efficiency", type=float, default=None,
+                        help="вернуть код 1, если эффективность на максимуме потоков ниже порога")
+    parser.add_argument("-o", "--output", default=None, help="файл JSON с результатами")
+    args = parser.parse_args(argv)
+
+    if args.opencv_threads:
+        cv2.setNumThreads(args.opencv_threads)
+    worker_counts = args.workers
+    if worker_counts is None:
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= filters.default_workers():
+            worker_counts.append(worker_counts[-1] * 2)
+
+    # Соотношение сторон 4:3
+    width = int(round((args.mp * 1e6 * 4 / 3) ** 0.5))
+    image = synthetic_image(width, width * 3 // 4, args.channels)
+    print(f"Изображение {image.shape[1]}x{image.shape[0]}x{args.channels}, ядер: {os.cpu_count()}")
+    results, mismatches = run(image, worker_counts, args.filters)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": metadata(), "results": results}, f, ensure_ascii=False, indent=2)
+
+    status = 0
+    for name, workers in mismatches:
+        print(f"РАСХОЖДЕНИЕ {name}: результат с {workers} потоками отличается от однопоточного", file=sys.stderr)
+        status = 1
+    if args.min_efficiency is not None:
+        top = max(worker_counts)
+        for result in results:
+            if result["workers"] == top and result["efficiency"] < args.min_efficiency:
+                print(f"СЛАБОЕ МАСШТАБИРОВАНИЕ {result['filter']}: {result['efficiency']:.0%} "
+                      f"на {top} потоках", file=sys.stderr)
+                status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Сверка объединенной геометрии (один warpAffine) с последовательным выполнением стадий.
+
+Запуск без графического интерфейса:
+
+    python benchmarks/bench_geometry.py
+    python benchmarks/bench_geometry.py --chains 1000 --size 640x480 --seed 3 -o geometry.json
+
+Для случайных цепочек обрезки/поворота/масштаба/отражения на гладких изображениях
+сравниваются geometry.warp_stages и поочередный вызов операций ImageProcessor.
+Допуск (код возврата 1 при нарушении): вне полосы EDGE_BAND пикселей вдоль краев
+повернутых кадров не больше INTERIOR_FRACTION пикселей отличаются больше чем на LEVELS
+уровней. В самой полосе отличия не ограничиваются: последовательная цепочка смешивает
+край с черным на каждой стадии, а объединенная — один раз. Доля отличий во всем кадре
+и максимальное отличие вне полосы выводятся для сведения.
+"""
+import argparse
+import json
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "image_editor"))
+
+from editor.geometry import warp_stages  # noqa: E402
+from editor.image_processor import OPERATIONS  # noqa: E402
+from editor.pipeline import Stage  # noqa: E402
+from bench_operations import metadata  # noqa: E402
+
+LEVELS = 2
+INTERIOR_FRACTION = 0.005
+EDGE_BAND = 2
+SCALES = (0.5, 0.75, 1.3, 2.0)
+
+
+def smooth_image(width, height, seed):
+    """Гладкое цветное изображение: случайная сетка, увеличенная бикубически"""
+    rng = np.random.RandomState(seed)
+    grid = rng.randint(0, 256, (max(2, height // 40), max(2, width // 40), 3)).astype(np.uint8)
+    return cv2.resize(grid, (width, height), interpolation=cv2.INTER_CUBIC)
+
+
+def random_chain(rng, width, height):
+    stages = []
+    for _ in range(rng.randint(2, 5)):
+        kind = rng.choice(["crop", "rotation", "scale", "flip"])
+        if kind == "crop":
+            x1, y1 = rng.randint(0, width // 3 + 1), rng.randint(0, height // 3 + 1)
+            x2 = rng.randint(x1 + min(10, width - x1), width + 1)
+            y2 = rng.randint(y1 + min(10, height - y1), height + 1)
+            stages.append(Stage("crop", (x1, y1, x2, y2)))
+            width, height = x2 - x1, y2 - y1
+        elif kind == "rotation":
+            stages.append(Stage("rotation", (float(rng.uniform(-180, 180)),)))
+        elif kind == "scale":
+            factor = float(rng.choice(SCALES))
+            stages.append(Stage("scale", (factor,)))
+            width, height = max(1, round(width * factor)), max(1, round(height * factor))
+        else:
+            stages.append(Stage("flip", (int(rng.randint(0, 2)), int(rng.randint(0, 2)))))
+    return stages
+
+
+def sequential(image, stages):
+    for stage in stages:
+        image = OPERATIONS[stage.name](image, *stage.params)
+    return image
+
+
+def edge_band(image, stages):
+    """Пиксели у краев повернутых кадров: там, где последовательная цепочка
+       из белого кадра дает промежуточные значения, плюс EDGE_BAND вокруг"""
+    coverage = sequential(np.full(image.shape[:2], 255, dtype=np.uint8), stages)
+    edge = ((coverage > 0) & (coverage < 255)).astype(np.uint8)
+    size = 2 * EDGE_BAND + 1
+    return cv2.dilate(edge, np.ones((size, size), np.uint8)) > 0
+
+
+def check_chain(image, stages):
+    """(доля отличий во всем кадре, доля вне полосы краев, максимум вне полосы) или None,
+       если цепочка недопустима для этого кадра"""
+    try:
+        expected = sequential(image, stages)
+    except ValueError:
+        return None
+    diff = np.abs(warp_stages(image, stages).astype(np.int16) - expected.astype(np.int16)).max(axis=2)
+    interior = diff[~edge_band(image, stages)]
+    return (float((diff > LEVELS).mean()),
+            float((interior > LEVELS).mean()) if interior.size else 0.0,
+            int(interior.max()) if interior.size else 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сверка объединенной геометрии с последовательной")
+    parser.add_argument("--chains", type=int, default=300, help="число случайных цепочек")
+    parser.add_argument("--size", default="640x480", help="размер изображения ШxВ")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-o", "--output", default=None, help="файл JSON с результатами")
+    args = parser.parse_args(argv)
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    rng = np.random.RandomState(args.seed)
+    results = []
+    failures = []
+    for i in range(args.chains):
+        stages = random_chain(rng, width, height)
+        checked = check_chain(smooth_image(width, height, args.seed * 100003 + i), stages)
+        if checked is None:
+            continue
+        whole, interior, interior_max = checked
+        results.append({"stages": [[s.name, list(s.params)] for s in stages], "whole": whole,
+                        "interior": interior, "interior_max": interior_max})
+        if interior > INTERIOR_FRACTION:
+            failures.append(results[-1])
+
+    print(f"Цепочек: {len(results)}, размер {width}x{height}")
+    print(f"Отличие > {LEVELS} ур.: вне краев до {max(r['interior'] for r in results):.3%} "
+          f"(допуск {INTERIOR_FRACTION:.1%}), во всем кадре до {max(r['whole'] for r in results):.2%}; "
+          f"максимум вне краев {max(r['interior_max'] for r in results)}")
+    for failure in failures:
+        print(f"НАРУШЕНИЕ: {failure}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": metadata(), "image": [width, height], "results": results},
+                      f, ensure_ascii=False, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""Бенчмарки операций ImageProcessor и подготовки изображения к показу.
+
+Запуск без графического интерфейса:
+
+    python benchmarks/bench_operations.py --max-mp 24 --output results.json
+    python benchmarks/bench_operations.py --baseline benchmarks/baseline.json --threshold 0.2
+    python benchmarks/bench_operations.py --save-baseline benchmarks/baseline.json
+
+Для каждой операции записываются время (минимум и медиана), пиковый прирост
+памяти по tracemalloc и число полноразмерных буферов, живых в пике
+(peak_frames = пик / размер кадра) — мера лишних выделений памяти, а также
+число блоков памяти, выделенных вызовом и живых после него (allocations:
+разница снимков tracemalloc до и после вызова, пока результат еще не освобожден).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "image_editor"))
+
+from editor.image_processor import ImageProcessor  # noqa: E402
+from editor.render import ViewRenderer  # noqa: E402
+
+SIZES = {
+    "vga": (640, 480),
+    "hd": (1280, 720),
+    "fhd": (1920, 1080),
+    "12mp": (4000, 3000),
+    "24mp": (6000, 4000),
+    "50mp": (8192, 6144),
+    "100mp": (11552, 8672),
+}
+
+CANVAS_SIZE = (1280, 800)
+MIN_TOTAL_SECONDS = 0.5
+MAX_REPEATS = 20
+# Число меток для замера пакетной отрисовки аннотаций
+MARKERS = 1000
+
+
+def synthetic_image(width, height, channels, seed=0):
+    """Градиент с небольшим шумом: сжимается как фотография, а не как белый шум"""
+    rng = np.random.RandomState(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = (x * 0.6 + y * 0.4).astype(np.uint8)
+    if channels == 1:
+        planes = [base]
+    else:
+        planes = [base, np.ascontiguousarray(base[::-1]), np.ascontiguousarray(base[:, ::-1])]
+    image = np.dstack(planes) if channels > 1 else base
+    noise = rng.randint(0, 8, size=(height, 1) + image.shape[2:], dtype=np.uint8)
+    return cv2.add(image, np.broadcast_to(noise, image.shape).copy())
+
+
+def make_operations(image, workdir):
+    """Операции для замера: имя -> (подготовка, замеряемый вызов)"""
+    h, w = image.shape[:2]
+    color = image.ndim == 3
+    png_path = os.path.join(workdir, "input.png")
+    cv2.imwrite(png_path, image)
+
+    def fresh():
+        processor = ImageProcessor(cache_budget=0)
+        processor.set_image(image)
+        return processor
+
+    rng = np.random.default_rng(0)
+    markers = np.stack([rng.integers(0, w, MARKERS), rng.integers(0, h, MARKERS), np.full(MARKERS, 5)], axis=1)
+
+    def annotated():
+        processor = fresh()
+        processor.add_annotations("circle", markers)
+        return processor
+
+    def red_channel():
+        processor = fresh()
+        processor.show_channel("Красный")
+        return processor
+
+    ops = {
+        "load_image": (lambda: ImageProcessor(cache_budget=0), lambda p: p.load_image(png_path)),
+        "save_image_jpg": (fresh, lambda p: p.save_image(os.path.join(workdir, "out.jpg"))),
+        "save_image_png": (fresh, lambda p: p.save_image(os.path.join(workdir, "out.png"))),
+        "apply_rotation": (fresh, lambda p: p.apply_rotation(17)),
+        "apply_crop": (fresh, lambda p: p.apply_crop(w // 4, h // 4, 3 * w // 4, 3 * h // 4)),
+        "draw_circle": (fresh, lambda p: p.draw_circle(w // 2, h // 2, min(w, h) // 4)),
+        "draw_markers": (fresh, lambda p: p.add_annotations("circle", markers)),
+        "add_annotation": (annotated, lambda p: p.add_annotation("rect", (w // 4, h // 4, w // 4 + 50, h // 4 + 50))),
+        "display_image": (ViewRenderer, lambda r: r.render(image, *CANVAS_SIZE)),
+    }
+    if color:
+        ops["show_channel"] = (fresh, lambda p: p.show_channel("Красный"))
+        ops["switch_channel"] = (red_channel, lambda p: p.show_channel("Зеленый"))
+    return ops
+
+
+def measure_time(setup, call):
+    times = []
+    started = time.perf_counter()
+    while len(times) < MAX_REPEATS:
+        target = setup()
+        t0 = time.perf_counter()
+        call(target)
+        times.append(time.perf_counter() - t0)
+        if time.perf_counter() - started >= MIN_TOTAL_SECONDS and len(times) >= 3:
+            break
+    return times
+
+
+def _snapshot():
+    # Собственные выделения tracemalloc (в том числе предыдущий снимок) не считаются
+    return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+
+def measure_memory(setup, call):
+    """(пиковый прирост памяти в байтах, число выделенных и живых после вызова блоков)"""
+    target = setup()
+    tracemalloc.start()
+    try:
+        before = _snapshot()
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = call(target)
+        _, peak = tracemalloc.get_traced_memory()
+        after = _snapshot()
+    finally:
+        tracemalloc.stop()
+    del result
+    allocations = sum(max(0, stat.count_diff) for stat in after.compare_to(before, "lineno"))
+    return peak - start, allocations
+
+
+def run(sizes, channel_layouts, only=None, log=sys.stdout):
+    results = []
+    with tempfile.TemporaryDirectory(prefix="image-editor-bench-") as workdir:
+        for size_name in sizes:
+            width, height = SIZES[size_name]
+            for channels in channel_layouts:
+                image = synthetic_image(width, height, channels)
+                for op, (setup, call) in make_operations(image, workdir).items():
+                    if only and op not in only:
+                        continue
+                    times = measure_time(setup, call)
+                    peak, allocations = measure_memory(setup, call)
+                    result = {
+                        "op": op,
+                        "size": size_name,
+                        "channels": channels,
+                        "width": width,
+                        "height": height,
+                        "repeats": len(times),
+                        "time_min_ms": min(times) * 1000,
+                        "time_median_ms": statistics.median(times) * 1000,
+                        "peak_mb": peak / (1024 * 1024),
+                        "peak_frames": peak / image.nbytes,
+                        "allocations": allocations,
+                    }
+                    results.append(result)
+                    print(f"{op:16s} {size_name:>6s} x{channels}  "
+                          f"{result['time_median_ms']:9.2f} мс  {result['peak_mb']:8.1f} МБ  "
+                          f"{result['peak_frames']:5.2f} кадр.  {allocations:6d} блок.", file=log)
+                del image
+    return results
+
+
+def metadata():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def result_key(result):
+    return result["op"], result["size"], result["channels"]
+
+
+def compare(results, baseline, threshold, metrics=("time_median_ms", "peak_mb")):
+    """Список регрессий: значение выросло больше чем на threshold относительно базы"""
+    reference = {result_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        base = reference.get(result_key(result))
+        if base is None:
+            continue
+        for metric in metrics:
+            old, new = base.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            # Пик памяти в пределах мегабайта — шум, а не регрессия
+            if metric == "peak_mb" and new - old < 1.0:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append((result_key(result), metric, old, new))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки операций редактора изображений")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=None,
+                        help="размеры изображений (по умолчанию — все до --max-mp)")
+    parser.add_argument("--max-mp", type=float, default=100.0, help="максимальный размер, мегапикселей")
+    parser.add_argument("--channels", nargs="+", type=int, choices=(1, 3), default=[1, 3])
+    parser.add_argument("--ops", nargs="+", default=None, help="замерять только указанные операции")
+    parser.add_argument("-o", "--output", default=None, help="файл JSON с результатами")
+    parser.add_argument("--baseline", default=None, help="файл JSON с базовыми результатами для сравнения")
+    parser.add_argument("--save-baseline", default=None, help="сохранить результаты как новую базу")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="допустимый относительный рост времени/памяти (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or [name for name, (w, h) in SIZES.items() if w * h <= args.max_mp * 1e6 * 1.01]
+    results = run(sizes, args.channels, args.ops)
+    report = {"meta": metadata(), "results": results}
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for (op, size, channels), metric, old, new in regressions:
+            print(f"РЕГРЕССИЯ {op} {size} x{channels}: {metric} {old:.2f} -> {new:.2f}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"Регрессий нет (порог {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""Нагрузочный тест локального сервиса (image-editor serve).
+
+Запуск:
+
+    python benchmarks/bench_service.py --clients 8 --requests 400 --size 1920x1080
+    python benchmarks/bench_service.py --recipe "crop:0,0,800,600;rotate:15" --compare-pickle
+    python benchmarks/bench_service.py --address /tmp/image-editor.sock --max-p99-ms 50
+
+Без --address сервис запускается в отдельном процессе на время теста.
+Клиенты — потоки, у каждого свое соединение; запросы распределяются по рецептам
+(последовательностям операций в формате batch --op через ';') по кругу.
+Записываются задержки (p50, p90, p99, максимум), пропускная способность
+и то, как сервис сгруппировал запросы. --compare-pickle повторяет ту же нагрузку
+через ProcessPoolExecutor, где кадры передаются сериализацией (pickle).
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "image_editor"))
+
+from editor.batch import parse_operation  # noqa: E402
+from editor.image_processor import ImageProcessor  # noqa: E402
+from editor.service import ServiceClient, parse_address  # noqa: E402
+from bench_operations import metadata, synthetic_image  # noqa: E402
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "image_editor")
+DEFAULT_RECIPES = ["rotate:15", "crop:100,100,1100,700", "channel:red"]
+START_TIMEOUT = 30.0
+
+
+def percentile(sorted_values, q):
+    """Процентиль по ближайшему рангу"""
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def start_server(address, workers):
+    """Запускает сервис в отдельном процессе и ждет, пока он начнет принимать соединения"""
+    command = [sys.executable, "-c", "import sys; from editor.cli import main; sys.exit(main(sys.argv[1:]))",
+               "serve", "--address", address]
+    if workers:
+        command += ["-j", str(workers)]
+    proc = subprocess.Popen(command, cwd=PACKAGE_DIR, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + START_TIMEOUT
+    while True:
+        try:
+            ServiceClient(parse_address(address)).close()
+            return proc
+        except OSError:
+            if proc.poll() is not None or time.monotonic() > deadline:
+                proc.kill()
+                raise RuntimeError("Сервис не запустился")
+            time.sleep(0.05)
+
+
+def _pickled_request(image, operations):
+    """Та же обработка в процессе пула: кадр и результат передаются через pickle"""
+    processor = ImageProcessor(cache_budget=0, history_budget=0)
+    processor.set_image(image, copy=False)
+    for method, args in map(parse_operation, operations):
+        getattr(processor, method)(*args)
+    return processor.output()
+
+
+class PickledClient:
+    """Клиент с тем же интерфейсом, что у ServiceClient, поверх пула процессов"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def process(self, image, operations):
+        return self.pool.submit(_pickled_request, image, operations).result()
+
+    def close(self):
+        pass
+
+
+def run_load(connect, image, recipes, clients, total):
+    """Запускает total запросов из clients потоков (у каждого свой клиент connect());
+       возвращает задержки (с), ошибки и общее время"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def client_loop(index):
+        client = connect()
+        try:
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                recipe = recipes[(i + index) % len(recipes)]
+                t0 = time.perf_counter()
+                try:
+                    client.process(image, recipe)
+                except Exception as e:
+                    with lock:
+                        errors.append(str(e))
+                    continue
+                elapsed = time.perf_counter() - t0
+                with lock:
+                    latencies.append(elapsed)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def summarize(name, latencies, errors, wall, image):
+    ordered = sorted(latencies)
+    result = {
+        "mode": name,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": wall,
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "throughput_mb_s": len(latencies) * image.nbytes / wall / 1e6 if wall else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p90_ms": percentile(ordered, 0.90) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000 if ordered else float("nan"),
+    }
+    print(f"{name:8s} {result['requests']:6d} запросов  {result['throughput_rps']:8.1f} запр/с  "
+          f"{result['throughput_mb_s']:8.1f} МБ/с  p50 {result['p50_ms']:7.2f}  p90 {result['p90_ms']:7.2f}  "
+          f"p99 {result['p99_ms']:7.2f}  max {result['max_ms']:7.2f} мс  ошибок {result['errors']}")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест локального сервиса")
+    parser.add_argument("--address", default=None,
+                        help="адрес запущенного сервиса (по умолчанию сервис запускается на время теста)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="потоков у запускаемого сервиса")
+    parser.add_argument("--clients", type=int, default=8, help="число одновременных клиентов")
+    parser.add_argument("--requests", type=int, default=400, help="всего запросов")
+    parser.add_argument("--size", default="1920x1080", help="размер изображения ШxВ")
+    parser.add_argument("--channels", type=int, choices=(1, 3), default=3)
+    parser.add_argument("--recipe", dest="recipes", action="append", default=None,
+                        help="операции одного запроса через ';' (можно повторять)")
+    parser.add_argument("--compare-pickle", action="store_true",
+                        help="повторить нагрузку через ProcessPoolExecutor (передача кадров через pickle)")
+    parser.add_argument("--max-p99-ms", type=float, default=None,
+                        help="вернуть код 1, если p99 сервиса выше порога")
+    parser.add_argument("-o", "--output", default=None, help="файл JSON с результатами")
+    args = parser.parse_args(argv)
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    image = synthetic_image(width, height, args.channels)
+    recipes = [[op.strip() for op in recipe.split(";") if op.strip()] for recipe in args.recipes or DEFAULT_RECIPES]
+    print(f"Изображение {width}x{height}x{args.channels}, клиентов: {args.clients}, рецептов: {len(recipes)}")
+
+    server = None
+    address = args.address
+    if address is None:
+        address = os.path.join(tempfile.mkdtemp(prefix="image-editor-bench-"), "service.sock")
+        server = start_server(address, args.workers)
+
+    results = []
+    try:
+        latencies, errors, wall = run_load(lambda: ServiceClient(parse_address(address)), image, recipes,
+                                           args.clients, args.requests)
+        service_result = summarize("service", latencies, errors, wall, image)
+        with ServiceClient(parse_address(address)) as client:
+            stats = client.stats()
+        service_result["server"] = stats
+        print(f"Сервис: групп {stats['groups']} на {stats['requests']} запросов "
+              f"(в среднем {stats['requests'] / max(stats['groups'], 1):.2f}, наибольшая {stats['largest_group']}), "
+              f"потоков {stats['workers']}")
+        results.append(service_result)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            os.rmdir(os.path.dirname(address))
+
+    if args.compare_pickle:
+        with ProcessPoolExecutor(max_workers=args.workers or os.cpu_count()) as pool:
+            latencies, pickled_errors, wall = run_load(lambda: PickledClient(pool), image, recipes, args.clients, args.requests)
+        results.append(summarize("pickle", latencies, pickled_errors, wall, image))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": metadata(), "image": [width, height, args.channels], "recipes": recipes,
+                       "clients": args.clients, "results": results}, f, ensure_ascii=False, indent=2)
+
+    status = 0
+    for message in sorted(set(errors)):
+        print(f"ОШИБКА: {message}", file=sys.stderr)
+        status = 1
+    if args.max_p99_ms is not None and service_result["p99_ms"] > args.max_p99_ms:
+        print(f"p99 {service_result['p99_ms']:.2f} мс выше порога {args.max_p99_ms:.2f} мс", file=sys.stderr)
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
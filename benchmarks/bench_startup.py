@@ -0,0 +1,169 @@
+"""Время запуска: импорт ядра, импорт точки входа и появление первого окна.
+
+Запуск:
+
+    python benchmarks/bench_startup.py --save-baseline benchmarks/startup.json
+    python benchmarks/bench_startup.py --baseline benchmarks/startup.json --threshold 0.25
+
+Каждый замер выполняется в свежем интерпретаторе (медиана из --repeats запусков):
+- import_core_ms — импорт editor.core (ядро без интерфейса);
+  заодно проверяется, что при этом не загружены tkinter и PIL
+- import_cli_ms — импорт точки входа editor.cli
+- import_app_ms — импорт модуля окна editor.app
+- first_window_ms — от запуска процесса до первого показа главного окна
+- core_ready_ms — от запуска процесса до готовности ядра обработки в окне
+Замеры окна пропускаются, если нет дисплея.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "image_editor")
+
+# Модули, которых не должно быть после импорта ядра
+GUI_MODULES = ("tkinter", "PIL")
+# Разница меньше этого — шум запуска процесса, а не регрессия
+NOISE_MS = 5.0
+
+IMPORT_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"ms": elapsed * 1000, "modules": [m for m in {gui!r} if m in sys.modules]}}))
+"""
+
+WINDOW_SCRIPT = """
+import json, sys, time
+spawned = float(sys.argv[1])
+from editor.app import ImageEditorApp
+
+app = ImageEditorApp()
+marks = {}
+
+def on_map(event):
+    if event.widget is app.root and "first_window_ms" not in marks:
+        marks["first_window_ms"] = (time.time() - spawned) * 1000
+
+def poll():
+    if app.image_processor is not None and "first_window_ms" in marks:
+        marks["core_ready_ms"] = (time.time() - spawned) * 1000
+        app.root.destroy()
+        return
+    app.root.after(1, poll)
+
+app.root.bind("<Map>", on_map, add="+")
+poll()
+app.run()
+print(json.dumps(marks))
+"""
+
+
+def run_child(script, *args):
+    """Запускает скрипт в новом интерпретаторе и возвращает последнюю строку вывода как JSON"""
+    proc = subprocess.run([sys.executable, "-c", script, *args], cwd=PACKAGE_DIR,
+                          capture_output=True, text=True, timeout=120)
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"код возврата {proc.returncode}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def measure_import(module, repeats):
+    times = []
+    modules = set()
+    for _ in range(repeats):
+        result = run_child(IMPORT_SCRIPT.format(module=module, gui=GUI_MODULES))
+        times.append(result["ms"])
+        modules.update(result["modules"])
+    return statistics.median(times), sorted(modules)
+
+
+def measure_window(repeats):
+    marks = {"first_window_ms": [], "core_ready_ms": []}
+    for _ in range(repeats):
+        result = run_child(WINDOW_SCRIPT, repr(time.time()))
+        for key in marks:
+            marks[key].append(result[key])
+    return {key: statistics.median(values) for key, values in marks.items()}
+
+
+def metadata():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Список регрессий: время выросло больше чем на threshold (и больше шума) относительно базы"""
+    regressions = []
+    for metric, new in results.items():
+        old = baseline.get("results", {}).get(metric)
+        if old is None:
+            continue
+        if new > old * (1 + threshold) and new - old > NOISE_MS:
+            regressions.append((metric, old, new))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Время запуска редактора изображений")
+    parser.add_argument("--repeats", type=int, default=5, help="число запусков на замер")
+    parser.add_argument("--no-window", action="store_true", help="не замерять появление окна")
+    parser.add_argument("-o", "--output", default=None, help="файл JSON с результатами")
+    parser.add_argument("--baseline", default=None, help="файл JSON с базовыми результатами для сравнения")
+    parser.add_argument("--save-baseline", default=None, help="сохранить результаты как новую базу")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="допустимый относительный рост времени импорта (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    status = 0
+    results = {}
+    for metric, module in (("import_core_ms", "editor.core"), ("import_cli_ms", "editor.cli"),
+                           ("import_app_ms", "editor.app")):
+        results[metric], modules = measure_import(module, args.repeats)
+        print(f"{metric:16s} {results[metric]:8.1f} мс")
+        if module != "editor.app" and modules:
+            print(f"УТЕЧКА ИМПОРТА {module}: загружены {', '.join(modules)}", file=sys.stderr)
+            status = 1
+
+    if not args.no_window:
+        try:
+            window = measure_window(args.repeats)
+        except RuntimeError as e:
+            print(f"Замер окна пропущен: {e}", file=sys.stderr)
+        else:
+            for metric, value in window.items():
+                print(f"{metric:16s} {value:8.1f} мс")
+            results.update(window)
+
+    report = {"meta": metadata(), "results": results}
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        # Окно зависит от оконного менеджера; регрессией считается только рост времени импорта
+        regressions = compare({k: v for k, v in results.items() if k.startswith("import_")},
+                              baseline, args.threshold)
+        for metric, old, new in regressions:
+            print(f"РЕГРЕССИЯ {metric}: {old:.1f} -> {new:.1f} мс", file=sys.stderr)
+            status = 1
+        if not regressions:
+            print(f"Регрессий нет (порог {args.threshold:.0%})")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
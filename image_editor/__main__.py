@@ -1,6 +1,6 @@
-from editor.app import ImageEditorApp
+import sys
 
-if __name__ == "__main__":
-    app = ImageEditorApp()
-    app.run()
+from editor.cli import main
 
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+from collections import deque
+
+import cv2
+import numpy as np
+
+from .buffer import freeze, writable
+from .instrumentation import profiler
+
+CIRCLE, RECT, LINE, TEXT = range(4)
+
+# Имя фигуры -> (код, число целочисленных параметров)
+SHAPES = {
+    "circle": (CIRCLE, 3),   # x, y, радиус
+    "rect": (RECT, 4),       # x1, y1, x2, y2
+    "line": (LINE, 4),       # x1, y1, x2, y2
+    "text": (TEXT, 3),       # x, y (левый нижний угол), высота текста в пикселях
+}
+SHAPE_TITLES = {"circle": "Круг", "rect": "Прямоугольник", "line": "Линия", "text": "Текст"}
+SHAPE_NAMES = {code: name for name, (code, _) in SHAPES.items()}
+
+DEFAULT_COLOR = (0, 0, 255)
+DEFAULT_THICKNESS = 2
+TEXT_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+# Одна фигура — одна запись фиксированного размера
+RECORD_DTYPE = np.dtype([
+    ("kind", np.uint8),
+    ("alive", np.bool_),
+    ("thickness", np.int16),
+    ("color", np.uint8, 3),
+    ("params", np.int32, 4),
+    ("bbox", np.int32, 4),    # x1, y1, x2, y2 (правая и нижняя границы не включаются)
+])
+
+# Если грязные области покрывают большую часть кадра, дешевле перерисовать его целиком
+FULL_REDRAW_FRACTION = 0.5
+# Больше областей объединяются в один охватывающий прямоугольник
+MAX_DIRTY_RECTS = 64
+# Сколько последних изменений буфера помнит слой (см. changes_since)
+CHANGE_LOG_SIZE = 16
+
+
+def _bounding_boxes(code, params, thickness, text=None):
+    """Ограничивающие прямоугольники фигур одного типа (params — массив N x 4)"""
+    p = params.astype(np.int64)
+    margin = np.maximum(thickness, 1).astype(np.int64) + 1
+    if code == CIRCLE:
+        r = p[:, 2] + margin
+        boxes = [p[:, 0] - r, p[:, 1] - r, p[:, 0] + r + 1, p[:, 1] + r + 1]
+    elif code in (RECT, LINE):
+        boxes = [
+            np.minimum(p[:, 0], p[:, 2]) - margin, np.minimum(p[:, 1], p[:, 3]) - margin,
+            np.maximum(p[:, 0], p[:, 2]) + margin + 1, np.maximum(p[:, 1], p[:, 3]) + margin + 1,
+        ]
+    else:
+        x, y, height = (int(v) for v in p[0, :3])
+        t = int(thickness[0])
+        scale = cv2.getFontScaleFromHeight(TEXT_FONT, height, max(t, 1))
+        (w, h), baseline = cv2.getTextSize(text, TEXT_FONT, scale, max(t, 1))
+        m = int(margin[0])
+        boxes = [[x - m], [y - h - m], [x + w + m + 1], [y + baseline + m + 1]]
+    return np.stack([np.asarray(b, dtype=np.int64) for b in boxes], axis=1).clip(-2**31, 2**31 - 1)
+
+
+def _merge_rects(rects):
+    """Объединяет пересекающиеся прямоугольники"""
+    if len(rects) > MAX_DIRTY_RECTS:
+        x1, y1, x2, y2 = zip(*rects)
+        return [(min(x1), min(y1), max(x2), max(y2))]
+    merged = []
+    for rect in sorted(rects):
+        x1, y1, x2, y2 = rect
+        i = 0
+        while i < len(merged):
+            mx1, my1, mx2, my2 = merged[i]
+            if x1 <= mx2 and mx1 <= x2 and y1 <= my2 and my1 <= y2:
+                x1, y1, x2, y2 = min(x1, mx1), min(y1, my1), max(x2, mx2), max(y2, my2)
+                merged.pop(i)
+                i = 0
+            else:
+                i += 1
+        merged.append((x1, y1, x2, y2))
+    return merged
+
+
+class AnnotationLayer:
+    """Векторный слой поверх результата конвейера.
+       - Фигуры хранятся записями в одном массиве numpy; текст — в отдельном словаре
+       - Записи только добавляются и не перезаписываются, удаление снимает флаг alive,
+         поэтому снимок для истории — это число записей и маска alive
+       - Наложение ленивое: изменения копятся как грязные области
+         и перерисовываются одним проходом при запросе composite()
+       - Исходное изображение не изменяется; слой сводится с ним только в выходном буфере"""
+
+    def __init__(self, capacity=256):
+        self.records = np.zeros(capacity, dtype=RECORD_DTYPE)
+        self.count = 0
+        self.texts = {}
+        self.last_dirty = None
+        # Растет при каждом изменении выходного буфера; журнал — (поколение, области)
+        self.generation = 0
+        self._changes = deque(maxlen=CHANGE_LOG_SIZE)
+        self._base = None
+        self._buffer = None
+        self._output = None
+        self._dirty = []
+
+    def __len__(self):
+        return int(np.count_nonzero(self.records["alive"][:self.count]))
+
+    def _reserve(self, n):
+        if self.count + n > len(self.records):
+            grown = np.zeros(max(2 * len(self.records), self.count + n), dtype=RECORD_DTYPE)
+            grown[:self.count] = self.records[:self.count]
+            self.records = grown
+
+    def add(self, name, params, color=DEFAULT_COLOR, thickness=DEFAULT_THICKNESS, text=None):
+        """Добавляет одну фигуру, возвращает ее индекс"""
+        if name == "text" and not text:
+            raise ValueError("Не указан текст")
+        return self.add_many(name, [params], color, thickness, text)[0]
+
+    def add_many(self, name, params, color=DEFAULT_COLOR, thickness=DEFAULT_THICKNESS, text=None):
+        """Добавляет пакет фигур одного типа (params — массив N x k), возвращает их индексы"""
+        if name not in SHAPES:
+            raise ValueError(f"Неизвестная фигура: {name}")
+        code, arity = SHAPES[name]
+        params = np.asarray(params, dtype=np.int64).reshape(-1, arity)
+        if code == TEXT and len(params) != 1:
+            raise ValueError("Текст добавляется по одной надписи")
+        if code in (CIRCLE, TEXT) and np.any(params[:, 2] <= 0):
+            raise ValueError("Радиус и высота текста должны быть положительными")
+
+        n = len(params)
+        self._reserve(n)
+        block = self.records[self.count:self.count + n]
+        block[...] = np.zeros(1, dtype=RECORD_DTYPE)
+        block["kind"] = code
+        block["alive"] = True
+        block["thickness"] = thickness
+        block["color"] = color
+        block["params"][:, :arity] = params
+        block["bbox"] = _bounding_boxes(code, block["params"], block["thickness"], text)
+
+        indices = range(self.count, self.count + n)
+        if code == TEXT:
+            self.texts[self.count] = text
+        self.count += n
+        self._mark(block["bbox"])
+        return list(indices)
+
+    def remove(self, index):
+        if not 0 <= index < self.count or not self.records["alive"][index]:
+            raise ValueError(f"Нет аннотации с номером {index}")
+        self.records["alive"][index] = False
+        self._mark(self.records["bbox"][index:index + 1])
+
+    def clear(self):
+        """Удаляет все фигуры (записи остаются для снимков истории)"""
+        alive = self.records["alive"][:self.count]
+        self._mark(self.records["bbox"][:self.count][alive])
+        alive[...] = False
+
+    def shapes(self):
+        """Живые фигуры: список (индекс, имя, параметры, текст)"""
+        result = []
+        for i in np.flatnonzero(self.records["alive"][:self.count]):
+            code = int(self.records["kind"][i])
+            name = SHAPE_NAMES[code]
+            params = tuple(int(v) for v in self.records["params"][i][:SHAPES[name][1]])
+            result.append((int(i), name, params, self.texts.get(int(i))))
+        return result
+
+    def scaled(self, factor):
+        """Новый слой с живыми фигурами в масштабе factor (превью на уменьшенном кадре).
+           Толщина и размеры не меньше 1 пикселя; заливка (толщина < 0) сохраняется"""
+        indices = np.flatnonzero(self.records["alive"][:self.count])
+        layer = AnnotationLayer(max(1, len(indices)))
+        if not len(indices):
+            return layer
+        records = self.records[indices]
+        records["params"] = np.round(records["params"] * factor)
+        sized = np.isin(records["kind"], (CIRCLE, TEXT))
+        records["params"][sized, 2] = np.maximum(records["params"][sized, 2], 1)
+        thickness = records["thickness"]
+        records["thickness"] = np.where(thickness > 0, np.maximum(np.round(thickness * factor), 1), thickness)
+        texts = {j: self.texts[i] for j, i in enumerate(indices.tolist()) if i in self.texts}
+        for code in np.unique(records["kind"]).tolist():
+            if code == TEXT:
+                groups = [([j], text) for j, text in texts.items()]
+            else:
+                groups = [(np.flatnonzero(records["kind"] == code), None)]
+            for rows, text in groups:
+                records["bbox"][rows] = _bounding_boxes(code, records["params"][rows], records["thickness"][rows], text)
+        layer.records[:len(records)] = records
+        layer.count = len(records)
+        layer.texts = texts
+        return layer
+
+    def snapshot(self):
+        """Компактный снимок для истории: число записей и упакованная маска alive"""
+        return self.count, np.packbits(self.records["alive"][:self.count]).tobytes()
+
+    def restore(self, snapshot):
+        """Восстанавливает снимок; перерисовываются только фигуры, чья видимость изменилась"""
+        count, packed = snapshot
+        alive = np.unpackbits(np.frombuffer(packed, dtype=np.uint8), count=count).astype(bool)
+        n = max(count, self.count)
+        old = self.records["alive"][:n].copy()
+        new = np.zeros(n, dtype=bool)
+        new[:count] = alive
+        changed = old != new
+        self._mark(self.records["bbox"][:n][changed])
+        self.records["alive"][:n] = new
+        # Записи после count не удаляются: на них могут ссылаться другие снимки
+        self.count = n
+
+    def _mark(self, boxes):
+        self._dirty.extend(tuple(int(v) for v in box) for box in boxes)
+
+    def composite(self, base):
+        """Изображение base с наложенным слоем.
+           - Без фигур возвращается сам base (без копии)
+           - Для нового base фигуры рисуются на его копии за один проход
+           - Иначе выходной буфер обновляется на месте только в грязных областях;
+             они сохраняются в last_dirty (None — буфер создан заново)"""
+        if not len(self):
+            self._base = self._buffer = self._output = None
+            self._dirty.clear()
+            self.last_dirty = None
+            return base
+
+        h, w = base.shape[:2]
+        rects = [
+            (max(0, x1), max(0, y1), min(w, x2), min(h, y2))
+            for x1, y1, x2, y2 in _merge_rects(self._dirty)
+        ]
+        rects = [r for r in rects if r[0] < r[2] and r[1] < r[3]]
+        area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in rects)
+        self._dirty.clear()
+
+        if self._buffer is None or self._base is not base or area > FULL_REDRAW_FRACTION * w * h:
+            with profiler.span("annotations.composite"):
+                self._buffer = writable(base)
+                self._draw(self._buffer, np.flatnonzero(self.records["alive"][:self.count]), 0, 0)
+            # Наружу отдается представление только для чтения: рисует в буфер только слой
+            self._output = freeze(self._buffer.view())
+            self._base = base
+            self.last_dirty = None
+            self._log_change(None)
+            return self._output
+
+        with profiler.span("annotations.update"):
+            boxes = self.records["bbox"][:self.count]
+            alive = self.records["alive"][:self.count]
+            for x1, y1, x2, y2 in rects:
+                hit = alive & (boxes[:, 0] < x2) & (boxes[:, 2] > x1) & (boxes[:, 1] < y2) & (boxes[:, 3] > y1)
+                indices = np.flatnonzero(hit)
+                # OpenCV растеризует обрезанную краем холста фигуру иначе, чем целую,
+                # поэтому задетые фигуры рисуются целиком, а копируется только грязная область
+                hit_boxes = boxes[indices]
+                rx1 = max(0, int(hit_boxes[:, 0].min(initial=x1)))
+                ry1 = max(0, int(hit_boxes[:, 1].min(initial=y1)))
+                rx2 = min(w, int(hit_boxes[:, 2].max(initial=x2)))
+                ry2 = min(h, int(hit_boxes[:, 3].max(initial=y2)))
+                canvas = base[ry1:ry2, rx1:rx2].copy()
+                self._draw(canvas, indices, rx1, ry1)
+                self._buffer[y1:y2, x1:x2] = canvas[y1 - ry1:y2 - ry1, x1 - rx1:x2 - rx1]
+        self.last_dirty = rects
+        if rects:
+            self._log_change(rects)
+        return self._output
+
+    def _log_change(self, rects):
+        self.generation += 1
+        self._changes.append((self.generation, rects))
+
+    def changes_since(self, generation):
+        """Области буфера, измененные после поколения generation;
+           None — буфер создан заново или журнал этих изменений уже не хранит"""
+        if generation == self.generation:
+            return []
+        changes = [(g, rects) for g, rects in self._changes if g > generation]
+        if not changes or changes[0][0] != generation + 1 or any(rects is None for _, rects in changes):
+            return None
+        return [rect for _, rects in changes for rect in rects]
+
+    def _draw(self, target, indices, ox, oy):
+        """Рисует фигуры в порядке добавления; (ox, oy) — смещение target в кадре"""
+        texts = self.texts
+        records = self.records[indices]
+        for i, code, t, color, (a, b, c, d) in zip(indices.tolist(), records["kind"].tolist(),
+                                                   records["thickness"].tolist(), records["color"].tolist(),
+                                                   records["params"].tolist()):
+            if code == CIRCLE:
+                cv2.circle(target, (a - ox, b - oy), c, color, t)
+            elif code == RECT:
+                cv2.rectangle(target, (a - ox, b - oy), (c - ox, d - oy), color, t)
+            elif code == LINE:
+                cv2.line(target, (a - ox, b - oy), (c - ox, d - oy), color, t)
+            else:
+                thickness = max(t, 1)
+                scale = cv2.getFontScaleFromHeight(TEXT_FONT, c, thickness)
+                cv2.putText(target, texts[i], (a - ox, b - oy), TEXT_FONT, scale, color, thickness)
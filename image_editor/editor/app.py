@@ -1,9 +1,25 @@
 import os
+import time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from .image_processor import ImageProcessor
+from .instrumentation import profiler, format_record
 from .widgets.image_view import ImageView
 
+PREVIEW_POLL_MS = 4
+CAMERA_POLL_MS = 5
+STATUS_POLL_MS = 250
+IO_POLL_MS = 20
+
+# Подписи фильтров -> (стадия, подписи параметров, значения по умолчанию)
+FILTER_CHOICES = {
+    "Размытие по Гауссу": ("gaussian_blur", ("Сигма",), ("2.0",)),
+    "Размытие (среднее)": ("box_blur", ("Радиус",), ("3",)),
+    "Резкость": ("sharpen", ("Сигма", "Сила"), ("1.5", "1.0")),
+    "Края (Собель)": ("sobel", (), ()),
+    "Края (Канни)": ("canny", ("Нижний порог", "Верхний порог"), ("50", "150")),
+}
+THUMB_POLL_MS = 30
+
 
 class ImageEditorApp:
     def __init__(self):
@@ -11,9 +27,54 @@ class ImageEditorApp:
         self.root.title("Редактор изображений")
         self.root.geometry("1000x800")
 
-        self.image_processor = ImageProcessor()
+        # Ядро обработки (OpenCV, numpy) импортируется после первого показа окна, см. _init_core
+        self.image_processor = None
+        self.preview = None
+        self.io = None
+        self.session = None
+        self._preview_polling = False
+        self._syncing_controls = False
+        self._camera_live = False
+        self._camera_source = 0
+        self._load_token = 0
+        self._save_token = 0
+        self._io_polling = False
+        self.thumbnails = None
+        self.filmstrip = None
+        self.histogram_panel = None
+        self._histogram_pending = False
+        # Поколение слоя аннотаций, уже переданное виду (см. _show_result)
+        self._view_generation = 0
+        self._load_document = None
         self.create_widgets()
         self.setup_menu()
+        self.setup_bindings()
+        self._update_status()
+        self.root.bind("<Map>", self._on_first_map, add="+")
+
+    def _on_first_map(self, event):
+        if event.widget is self.root and self.image_processor is None:
+            self.root.after_idle(self._init_core)
+
+    def _init_core(self):
+        """Создает объекты ядра обработки.
+           Вызывается, когда окно уже показано: импорт OpenCV и numpy не задерживает его появление"""
+        if self.image_processor is not None:
+            return
+        from .annotations import SHAPE_TITLES
+        from .image_processor import ImageProcessor
+        from .io_worker import IOWorker
+        from .preview import PreviewRenderer
+        from .session import ImageSession
+
+        # Операции возвращают буфер слоя аннотаций без копии: вид перерисовывает
+        # только измененные области (см. _show_result); сохранение берет output()
+        self.image_processor = ImageProcessor(share_results=True)
+        self.preview = PreviewRenderer(self.image_processor.render_preview)
+        self.io = IOWorker()
+        self.session = ImageSession()
+        self.shape_combo.config(values=list(SHAPE_TITLES.values()))
+        self.shape_var.set(SHAPE_TITLES["circle"])
 
     def create_widgets(self):
         """Главный контейнер. Создает все элементы интерфейса:
@@ -21,9 +82,17 @@ class ImageEditorApp:
                - Панель управления с кнопками
                - Элементы для операций с изображением
                - Меню"""
+        #Строка состояния (замеры профилировщика)
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(self.root, textvariable=self.status_var, anchor=tk.W, relief=tk.SUNKEN).pack(
+            side=tk.BOTTOM, fill=tk.X)
+
         main_frame = ttk.Frame(self.root)
         main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
+        #Лента миниатюр открытой папки создается при первом "Открыть папку"
+        self._main_frame = main_frame
+
         #Область изображения
         self.image_view = ImageView(main_frame)
         self.image_view.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
@@ -31,16 +100,42 @@ class ImageEditorApp:
         #Панель управления
         control_frame = ttk.Frame(main_frame, width=300)
         control_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=5, pady=5)
+        # Панель гистограммы создается при первом включении (меню "Вид")
+        self._control_frame = control_frame
 
         #Кнопки операций
         btn_frame = ttk.LabelFrame(control_frame, text="Операции", padding=10)
         btn_frame.pack(fill=tk.X, pady=5)
 
         ttk.Button(btn_frame, text="Открыть", command=self.open_image).pack(fill=tk.X, pady=2)
-        ttk.Button(btn_frame, text="С камеры", command=self.capture_from_camera).pack(fill=tk.X, pady=2)
+        self.camera_button = ttk.Button(btn_frame, text="С камеры", command=self.capture_from_camera)
+        self.camera_button.pack(fill=tk.X, pady=2)
         ttk.Button(btn_frame, text="Сохранить", command=self.save_image).pack(fill=tk.X, pady=2)
         ttk.Button(btn_frame, text="Сбросить", command=self.reset_image).pack(fill=tk.X, pady=2)
 
+        self.camera_label = ttk.Label(btn_frame, text="")
+        self.camera_label.pack(anchor=tk.W)
+
+        self.progress = ttk.Progressbar(btn_frame, maximum=100)
+        self.progress.pack(fill=tk.X, pady=2)
+        self.progress_label = ttk.Label(btn_frame, text="")
+        self.progress_label.pack(anchor=tk.W)
+
+        history_frame = ttk.Frame(btn_frame)
+        history_frame.pack(fill=tk.X, pady=2)
+        ttk.Button(history_frame, text="Отменить", command=self.undo).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        ttk.Button(history_frame, text="Повторить", command=self.redo).pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+        #Параметры сохранения
+        save_frame = ttk.LabelFrame(control_frame, text="Сохранение", padding=10)
+        save_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(save_frame, text="Качество JPEG:").grid(row=0, column=0, sticky=tk.W)
+        self.jpeg_quality_var = tk.StringVar(value="95")
+        ttk.Spinbox(save_frame, from_=0, to=100, width=5, textvariable=self.jpeg_quality_var).grid(row=0, column=1)
+        ttk.Label(save_frame, text="Сжатие PNG:").grid(row=1, column=0, sticky=tk.W)
+        self.png_compression_var = tk.StringVar(value="3")
+        ttk.Spinbox(save_frame, from_=0, to=9, width=5, textvariable=self.png_compression_var).grid(row=1, column=1)
+
         #Цветовые каналы
         channel_frame = ttk.LabelFrame(control_frame, text="Цветовые каналы", padding=10)
         channel_frame.pack(fill=tk.X, pady=5)
@@ -73,19 +168,102 @@ class ImageEditorApp:
 
         #Поворот
         ttk.Label(ops_frame, text="Поворот (градусы):").pack(anchor=tk.W)
-        self.rotate_slider = ttk.Scale(ops_frame, from_=-180, to=180, command=lambda _: self.apply_rotation())
+        self.rotate_slider = ttk.Scale(ops_frame, from_=-180, to=180, command=lambda _: self.preview_rotation())
         self.rotate_slider.pack(fill=tk.X)
+        self.rotate_slider.bind("<ButtonRelease-1>", lambda _: self.apply_rotation())
+        self.rotate_slider.bind("<KeyRelease>", lambda _: self.apply_rotation())
+        self.preview_label = ttk.Label(ops_frame, text="Превью: —")
+        self.preview_label.pack(anchor=tk.W)
+
+        #Масштаб и отражение (выполняются вместе с обрезкой и поворотом одним проходом)
+        scale_frame = ttk.Frame(ops_frame)
+        scale_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(scale_frame, text="Масштаб:").pack(side=tk.LEFT)
+        self.scale_var = tk.StringVar(value="1.0")
+        ttk.Spinbox(scale_frame, from_=0.1, to=8.0, increment=0.1, width=5,
+                    textvariable=self.scale_var).pack(side=tk.LEFT, padx=2)
+        ttk.Button(scale_frame, text="Применить", command=self.apply_scale).pack(side=tk.LEFT, fill=tk.X, expand=True)
 
-        #Круг
-        ttk.Label(ops_frame, text="Круг (x,y,радиус):").pack(anchor=tk.W)
-        self.circle_entries = []
-        circle_frame = ttk.Frame(ops_frame)
-        circle_frame.pack(fill=tk.X)
-        for _ in range(3):
-            entry = ttk.Entry(circle_frame, width=5)
+        flip_frame = ttk.Frame(ops_frame)
+        flip_frame.pack(fill=tk.X, pady=2)
+        ttk.Button(flip_frame, text="Отразить ↔", command=lambda: self.toggle_flip(horizontal=True)).pack(
+            side=tk.LEFT, fill=tk.X, expand=True)
+        ttk.Button(flip_frame, text="Отразить ↕", command=lambda: self.toggle_flip(vertical=True)).pack(
+            side=tk.LEFT, fill=tk.X, expand=True)
+
+        #Фильтры (выполняются полосами во всех потоках)
+        filter_frame = ttk.LabelFrame(control_frame, text="Фильтры", padding=10)
+        filter_frame.pack(fill=tk.X, pady=5)
+        self.filter_var = tk.StringVar(value=next(iter(FILTER_CHOICES)))
+        ttk.Combobox(filter_frame, textvariable=self.filter_var, values=list(FILTER_CHOICES),
+                     state="readonly", width=20).pack(fill=tk.X)
+        self.filter_var.trace_add("write", lambda *_: self._reset_filter_params())
+        self.filter_params_label = ttk.Label(filter_frame, text="")
+        self.filter_params_label.pack(anchor=tk.W)
+        params_frame = ttk.Frame(filter_frame)
+        params_frame.pack(fill=tk.X)
+        self.filter_entries = []
+        for _ in range(2):
+            entry = ttk.Entry(params_frame, width=7)
             entry.pack(side=tk.LEFT, padx=2)
-            self.circle_entries.append(entry)
-        ttk.Button(ops_frame, text="Нарисовать круг", command=self.draw_circle).pack(fill=tk.X, pady=5)
+            self.filter_entries.append(entry)
+        filter_buttons = ttk.Frame(filter_frame)
+        filter_buttons.pack(fill=tk.X, pady=2)
+        ttk.Button(filter_buttons, text="Применить", command=self.apply_filter).pack(
+            side=tk.LEFT, fill=tk.X, expand=True)
+        ttk.Button(filter_buttons, text="Убрать", command=self.remove_filter).pack(
+            side=tk.LEFT, fill=tk.X, expand=True)
+        self._reset_filter_params()
+
+        #Яркость, контраст, гамма (превью при перемещении, применение при отпускании)
+        adjust_frame = ttk.LabelFrame(control_frame, text="Коррекция", padding=10)
+        adjust_frame.pack(fill=tk.X, pady=5)
+        self.adjust_sliders = {}
+        for row, (key, title, low, high, default) in enumerate([
+            ("brightness", "Яркость", -100, 100, 0),
+            ("contrast", "Контраст", 0.2, 3.0, 1.0),
+            ("gamma", "Гамма", 0.2, 3.0, 1.0),
+        ]):
+            ttk.Label(adjust_frame, text=title).grid(row=row, column=0, sticky=tk.W)
+            slider = ttk.Scale(adjust_frame, from_=low, to=high, value=default,
+                               command=lambda _: self.preview_adjustments())
+            slider.grid(row=row, column=1, sticky=tk.EW)
+            slider.bind("<ButtonRelease-1>", lambda _: self.apply_adjustments())
+            slider.bind("<KeyRelease>", lambda _: self.apply_adjustments())
+            self.adjust_sliders[key] = slider
+        adjust_frame.columnconfigure(1, weight=1)
+
+        #Аннотации (фигуры поверх изображения, сводятся с ним при сохранении)
+        ann_frame = ttk.LabelFrame(control_frame, text="Аннотации", padding=10)
+        ann_frame.pack(fill=tk.X, pady=5)
+
+        # Список фигур заполняется в _init_core (вместе с ядром)
+        self.shape_var = tk.StringVar()
+        self.shape_combo = ttk.Combobox(ann_frame, textvariable=self.shape_var, state="readonly", width=16)
+        self.shape_combo.pack(fill=tk.X)
+        ttk.Label(ann_frame, text="Круг: x,y,радиус; линия/прямоугольник: x1,y1,x2,y2;\n"
+                                  "текст: x,y,высота").pack(anchor=tk.W)
+        self.shape_entries = []
+        shape_frame = ttk.Frame(ann_frame)
+        shape_frame.pack(fill=tk.X)
+        for _ in range(4):
+            entry = ttk.Entry(shape_frame, width=5)
+            entry.pack(side=tk.LEFT, padx=2)
+            self.shape_entries.append(entry)
+        self.text_entry = ttk.Entry(ann_frame)
+        self.text_entry.pack(fill=tk.X, pady=2)
+        ttk.Button(ann_frame, text="Добавить", command=self.add_annotation).pack(fill=tk.X, pady=2)
+
+        self.annotation_list = tk.Listbox(ann_frame, height=4)
+        self.annotation_list.pack(fill=tk.X)
+        self._annotation_ids = []
+        self._annotations_shown = None
+        list_buttons = ttk.Frame(ann_frame)
+        list_buttons.pack(fill=tk.X, pady=2)
+        ttk.Button(list_buttons, text="Удалить", command=self.remove_annotation).pack(
+            side=tk.LEFT, fill=tk.X, expand=True)
+        ttk.Button(list_buttons, text="Очистить", command=self.clear_annotations).pack(
+            side=tk.LEFT, fill=tk.X, expand=True)
 
     def setup_menu(self):
         """Создает главное меню приложения с пунктами:
@@ -95,16 +273,52 @@ class ImageEditorApp:
 
         file_menu = tk.Menu(menubar, tearoff=0)
         file_menu.add_command(label="Открыть", command=self.open_image)
+        file_menu.add_command(label="Открыть папку...", command=self.open_folder)
+        file_menu.add_command(label="Предыдущее", accelerator="PgUp", command=lambda: self.open_neighbour(-1))
+        file_menu.add_command(label="Следующее", accelerator="PgDn", command=lambda: self.open_neighbour(1))
         file_menu.add_command(label="Сохранить", command=self.save_image)
         file_menu.add_separator()
+        file_menu.add_command(label="Видео из файла...", command=self.open_video)
+        file_menu.add_command(label="Отключить камеру", command=self.close_camera)
+        file_menu.add_separator()
         file_menu.add_command(label="Выход", command=self.root.quit)
 
+        edit_menu = tk.Menu(menubar, tearoff=0)
+        edit_menu.add_command(label="Отменить", accelerator="Ctrl+Z", command=self.undo)
+        edit_menu.add_command(label="Повторить", accelerator="Ctrl+Y", command=self.redo)
+
+        self.profiling_var = tk.BooleanVar(value=profiler.enabled)
+        self.track_memory_var = tk.BooleanVar(value=False)
+        profile_menu = tk.Menu(menubar, tearoff=0)
+        profile_menu.add_checkbutton(label="Включить замеры", variable=self.profiling_var,
+                                     command=self.toggle_profiling)
+        profile_menu.add_checkbutton(label="Учитывать память", variable=self.track_memory_var,
+                                     command=self.toggle_profiling)
+        profile_menu.add_command(label="Экспорт трассы...", command=self.export_trace)
+        profile_menu.add_command(label="Очистить", command=profiler.clear)
+
+        self.histogram_var = tk.BooleanVar(value=False)
+        view_menu = tk.Menu(menubar, tearoff=0)
+        view_menu.add_checkbutton(label="Гистограмма и статистика", variable=self.histogram_var,
+                                  command=self.toggle_histogram)
+
         menubar.add_cascade(label="Файл", menu=file_menu)
+        menubar.add_cascade(label="Правка", menu=edit_menu)
+        menubar.add_cascade(label="Вид", menu=view_menu)
+        menubar.add_cascade(label="Профилирование", menu=profile_menu)
         self.root.config(menu=menubar)
 
+    def setup_bindings(self):
+        """Горячие клавиши отмены и повтора"""
+        self.root.bind("<Control-z>", lambda _: self.undo())
+        self.root.bind("<Control-y>", lambda _: self.redo())
+        self.root.bind("<Control-Shift-Z>", lambda _: self.redo())
+        self.root.bind("<Prior>", lambda _: self.open_neighbour(-1))
+        self.root.bind("<Next>", lambda _: self.open_neighbour(1))
+
     def open_image(self):
         """- Открывает диалоговое окно выбора файла
-           - Загружает изображение через ImageProcessor
+           - Загружает изображение в фоновом потоке
            - Отображает изображение в интерфейсе"""
         file_types = [
             ("Изображения", "*.jpg *.jpeg *.png *.bmp"),
@@ -124,23 +338,146 @@ class ImageEditorApp:
                 messagebox.showerror("Ошибка", "Файл поврежден или пустой!")
                 return
 
-            image = self.image_processor.load_image(file_path)
-            if image is None:
-                messagebox.showerror("Ошибка",
-                                     "Не удалось открыть изображение!\n"
-                                     "Поддерживаемые форматы: JPG, JPEG, PNG, BMP")
-            else:
-                self.image_view.display_image(image)
+            self.load_file(file_path)
         except Exception as e:
             messagebox.showerror("Критическая ошибка",
                                  f"Произошла непредвиденная ошибка:\n{str(e)}")
 
+    def open_folder(self):
+        """- Открывает все изображения папки как сессию с лентой миниатюр
+           - Миниатюры берутся из дискового кэша или готовятся в фоне, видимые — первыми"""
+        folder = filedialog.askdirectory()
+        if not folder:
+            return
+        try:
+            paths = self.session.open_folder(folder)
+        except OSError as e:
+            messagebox.showerror("Ошибка", f"Не удалось прочитать папку:\n{str(e)}")
+            return
+        if not paths:
+            messagebox.showwarning("Ошибка", "В папке нет изображений")
+            return
+
+        if self.thumbnails is None:
+            from .session import ThumbnailCache, ThumbnailLoader
+            from .widgets.filmstrip import Filmstrip
+
+            self.thumbnails = ThumbnailLoader(ThumbnailCache())
+            self.filmstrip = Filmstrip(self.root, on_select=self.open_document,
+                                       on_visible=self._prioritize_thumbnails)
+            self.filmstrip.pack(side=tk.BOTTOM, fill=tk.X, before=self._main_frame)
+            self.root.after(THUMB_POLL_MS, self._poll_thumbnails)
+        self.thumbnails.cancel()
+        self.filmstrip.set_paths(paths)
+        self.thumbnails.request(paths)
+        self.open_document(paths[0])
+
+    def open_document(self, path):
+        """- Переключается на изображение сессии
+           - Декодированное изображение берется из кэша, иначе загружается в фоне
+           - Правки каждого изображения сохраняются при переключении"""
+        if path == self.session.current:
+            return
+        image = self.session.cached_image(path)
+        if image is None:
+            self.load_file(path, document=True)
+            return
+        self._show_document(path, image)
+
+    def open_neighbour(self, step):
+        path = self.session.neighbour(step)
+        if path is not None:
+            self.open_document(path)
+
+    def _show_document(self, path, image):
+        """Делает image исходником; path — документ сессии или None для отдельного файла"""
+        self.preview.cancel()
+        stages, annotations, history = self.session.switch(path, self.image_processor.document_state(),
+                                                           self.image_processor.history)
+        # Декодированный кадр (свежий или из кэша сессии) больше никем не меняется:
+        # процессор забирает его без копии, и кэш сессии делит с ним те же пиксели.
+        # У документа своя история: отмена не возвращает пиксели другого документа
+        image = self.image_processor.set_image(image, stages, annotations, copy=False, history=history)
+        self._show_result(image)
+        self._sync_controls()
+        if path is not None:
+            self.filmstrip.select(path)
+            self.root.title(f"Редактор изображений — {os.path.basename(path)}")
+
+    def _prioritize_thumbnails(self, paths):
+        if self.thumbnails is not None:
+            self.thumbnails.prioritize(paths)
+
+    def _poll_thumbnails(self):
+        """Передает готовые миниатюры в ленту"""
+        for path, thumb in self.thumbnails.poll():
+            self.filmstrip.set_thumbnail(path, thumb)
+        self.root.after(THUMB_POLL_MS, self._poll_thumbnails)
+
     def capture_from_camera(self):
-        """- Захватывает изображение с веб-камеры
-           - Отображает полученный снимок"""
-        image = self.image_processor.capture_from_camera()
-        if image is not None:
+        """- Первое нажатие: запускает живой просмотр с камеры
+             с применением текущих настроек (канал, поворот, обрезка)
+           - Повторное нажатие: делает снимок с текущими настройками"""
+        try:
+            if not self._camera_live:
+                # Текущая цепочка правок сохраняется и применяется к живым кадрам
+                image = self.image_processor.capture_from_camera(self._camera_source, keep_stages=True)
+                self.image_view.display_image(image)
+                self._refresh_histogram()
+                self._sync_controls()
+                self._camera_live = True
+                self.camera_button.config(text="Снимок")
+                self.root.after(CAMERA_POLL_MS, self._poll_camera)
+            else:
+                self._camera_live = False
+                self.camera_button.config(text="С камеры")
+                image = self.image_processor.capture_from_camera(self._camera_source, keep_stages=True)
+                self.image_view.display_image(image)
+                self._refresh_histogram()
+        except RuntimeError as e:
+            self._stop_live_view()
+            messagebox.showerror("Ошибка", str(e))
+
+    def open_video(self):
+        """- Использует видеофайл вместо камеры (например, для проверки без устройства)"""
+        file_path = filedialog.askopenfilename(filetypes=[("Видео", "*.mp4 *.avi *.mov *.mkv"), ("Все файлы", "*.*")])
+        if not file_path:
+            return
+        self.close_camera()
+        self._camera_source = file_path
+        self.capture_from_camera()
+
+    def close_camera(self):
+        """- Останавливает живой просмотр и освобождает устройство"""
+        self._stop_live_view()
+        self.image_processor.close_camera()
+        self._camera_source = 0
+        self.camera_label.config(text="")
+
+    def _stop_live_view(self):
+        self._camera_live = False
+        self.camera_button.config(text="С камеры")
+
+    def _poll_camera(self):
+        """Показывает свежий кадр камеры с текущими настройками"""
+        if not self._camera_live:
+            return
+        camera = self.image_processor.camera
+        if camera is None or not camera.running:
+            self._stop_live_view()
+            return
+
+        result = camera.read(wait=False)
+        if result is not None:
+            frame, grabbed_at = result
+            try:
+                image = self.image_processor.render_frame(frame)
+            except Exception:
+                image = frame
             self.image_view.display_image(image)
+            camera.record_latency(grabbed_at)
+            self.camera_label.config(text=f"Камера: {camera.summary()}")
+        self.root.after(CAMERA_POLL_MS, self._poll_camera)
 
     def save_image(self):
         """- Открывает диалоговое окно сохранения
@@ -153,15 +490,71 @@ class ImageEditorApp:
             defaultextension=".jpg",
             filetypes=[("JPEG", "*.jpg"), ("PNG", "*.png")]
         )
-        if file_path:
-            self.image_processor.save_image(file_path)
+        if not file_path:
+            return
+
+        from .image_io import encode_params
+
+        try:
+            ext = os.path.splitext(file_path)[1]
+            params = encode_params(ext, int(self.jpeg_quality_var.get()), int(self.png_compression_var.get()))
+        except ValueError:
+            messagebox.showerror("Ошибка", "Введите корректные параметры сохранения")
+            return
+
+        # output() не меняется последующими правками, поэтому его можно сохранять в фоне
+        image = self.image_processor.output()
+        self._save_token += 1
+        self.io.save(image, file_path, ext, params, ("save", self._save_token))
+        self._ensure_io_polling()
+
+    def load_file(self, file_path, document=False):
+        """- Запускает фоновую загрузку: сначала быстрый предпросмотр, затем полное изображение
+           - Результат предыдущей незавершенной загрузки будет отброшен
+           - document — файл принадлежит сессии (открытой папке)"""
+        self._load_document = file_path if document else None
+        self._load_token += 1
+        self.io.load(file_path, ("load", self._load_token))
+        self._ensure_io_polling()
+
+    def _ensure_io_polling(self):
+        if not self._io_polling:
+            self._io_polling = True
+            self.root.after(IO_POLL_MS, self._poll_io)
+
+    def _poll_io(self):
+        """Обрабатывает события загрузки/сохранения из фоновых потоков"""
+        for event in self.io.poll():
+            kind, number = event.token
+            if kind == "load" and number != self._load_token:
+                continue
+
+            if event.progress is not None:
+                self.progress["value"] = event.progress
+                self.progress_label.config(text=event.message)
+
+            if event.kind == "preview":
+                self.image_view.display_image(event.payload)
+            elif event.kind == "loaded":
+                if self._load_document is not None:
+                    self.session.remember(self._load_document, event.payload)
+                self._show_document(self._load_document, event.payload)
+            elif event.kind == "error":
+                self.progress["value"] = 0
+                self.progress_label.config(text="")
+                messagebox.showerror("Ошибка", event.message)
+
+        if self.io.busy:
+            self.root.after(IO_POLL_MS, self._poll_io)
+        else:
+            self._io_polling = False
 
     def reset_image(self):
         """- Восстанавливает исходное изображение
            - Сбрасывает все примененные изменения"""
         image = self.image_processor.reset_image()
         if image is not None:
-            self.image_view.display_image(image)
+            self._show_result(image)
             self.channel_var.set("Оригинал")
 
     def update_channel(self):
@@ -170,7 +563,7 @@ class ImageEditorApp:
         channel = self.channel_var.get()
         image = self.image_processor.show_channel(channel)
         if image is not None:
-            self.image_view.display_image(image)
+            self._show_result(image)
 
     def apply_crop(self):
         """- Обрезает изображение по заданным координатам
@@ -179,29 +572,289 @@ class ImageEditorApp:
             coords = [int(entry.get()) for entry in self.crop_entries]
             image = self.image_processor.apply_crop(*coords)
             if image is not None:
-                self.image_view.display_image(image)
+                self._show_result(image)
         except ValueError:
             messagebox.showerror("Ошибка", "Введите корректные координаты")
 
     def apply_rotation(self):
         """- Поворачивает изображение на заданный угол
-           - Использует значение из слайдера"""
+           - Использует значение из слайдера
+           - Вызывается при отпускании слайдера: считает полное разрешение"""
+        if self.image_processor.original_image is None:
+            return
+        self.preview.cancel()
         angle = self.rotate_slider.get()
         image = self.image_processor.apply_rotation(angle)
         if image is not None:
+            self._show_result(image)
+
+    def preview_rotation(self):
+        """- Запрашивает фоновую отрисовку поворота на уменьшенной копии
+           - Вызывается при каждом движении слайдера"""
+        self._submit_preview("rotation", (float(self.rotate_slider.get()),))
+
+    def _submit_preview(self, name, params):
+        if self.image_processor.original_image is None or self._syncing_controls:
+            return
+        stages = self.image_processor.preview_stages(name, params)
+        self.preview.submit(stages)
+        if not self._preview_polling:
+            self._preview_polling = True
+            self.root.after(PREVIEW_POLL_MS, self._poll_preview)
+
+    def _poll_preview(self):
+        """Забирает готовый кадр превью из фонового потока и отображает его"""
+        result = self.preview.poll()
+        if result is not None:
+            image, submitted = result
             self.image_view.display_image(image)
+            if self._histogram_visible():
+                from .stats import image_stats
+
+                # Кадр превью уже уменьшен: статистика по нему считается сразу, без кэша
+                self.histogram_panel.show(image_stats(image))
+            self.preview.latency.record(time.perf_counter() - submitted)
+            self.preview_label.config(text=f"Превью: {self.preview.latency.summary()}")
+
+        if self.preview.busy:
+            self.root.after(PREVIEW_POLL_MS, self._poll_preview)
+        else:
+            self._preview_polling = False
+
+    def _reset_filter_params(self):
+        """Подставляет подписи и значения по умолчанию для выбранного фильтра"""
+        _, labels, defaults = FILTER_CHOICES[self.filter_var.get()]
+        self.filter_params_label.config(text=", ".join(labels) or "Без параметров")
+        for i, entry in enumerate(self.filter_entries):
+            entry.config(state=tk.NORMAL)
+            entry.delete(0, tk.END)
+            if i < len(defaults):
+                entry.insert(0, defaults[i])
+            else:
+                entry.config(state=tk.DISABLED)
+
+    def apply_filter(self):
+        """- Применяет выбранный фильтр (повторное применение меняет его параметры)"""
+        name, labels, _ = FILTER_CHOICES[self.filter_var.get()]
+        params = [entry.get() for entry in self.filter_entries[:len(labels)]]
+        try:
+            image = self.image_processor.apply_filter(name, *params)
+        except (ValueError, RuntimeError) as e:
+            messagebox.showerror("Ошибка", str(e))
+            return
+        self._show_result(image)
 
-    def draw_circle(self):
-        """- Рисует круг на изображении
-           - Использует введенные координаты и радиус"""
+    def remove_filter(self):
+        """- Убирает выбранный фильтр"""
+        name = FILTER_CHOICES[self.filter_var.get()][0]
         try:
-            params = [int(entry.get()) for entry in self.circle_entries]
-            image = self.image_processor.draw_circle(*params)
+            image = self.image_processor.remove_filter(name)
+        except RuntimeError as e:
+            messagebox.showerror("Ошибка", str(e))
+            return
+        self._show_result(image)
+
+    def _adjustment_params(self):
+        return tuple(float(self.adjust_sliders[key].get()) for key in ("brightness", "contrast", "gamma"))
+
+    def preview_adjustments(self):
+        """- Превью яркости/контраста/гаммы на уменьшенной копии при движении слайдеров"""
+        self._submit_preview("adjust", self._adjustment_params())
+
+    def apply_adjustments(self):
+        """- Применяет коррекцию в полном разрешении при отпускании слайдера"""
+        if self.image_processor.original_image is None:
+            return
+        self.preview.cancel()
+        try:
+            image = self.image_processor.apply_adjustments(*self._adjustment_params())
+        except (ValueError, RuntimeError) as e:
+            messagebox.showerror("Ошибка", str(e))
+            return
+        self._show_result(image)
+
+    def apply_scale(self):
+        """- Масштабирует изображение на коэффициент из поля ввода"""
+        try:
+            image = self.image_processor.apply_scale(self.scale_var.get())
             if image is not None:
-                self.image_view.display_image(image)
+                self._show_result(image)
+        except ValueError as e:
+            messagebox.showerror("Ошибка", str(e))
+
+    def toggle_flip(self, horizontal=False, vertical=False):
+        """- Переключает отражение по горизонтали/вертикали"""
+        flip = self.image_processor.pipeline.get_stage("flip")
+        current_h, current_v = flip.params if flip else (False, False)
+        try:
+            image = self.image_processor.apply_flip(current_h != horizontal, current_v != vertical)
+            if image is not None:
+                self._show_result(image)
+        except RuntimeError as e:
+            messagebox.showerror("Ошибка", str(e))
+
+    def add_annotation(self):
+        """- Добавляет фигуру выбранного типа в слой аннотаций
+           - Использует введенные координаты (и текст для надписи)"""
+        from .annotations import SHAPES, SHAPE_TITLES
+
+        shape = next(name for name, title in SHAPE_TITLES.items() if title == self.shape_var.get())
+        arity = SHAPES[shape][1]
+        try:
+            params = [int(entry.get()) for entry in self.shape_entries[:arity]]
         except ValueError:
-            messagebox.showerror("Ошибка", "Введите корректные параметры круга")
+            messagebox.showerror("Ошибка", "Введите корректные параметры фигуры")
+            return
+        try:
+            if shape == "circle":
+                image = self.image_processor.draw_circle(*params)
+            else:
+                image = self.image_processor.add_annotation(shape, params, text=self.text_entry.get())
+        except (ValueError, RuntimeError) as e:
+            messagebox.showerror("Ошибка", str(e))
+            return
+        self._show_result(image)
+
+    def remove_annotation(self):
+        """- Удаляет выбранную в списке фигуру"""
+        selection = self.annotation_list.curselection()
+        if not selection:
+            return
+        try:
+            image = self.image_processor.remove_annotation(self._annotation_ids[selection[0]])
+        except ValueError as e:
+            messagebox.showerror("Ошибка", str(e))
+            return
+        self._show_result(image)
+
+    def clear_annotations(self):
+        """- Удаляет все фигуры"""
+        self._show_result(self.image_processor.clear_annotations())
+
+    def _show_result(self, image):
+        """Показывает результат операции.
+           Слой аннотаций может обновить свой буфер на месте — виду передаются области,
+           измененные с прошлого показа (по журналу слоя, как в StatsTracker)"""
+        if image is None:
+            return
+        layer = self.image_processor.annotations
+        dirty = layer.changes_since(self._view_generation)
+        self._view_generation = layer.generation
+        if dirty is None:
+            # Журнал не покрывает изменения: кадр считается измененным целиком
+            dirty = [(0, 0, image.shape[1], image.shape[0])]
+        self.image_view.display_image(image, dirty)
+        self._refresh_annotation_list()
+        self._refresh_histogram()
+
+    def toggle_histogram(self):
+        """- Показывает/скрывает панель гистограммы и статистики каналов"""
+        if self.histogram_var.get():
+            if self.histogram_panel is None:
+                from .widgets.histogram import HistogramPanel
+
+                self.histogram_panel = HistogramPanel(self._main_frame)
+            self.histogram_panel.pack(side=tk.RIGHT, fill=tk.Y, padx=5, pady=5, after=self._control_frame)
+            self._refresh_histogram()
+        elif self.histogram_panel is not None:
+            self.histogram_panel.pack_forget()
+
+    def _histogram_visible(self):
+        return self.histogram_panel is not None and self.histogram_var.get()
+
+    def _refresh_histogram(self):
+        """Планирует пересчет статистики (не чаще раза за цикл событий)"""
+        if self._histogram_visible() and not self._histogram_pending:
+            self._histogram_pending = True
+            self.root.after_idle(self._update_histogram)
+
+    def _update_histogram(self):
+        self._histogram_pending = False
+        if not self._histogram_visible() or self.image_processor is None or self.image_processor.image is None:
+            return
+        self.histogram_panel.show(self.image_processor.statistics())
+
+    def _refresh_annotation_list(self):
+        """Перестраивает список фигур, только если слой изменился"""
+        from .annotations import SHAPE_TITLES
+
+        snapshot = self.image_processor.annotations.snapshot()
+        if snapshot == self._annotations_shown:
+            return
+        self._annotations_shown = snapshot
+        shapes = self.image_processor.annotations.shapes()
+        self._annotation_ids = [index for index, _, _, _ in shapes]
+        self.annotation_list.delete(0, tk.END)
+        self.annotation_list.insert(tk.END, *(
+            f"{SHAPE_TITLES[name]} {','.join(map(str, params))}" + (f" «{text}»" if text else "")
+            for _, name, params, text in shapes
+        ))
+
+    def undo(self):
+        """- Отменяет последнюю операцию
+           - Синхронизирует элементы управления с восстановленным состоянием"""
+        self._show_history_step(self.image_processor.undo)
+
+    def redo(self):
+        """- Повторяет отмененную операцию"""
+        self._show_history_step(self.image_processor.redo)
+
+    def _show_history_step(self, step):
+        self.preview.cancel()
+        try:
+            image = step()
+        except RuntimeError as e:
+            messagebox.showerror("Ошибка", str(e))
+            return
+        if image is not None:
+            self._show_result(image)
+            self._sync_controls()
+
+    def _sync_controls(self):
+        """Выставляет канал и угол поворота по стадиям конвейера, не запуская операции"""
+        self._syncing_controls = True
+        try:
+            self.channel_var.set(self.image_processor.current_channel)
+            rotation = self.image_processor.pipeline.get_stage("rotation")
+            self.rotate_slider.set(rotation.params[0] if rotation else 0)
+            scale = self.image_processor.pipeline.get_stage("scale")
+            self.scale_var.set(str(scale.params[0] if scale else 1.0))
+            adjust = self.image_processor.pipeline.get_stage("adjust")
+            for key, value in zip(("brightness", "contrast", "gamma"), adjust.params if adjust else (0, 1, 1)):
+                self.adjust_sliders[key].set(value)
+        finally:
+            self._syncing_controls = False
+
+    def toggle_profiling(self):
+        """- Включает/выключает сбор замеров операций"""
+        profiler.disable()
+        if self.profiling_var.get():
+            profiler.enable(track_memory=self.track_memory_var.get())
+        else:
+            self.status_var.set("")
+
+    def export_trace(self):
+        """- Сохраняет замеры в формате Chrome Trace (chrome://tracing, Perfetto)"""
+        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Chrome Trace", "*.json")])
+        if file_path:
+            count = profiler.export_trace(file_path)
+            messagebox.showinfo("Профилирование", f"Сохранено событий: {count}")
+
+    def _update_status(self):
+        """Периодически выводит последний замер в строку состояния"""
+        if profiler.enabled:
+            self.status_var.set(format_record(profiler.latest()))
+        self.root.after(STATUS_POLL_MS, self._update_status)
 
     def run(self):
         """Запускает главный цикл приложения"""
-        self.root.mainloop()
\ No newline at end of file
+        try:
+            self.root.mainloop()
+        finally:
+            if self.preview is not None:
+                self.preview.close()
+                self.io.close()
+            if self.thumbnails is not None:
+                self.thumbnails.close()
+            if self.image_processor is not None:
+                self.image_processor.close_camera()
\ No newline at end of file
@@ -0,0 +1,326 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .image_io import read_bytes, decode_image, encode_params, encode_image, write_bytes
+from .image_processor import ImageProcessor
+from .stats import stats_summary
+from .tiled import TiledImage, DEFAULT_TILE_SIZE, DEFAULT_TILE_CACHE
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp", ".ppm", ".pgm")
+# Массивы .npy читаются только плиточным режимом (потоково, через memmap)
+TILED_EXTENSIONS = IMAGE_EXTENSIONS + (".npy",)
+MANIFEST_NAME = ".image-editor-batch.jsonl"
+
+CHANNEL_ALIASES = {
+    "original": "Оригинал",
+    "red": "Красный",
+    "green": "Зеленый",
+    "blue": "Синий",
+}
+
+# Операция командной строки -> (метод ImageProcessor, число аргументов, тип аргументов)
+BATCH_OPERATIONS = {
+    "crop": ("apply_crop", 4, int),
+    "rotate": ("apply_rotation", 1, float),
+    "channel": ("show_channel", 1, str),
+    "scale": ("apply_scale", 1, float),
+    "flip": ("apply_flip", 2, int),
+    "circle": ("draw_circle", 3, int),
+}
+
+FLIP_ALIASES = {"h": "1,0", "v": "0,1", "hv": "1,1"}
+
+
+def parse_operation(spec):
+    """Разбирает операцию вида 'crop:10,10,200,200', 'rotate:15', 'channel:red'"""
+    name, _, args = spec.partition(":")
+    name = name.strip().lower()
+    if name == "flip":
+        args = FLIP_ALIASES.get(args.strip().lower(), args)
+    if name not in BATCH_OPERATIONS:
+        raise ValueError(f"Неизвестная операция: {name} (доступны: {', '.join(BATCH_OPERATIONS)})")
+
+    method, count, cast = BATCH_OPERATIONS[name]
+    values = [v.strip() for v in args.split(",")] if args else []
+    if len(values) != count:
+        raise ValueError(f"Операция {name} ожидает аргументов: {count}")
+
+    if name == "channel":
+        values = [CHANNEL_ALIASES.get(values[0].lower(), values[0])]
+    try:
+        return method, tuple(cast(v) for v in values)
+    except ValueError:
+        raise ValueError(f"Некорректные аргументы операции {name}: {args}")
+
+
+def _operation_arg(spec):
+    try:
+        return parse_operation(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _pattern_root(pattern):
+    """Каталог glob-шаблона до первой части с подстановочными символами"""
+    parts = []
+    for part in os.path.normpath(pattern).split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or "."
+
+
+def input_entries(patterns, recursive=False, extensions=IMAGE_EXTENSIONS):
+    """Файлы изображений из каталогов и glob-шаблонов: список (путь, относительное имя).
+       Относительное имя считается от входного каталога (или неизменной части шаблона),
+       чтобы при --recursive одноименные файлы из разных подкаталогов не совпадали"""
+    entries = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            root = pattern
+            if recursive:
+                candidates = glob.glob(os.path.join(pattern, "**", "*"), recursive=True)
+            else:
+                candidates = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            root = _pattern_root(pattern)
+            if not os.path.isdir(root):
+                root = os.path.dirname(root)
+            candidates = glob.glob(pattern, recursive=True)
+        for path in candidates:
+            if os.path.isfile(path) and path.lower().endswith(extensions):
+                entries.setdefault(os.path.abspath(path), os.path.relpath(path, root or "."))
+    return sorted(entries.items())
+
+
+def collect_inputs(patterns, recursive=False, extensions=IMAGE_EXTENSIONS):
+    """Список файлов изображений из каталогов и glob-шаблонов (без повторов)"""
+    return [path for path, _ in input_entries(patterns, recursive, extensions)]
+
+
+def output_path(name, output_dir, fmt=None):
+    """Путь результата для относительного имени входного файла (см. input_entries)"""
+    if fmt:
+        name = os.path.splitext(name)[0] + "." + fmt.lstrip(".")
+    return os.path.join(output_dir, name)
+
+
+def process_file(src, dst, operations, params, with_stats=False):
+    """Обработка одного файла в процессе пула: чтение, декодирование,
+       операции ImageProcessor, кодирование и запись.
+       Возвращает (байт прочитано, байт записано, сводка статистики результата или None)"""
+    data = read_bytes(src)
+    image = decode_image(data)
+    if image is None:
+        raise ValueError(f"Не удалось декодировать изображение: {src}")
+
+    # Промежуточные стадии в пакетном режиме не переиспользуются
+    processor = ImageProcessor(cache_budget=0)
+    processor.set_image(image, copy=False)
+    for method, args in operations:
+        getattr(processor, method)(*args)
+
+    encoded = encode_image(processor.output(), os.path.splitext(dst)[1], params)
+    write_bytes(encoded, dst)
+    stats = stats_summary(processor.statistics()) if with_stats else None
+    return data.nbytes, encoded.nbytes, stats
+
+
+# Метод ImageProcessor -> метод TiledImage
+TILED_METHODS = {
+    "apply_crop": "crop",
+    "apply_rotation": "rotate",
+    "show_channel": "show_channel",
+}
+
+
+def process_file_tiled(src, dst, operations, tile_size=DEFAULT_TILE_SIZE, cache_bytes=DEFAULT_TILE_CACHE):
+    """Обработка одного файла по плиткам: память ограничена кэшем плиток"""
+    image = TiledImage.open(src, tile_size, cache_bytes, directory=os.path.dirname(dst))
+    try:
+        result = image
+        for method, args in operations:
+            if method not in TILED_METHODS:
+                raise ValueError(f"Операция {method} не поддерживается в плиточном режиме")
+            result = getattr(result, TILED_METHODS[method])(*args)
+
+        tmp = dst + ".part" + os.path.splitext(dst)[1]
+        result.save(tmp)
+        os.replace(tmp, dst)
+    finally:
+        image.close()
+    return os.path.getsize(src), os.path.getsize(dst), None
+
+
+class BatchManifest:
+    """Журнал обработанных файлов для продолжения прерванного запуска"""
+
+    def __init__(self, output_dir, signature, resume):
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.signature = signature
+        self.done = set()
+        if resume and os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("ops") == signature:
+                        self.done.add((entry["src"], entry["mtime"], entry["size"]))
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+
+    @staticmethod
+    def file_state(src):
+        st = os.stat(src)
+        return src, st.st_mtime_ns, st.st_size
+
+    def is_done(self, src, dst):
+        return self.file_state(src) in self.done and os.path.exists(dst)
+
+    def record(self, src):
+        src, mtime, size = self.file_state(src)
+        self._file.write(json.dumps({"src": src, "mtime": mtime, "size": size, "ops": self.signature}) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class BatchStats:
+    """Счетчики пакетной обработки и итоговая пропускная способность"""
+
+    def __init__(self):
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.started = time.perf_counter()
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        mb_in = self.bytes_in / (1024 * 1024)
+        mb_out = self.bytes_out / (1024 * 1024)
+        return (f"Обработано: {self.processed}, пропущено: {self.skipped}, ошибок: {self.failed}\n"
+                f"Время: {elapsed:.2f} с, {self.processed / elapsed:.2f} изобр./с, "
+                f"чтение {mb_in / elapsed:.2f} МБ/с, запись {mb_out / elapsed:.2f} МБ/с")
+
+
+def run_batch(inputs, output_dir, operations, workers=None, resume=False, fmt=None,
+              quality=None, png_compression=None, recursive=False, tiled=False,
+              tile_size=DEFAULT_TILE_SIZE, tile_cache=DEFAULT_TILE_CACHE, stats_path=None, log=sys.stderr):
+    """Применяет последовательность операций ко всем входным файлам в пуле процессов.
+       В работе одновременно держится до 2*workers файлов, поэтому чтение,
+       обработка и запись разных файлов перекрываются.
+       stats_path — файл JSONL со статистикой каналов каждого результата"""
+    if tiled and stats_path:
+        raise ValueError("Статистика не поддерживается в плиточном режиме")
+    entries = input_entries(inputs, recursive, TILED_EXTENSIONS if tiled else IMAGE_EXTENSIONS)
+    destinations = {}
+    for src, name in entries:
+        dst = output_path(name, output_dir, fmt)
+        if dst in destinations:
+            raise ValueError(f"Файлы {destinations[dst]} и {src} дают один и тот же результат: {dst}")
+        destinations[dst] = src
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    signature = [[method, list(args)] for method, args in operations]
+    manifest = BatchManifest(output_dir, signature, resume)
+    stats = BatchStats()
+
+    stats_file = open(stats_path, "a" if resume else "w", encoding="utf-8") if stats_path else None
+    jobs = []
+    for dst, src in destinations.items():
+        if resume and manifest.is_done(src, dst):
+            stats.skipped += 1
+        else:
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            jobs.append((src, dst))
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = {}
+            queue = iter(jobs)
+            while True:
+                for src, dst in queue:
+                    if tiled:
+                        future = pool.submit(process_file_tiled, src, dst, operations, tile_size, tile_cache)
+                    else:
+                        params = encode_params(os.path.splitext(dst)[1], quality, png_compression)
+                        future = pool.submit(process_file, src, dst, operations, params, stats_file is not None)
+                    pending[future] = src, dst
+                    if len(pending) >= 2 * workers:
+                        break
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    src, dst = pending.pop(future)
+                    try:
+                        bytes_in, bytes_out, summary = future.result()
+                    except Exception as e:
+                        stats.failed += 1
+                        print(f"Ошибка: {src}: {e}", file=log)
+                        continue
+                    stats.processed += 1
+                    stats.bytes_in += bytes_in
+                    stats.bytes_out += bytes_out
+                    if summary is not None:
+                        stats_file.write(json.dumps({"src": src, "dst": dst, **summary}, ensure_ascii=False) + "\n")
+                    manifest.record(src)
+    finally:
+        manifest.close()
+        if stats_file is not None:
+            stats_file.close()
+    return stats
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser(
+        "batch",
+        help="пакетная обработка изображений без графического интерфейса",
+        description="Применяет последовательность операций к каталогу или glob-шаблону изображений.",
+    )
+    parser.add_argument("inputs", nargs="+", help="каталоги, файлы или glob-шаблоны")
+    parser.add_argument("-o", "--output", required=True, help="каталог для результатов")
+    parser.add_argument("--op", dest="operations", action="append", default=[], type=_operation_arg,
+                        metavar="OP", help="операция: crop:x1,y1,x2,y2 | rotate:угол | "
+                                           "channel:red|green|blue | scale:k | flip:h|v|hv | circle:x,y,r (можно повторять)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="число процессов (по умолчанию — все ядра)")
+    parser.add_argument("--resume", action="store_true", help="пропустить файлы, обработанные в прошлом запуске")
+    parser.add_argument("--recursive", action="store_true", help="искать файлы во вложенных каталогах")
+    parser.add_argument("--format", dest="fmt", default=None, help="формат результата (jpg, png, ...)")
+    parser.add_argument("--quality", type=int, default=None, help="качество JPEG (0-100)")
+    parser.add_argument("--png-compression", type=int, default=None, help="уровень сжатия PNG (0-9)")
+    parser.add_argument("--stats", dest="stats_path", default=None, metavar="FILE",
+                        help="записать в FILE (JSONL) min/max/среднее и доли недосвета/пересвета "
+                             "каналов каждого результата")
+    parser.add_argument("--tiled", action="store_true",
+                        help="обработка по плиткам для изображений больше памяти "
+                             "(.npy/.ppm/.pgm читаются и пишутся потоково)")
+    parser.add_argument("--tile-size", type=int, default=DEFAULT_TILE_SIZE, help="размер плитки в пикселях")
+    parser.add_argument("--tile-cache", type=int, default=DEFAULT_TILE_CACHE // (1024 * 1024),
+                        help="объем кэша плиток на процесс, МБ")
+    parser.set_defaults(func=main)
+    return parser
+
+
+def main(args):
+    stats = run_batch(
+        args.inputs, args.output, args.operations,
+        workers=args.workers, resume=args.resume, fmt=args.fmt,
+        quality=args.quality, png_compression=args.png_compression,
+        recursive=args.recursive, tiled=args.tiled,
+        tile_size=args.tile_size, tile_cache=args.tile_cache * 1024 * 1024,
+        stats_path=args.stats_path,
+    )
+    print(stats.summary())
+    return 1 if stats.failed else 0
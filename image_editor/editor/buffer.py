@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+
+# Политика памяти для пикселей редактора:
+# - операции не меняют вход: результат — новый массив или срез входа (обрезка)
+# - все, что хранит процессор (исходник, результаты стадий, ключевые кадры истории),
+#   доступно только для чтения, поэтому срез исходника не может его испортить
+# - кто хочет рисовать на месте, берет копию через writable()
+
+
+def freeze(image):
+    """Запрещает запись в массив (на месте, без копии) и возвращает его"""
+    image.flags.writeable = False
+    return image
+
+
+def is_frozen(image):
+    """True, если ни массив, ни массивы, чьим представлением он является, не изменяемы.
+       Представление только для чтения поверх изменяемого массива не считается замороженным:
+       владелец может изменить данные через исходный массив"""
+    while isinstance(image, np.ndarray):
+        if image.flags.writeable:
+            return False
+        image = image.base
+    return image is None or isinstance(image, bytes)
+
+
+def writable(image):
+    """Изменяемая копия (копирование при записи: оригинал не меняется)"""
+    return np.array(image, copy=True)
+
+
+def channel_frame(image, index, channels=3):
+    """Кадр из одного канала image, остальные каналы нулевые.
+       Одно выделение памяти под результат: канал копируется в него напрямую,
+       без промежуточных плоскостей split/merge"""
+    out = np.zeros(image.shape[:2] + (channels,), dtype=image.dtype)
+    cv2.mixChannels([image], [out], [index, index])
+    return out
+
+
+class ImageBuffer:
+    """Изображение с копированием при записи.
+       - array — пиксели только для чтения; срезы и представления тоже только для чтения
+       - Изменяемый массив копируется один раз при создании буфера; copy=False —
+         массив передается буферу во владение (свежедекодированный кадр) и замораживается на месте
+       - writable() — изменяемая копия для рисования на месте"""
+
+    __slots__ = ("array",)
+
+    def __init__(self, image, copy=True):
+        if copy and not is_frozen(image):
+            image = writable(image)
+        self.array = freeze(image)
+
+    def writable(self):
+        return writable(self.array)
@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+
+
+def array_nbytes(value):
+    """Размер значения в байтах (для массивов numpy — nbytes)"""
+    return getattr(value, "nbytes", 0)
+
+
+class LRUCache:
+    """Кэш с вытеснением давно неиспользованных записей.
+       - Объем ограничен бюджетом в байтах
+       - Значение больше бюджета не кэшируется
+       - Потокобезопасен: используется фоновой отрисовкой превью"""
+
+    def __init__(self, budget_bytes, size_of=array_nbytes):
+        self.budget_bytes = budget_bytes
+        self.size_of = size_of
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    @property
+    def total_bytes(self):
+        return self._total
+
+    def get(self, key, default=None):
+        """Возвращает значение и помечает его как недавно использованное"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        """Добавляет значение, вытесняя самые старые записи при нехватке бюджета"""
+        size = self.size_of(value)
+        with self._lock:
+            self.pop(key)
+            if size > self.budget_bytes:
+                return False
+
+            while self._entries and self._total + size > self.budget_bytes:
+                old_key, _ = self._entries.popitem(last=False)
+                self._total -= self._sizes.pop(old_key)
+
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._total += size
+            return True
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._total -= self._sizes.pop(key)
+            return self._entries.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total = 0
@@ -0,0 +1,166 @@
+import threading
+import time
+
+import cv2
+
+from .preview import FrameLatency
+
+DEFAULT_BUFFER_SIZE = 4
+DEFAULT_WARMUP_FRAMES = 5
+
+
+class CameraSession:
+    """Долгоживущий сеанс захвата с камеры или из видеофайла.
+       - Устройство открывается один раз, кадры читает фоновый поток
+       - Кадры пишутся в кольцевой буфер заранее выделенных массивов
+       - Первые кадры (часто недоэкспонированные) пропускаются
+       - Ведутся счетчики полученных/пропущенных кадров и задержки обработки"""
+
+    def __init__(self, source=0, buffer_size=DEFAULT_BUFFER_SIZE, warmup_frames=DEFAULT_WARMUP_FRAMES, loop=False):
+        if buffer_size < 2:
+            raise ValueError("Размер кольцевого буфера должен быть не меньше 2")
+        self.source = source
+        self.buffer_size = buffer_size
+        self.warmup_frames = warmup_frames
+        self.loop = loop
+        self.is_file = isinstance(source, str)
+
+        self.frames_grabbed = 0
+        self.frames_dropped = 0
+        self.frames_delivered = 0
+        self.latency = FrameLatency()
+        self.error = None
+
+        self._capture = None
+        self._frames = []
+        self._timestamps = []
+        self._latest = -1
+        self._seq = 0
+        self._consumed_seq = 0
+        self._running = False
+        self._cond = threading.Condition()
+        self._thread = None
+        self._started = 0.0
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def fps(self):
+        elapsed = time.perf_counter() - self._started
+        return self.frames_grabbed / elapsed if self._running and elapsed > 0 else 0.0
+
+    def start(self):
+        """Открывает устройство/файл, выделяет буфер и запускает фоновый поток"""
+        if self._running:
+            return self
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            raise RuntimeError("Не удалось подключиться к камере. Проверьте подключение.")
+
+        ok, frame = capture.read()
+        if not ok:
+            capture.release()
+            raise RuntimeError("Не удалось получить кадр с камеры")
+
+        self._capture = capture
+        self._frames = [frame] + [frame.copy() for _ in range(self.buffer_size - 1)]
+        self._timestamps = [0.0] * self.buffer_size
+        self._latest = -1
+        self._running = True
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._grab_loop, name="camera-grabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def _frame_interval(self):
+        if not self.is_file:
+            return 0.0
+        fps = self._capture.get(cv2.CAP_PROP_FPS)
+        return 1.0 / fps if fps and fps > 0 else 0.0
+
+    def _grab_loop(self):
+        interval = self._frame_interval()
+        skip = self.warmup_frames
+        slot = 0
+        next_time = time.perf_counter()
+        try:
+            while self._running:
+                # Слот для записи никогда не совпадает с последним опубликованным кадром,
+                # который может копировать потребитель
+                with self._cond:
+                    slot = (self._latest + 1) % self.buffer_size
+
+                ok, frame = self._capture.read(self._frames[slot])
+                if not ok:
+                    if self.is_file and self.loop:
+                        self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    break
+                if frame is not self._frames[slot]:
+                    # Размер кадра изменился: буфер перевыделяется под новый формат
+                    self._frames[slot] = frame
+
+                if skip > 0:
+                    skip -= 1
+                    continue
+
+                with self._cond:
+                    if self._latest >= 0 and self._consumed_seq < self._seq:
+                        self.frames_dropped += 1
+                    self._timestamps[slot] = time.perf_counter()
+                    self._latest = slot
+                    self._seq += 1
+                    self.frames_grabbed += 1
+                    self._cond.notify_all()
+
+                if interval:
+                    next_time += interval
+                    delay = next_time - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_time = time.perf_counter()
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._cond:
+                self._running = False
+                self._cond.notify_all()
+
+    def read(self, out=None, timeout=1.0, wait=True):
+        """Копия самого свежего кадра, которого потребитель еще не видел.
+           Возвращает (кадр, время захвата) или None.
+           При переданном out копирование идет в него без выделения памяти."""
+        with self._cond:
+            if wait:
+                self._cond.wait_for(lambda: self._seq > self._consumed_seq or not self._running, timeout)
+            if self._seq <= self._consumed_seq or self._latest < 0:
+                return None
+
+            frame = self._frames[self._latest]
+            if out is not None and out.shape == frame.shape and out.dtype == frame.dtype:
+                out[...] = frame
+            else:
+                out = frame.copy()
+            self._consumed_seq = self._seq
+            self.frames_delivered += 1
+            return out, self._timestamps[self._latest]
+
+    def record_latency(self, grabbed_at):
+        """Учитывает задержку от захвата кадра до его показа"""
+        self.latency.record(time.perf_counter() - grabbed_at)
+
+    def summary(self):
+        return (f"{self.fps:.0f} к/с, пропущено {self.frames_dropped}, "
+                f"задержка {self.latency.summary()}")
+
+    def close(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
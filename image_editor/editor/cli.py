@@ -0,0 +1,38 @@
+import argparse
+import sys
+
+
+def build_parser():
+    # batch и service тянут OpenCV и numpy; для запуска интерфейса парсер не строится вовсе
+    from . import batch, service
+
+    parser = argparse.ArgumentParser(
+        prog="image-editor",
+        description="Редактор изображений. Без команды запускает графический интерфейс.",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    batch.add_parser(subparsers)
+    service.add_parser(subparsers)
+    return parser
+
+
+def main(argv=None):
+    """Точка входа консольного скрипта image-editor"""
+    argv = sys.argv[1:] if argv is None else argv
+    args = build_parser().parse_args(argv) if argv else argparse.Namespace(command=None)
+    if args.command is None:
+        from .app import ImageEditorApp
+
+        app = ImageEditorApp()
+        app.run()
+        return 0
+
+    try:
+        return args.func(args)
+    except (ValueError, RuntimeError, OSError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
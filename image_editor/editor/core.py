@@ -0,0 +1,24 @@
+"""Ядро обработки без графического интерфейса.
+   - Не импортирует tkinter и PIL: пригодно для скриптов, пакетной обработки и серверов
+   - Камера подключается только при первом захвате кадра"""
+from .annotations import AnnotationLayer, SHAPES
+from .buffer import ImageBuffer, freeze, writable
+from .history import History, HistoryState
+from .image_io import read_bytes, decode_image, encode_image, encode_params, write_bytes
+from .image_processor import ImageProcessor, CHANNELS, FILTERS, MAX_SCALE, OPERATIONS
+from .pipeline import Pipeline, Stage
+from .stats import ImageStats, StatsTracker, image_stats, stats_summary
+from .tiled import TiledImage
+from .utils import validate_coordinates
+
+__all__ = [
+    "AnnotationLayer", "SHAPES",
+    "ImageBuffer", "freeze", "writable",
+    "History", "HistoryState",
+    "read_bytes", "decode_image", "encode_image", "encode_params", "write_bytes",
+    "ImageProcessor", "CHANNELS", "FILTERS", "MAX_SCALE", "OPERATIONS",
+    "Pipeline", "Stage",
+    "ImageStats", "StatsTracker", "image_stats", "stats_summary",
+    "TiledImage",
+    "validate_coordinates",
+]
@@ -0,0 +1,154 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from .instrumentation import profiler
+
+# Полосы меньше этого числа строк не выгодно отдавать в отдельный поток
+MIN_STRIP_ROWS = 64
+# Полоса не короче стольких перекрытий: лишняя работа на перекрытиях не больше ~25%
+MIN_STRIP_HALOS = 8
+# Полос больше, чем потоков: быстрые полосы не ждут медленных
+STRIPS_PER_WORKER = 4
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def _executor(workers):
+    """Общий пул потоков на каждое число потоков (создается один раз)"""
+    with _executors_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"filters-{workers}")
+            _executors[workers] = executor
+        return executor
+
+
+def strip_bounds(height, workers, halo=0):
+    """Границы горизонтальных полос [y0, y1) для заданного числа потоков"""
+    min_rows = max(MIN_STRIP_ROWS, MIN_STRIP_HALOS * halo)
+    count = max(1, min(workers * STRIPS_PER_WORKER, height // min_rows))
+    edges = np.linspace(0, height, count + 1).astype(int)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def map_strips(image, kernel, halo, workers=None, name="filter"):
+    """Применяет kernel к изображению по полосам в пуле потоков.
+       - Каждая полоса берется с перекрытием halo строк (не меньше радиуса ядра)
+         и в результат копируется без перекрытия
+       - Полосы занимают всю ширину, а на краях изображения совпадают с его краями,
+         поэтому результат побитно совпадает с kernel(image)
+       - kernel не должен менять форму и тип изображения
+       - OpenCV отпускает GIL, поэтому потоки работают параллельно"""
+    workers = default_workers() if workers is None else workers
+    h = image.shape[0]
+    bounds = strip_bounds(h, workers, halo)
+    if workers <= 1 or len(bounds) == 1:
+        with profiler.span(name):
+            return kernel(image)
+
+    out = np.empty_like(image)
+
+    def run(y0, y1):
+        s0, s1 = max(0, y0 - halo), min(h, y1 + halo)
+        with profiler.span(f"{name}[{y0}:{y1}]"):
+            out[y0:y1] = kernel(image[s0:s1])[y0 - s0:y1 - s0]
+
+    with profiler.span(name):
+        executor = _executor(workers)
+        for future in [executor.submit(run, y0, y1) for y0, y1 in bounds]:
+            future.result()
+    return out
+
+
+def gaussian_kernel_size(sigma):
+    """Нечетный размер ядра, покрывающий ±3 сигмы"""
+    return 2 * max(1, int(round(3 * sigma))) + 1
+
+
+def gaussian_blur(image, sigma, workers=None):
+    """Размытие по Гауссу"""
+    if sigma <= 0:
+        raise ValueError("Сигма должна быть положительной")
+    k = gaussian_kernel_size(sigma)
+    return map_strips(image, lambda part: cv2.GaussianBlur(part, (k, k), sigma), k // 2, workers, "gaussian_blur")
+
+
+def box_blur(image, radius, workers=None):
+    """Размытие средним по квадрату (2·radius + 1)²"""
+    radius = int(radius)
+    if radius <= 0:
+        raise ValueError("Радиус должен быть положительным")
+    k = 2 * radius + 1
+    return map_strips(image, lambda part: cv2.blur(part, (k, k)), radius, workers, "box_blur")
+
+
+def unsharp_mask(image, sigma, amount, workers=None):
+    """Повышение резкости: image + amount · (image − размытое)"""
+    if sigma <= 0:
+        raise ValueError("Сигма должна быть положительной")
+    k = gaussian_kernel_size(sigma)
+
+    def kernel(part):
+        blurred = cv2.GaussianBlur(part, (k, k), sigma)
+        return cv2.addWeighted(part, 1.0 + amount, blurred, -amount, 0)
+
+    return map_strips(image, kernel, k // 2, workers, "unsharp_mask")
+
+
+def _gray(image):
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def _like(gray, image):
+    """Возвращает серое изображение в числе каналов исходного"""
+    return gray if image.ndim == 2 else cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+
+def sobel_edges(image, workers=None):
+    """Модуль градиента Собеля (ядро 3x3), полутоновой результат"""
+    def kernel(part):
+        gray = _gray(part)
+        gx = cv2.convertScaleAbs(cv2.Sobel(gray, cv2.CV_16S, 1, 0, ksize=3))
+        gy = cv2.convertScaleAbs(cv2.Sobel(gray, cv2.CV_16S, 0, 1, ksize=3))
+        return _like(cv2.addWeighted(gx, 0.5, gy, 0.5, 0), part)
+
+    return map_strips(image, kernel, 1, workers, "sobel_edges")
+
+
+def canny_edges(image, low, high):
+    """Границы Канни.
+       Не делится на полосы: гистерезис прослеживает границы через все изображение,
+       и результат полосы зависел бы от пикселей за пределами любого перекрытия"""
+    if not 0 <= low <= high:
+        raise ValueError("Пороги должны удовлетворять 0 ≤ нижний ≤ верхний")
+    with profiler.span("cv2.Canny"):
+        return _like(cv2.Canny(_gray(image), low, high), image)
+
+
+@lru_cache(maxsize=64)
+def adjustment_lut(brightness, contrast, gamma):
+    """Таблица на 256 значений: гамма, затем контраст относительно середины и яркость"""
+    if contrast < 0 or gamma <= 0:
+        raise ValueError("Контраст не может быть отрицательным, гамма должна быть положительной")
+    x = np.arange(256, dtype=np.float64) / 255.0
+    y = 255.0 * x ** (1.0 / gamma)
+    y = (y - 127.5) * contrast + 127.5 + brightness
+    lut = np.clip(np.round(y), 0, 255).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+def adjust_colors(image, brightness, contrast, gamma, workers=None):
+    """Яркость (сдвиг), контраст (множитель) и гамма одной таблицей подстановки"""
+    lut = adjustment_lut(float(brightness), float(contrast), float(gamma))
+    return map_strips(image, lambda part: cv2.LUT(part, lut), 0, workers, "adjust_colors")
@@ -0,0 +1,180 @@
+import cv2
+import numpy as np
+
+from .instrumentation import profiler
+
+
+def _translation(dx, dy):
+    return np.array([[1, 0, dx], [0, 1, dy], [0, 0, 1]], dtype=np.float64)
+
+
+def crop_transform(w, h, x1, y1, x2, y2):
+    if x2 > w or y2 > h:
+        raise ValueError(f"Координаты выходят за границы изображения ({w}x{h})")
+    return _translation(-x1, -y1), (x2 - x1, y2 - y1)
+
+
+def rotation_transform(w, h, angle):
+    M = np.vstack([cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0), [0, 0, 1]])
+    return M, (w, h)
+
+
+def scaled_size(w, h, factor):
+    return max(1, round(w * factor)), max(1, round(h * factor))
+
+
+def scale_transform(w, h, factor):
+    """Масштаб с тем же соответствием центров пикселей, что у cv2.resize"""
+    out_w, out_h = scaled_size(w, h, factor)
+    sx, sy = out_w / w, out_h / h
+    M = np.array([[sx, 0, 0.5 * sx - 0.5], [0, sy, 0.5 * sy - 0.5], [0, 0, 1]], dtype=np.float64)
+    return M, (out_w, out_h)
+
+
+def flip_transform(w, h, horizontal, vertical):
+    M = np.eye(3)
+    if horizontal:
+        M[0, 0], M[0, 2] = -1, w - 1
+    if vertical:
+        M[1, 1], M[1, 2] = -1, h - 1
+    return M, (w, h)
+
+
+# Геометрические операции: имя стадии -> (ширина, высота, *параметры) -> (матрица 3x3, размер результата)
+TRANSFORMS = {
+    "crop": crop_transform,
+    "rotation": rotation_transform,
+    "scale": scale_transform,
+    "flip": flip_transform,
+}
+
+
+def compose(stages, width, height):
+    """Сводит цепочку геометрических стадий к аффинным матрицам.
+       Возвращает список (матрица 3x3 от исходника к результату стадии, размер результата);
+       последний элемент — итоговое преобразование. Границы проверяются по ходу цепочки"""
+    M = np.eye(3)
+    size = (width, height)
+    steps = []
+    for stage in stages:
+        step, size = TRANSFORMS[stage.name](size[0], size[1], *stage.params)
+        M = step @ M
+        steps.append((M, size))
+    return steps
+
+
+def _rotation_coverage(steps, stages, width, height, out_size):
+    """Доля (0..255) каждого выходного пикселя, попавшая внутрь кадров, которые поворачивались.
+       Последовательный rotate_image добавляет черные углы, а на краю кадра билинейно
+       смешивает пиксели с черным. Деформация всего кадра из 255 по тому же
+       преобразованию с постоянной (нулевой) границей дает ту же долю смешивания"""
+    M_total = steps[-1][0]
+    coverage = None
+    for i, stage in enumerate(stages):
+        if stage.name != "rotation":
+            continue
+        M_before, (w, h) = steps[i - 1] if i else (np.eye(3), (width, height))
+        to_out = M_total @ np.linalg.inv(M_before)
+        frame = np.full((h, w), 255, dtype=np.uint8)
+        layer = cv2.warpAffine(frame, to_out[:2], out_size, flags=cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+        coverage = layer if coverage is None else cv2.multiply(coverage, layer, scale=1 / 255)
+    return coverage
+
+
+def warp_stages(image, stages):
+    """Выполняет цепочку обрезки/поворота/масштаба/отражения как можно меньшим числом
+       деформаций (см. _warp_run). Цепочка делится там, где одна деформация перестала бы
+       совпадать с последовательным выполнением:
+       - после обрезки: следующие стадии должны видеть край обрезанного кадра,
+         а не пиксели за ним (обрезка в конце участка лишь ограничивает выходную область)
+       - на уменьшении: оно выполняется через cv2.resize, как в последовательной цепочке,
+         потому что одна билинейная выборка с шагом больше пикселя пропускает пиксели
+         источника, а последовательные уменьшения их усредняют
+       Допуск отличий от последовательного выполнения проверяет benchmarks/bench_geometry.py"""
+    run = []
+    for stage in stages:
+        if stage.name == "scale" and stage.params[0] < 1:
+            image = _resize(_warp_run(image, run), stage.params[0])
+            run = []
+            continue
+        run.append(stage)
+        if stage.name == "crop":
+            image = _warp_run(image, run)
+            run = []
+    return _warp_run(image, run)
+
+
+# Стадии, которые интерполируют пиксели; обрезка и отражение только переставляют их
+RESAMPLING = ("rotation", "scale")
+
+
+def _resize(image, factor):
+    h, w = image.shape[:2]
+    with profiler.span("cv2.resize"):
+        return cv2.resize(image, scaled_size(w, h, factor), interpolation=cv2.INTER_LINEAR)
+
+
+def _flip(image, horizontal, vertical):
+    if horizontal or vertical:
+        return cv2.flip(image, -1 if horizontal and vertical else 1 if horizontal else 0)
+    return image
+
+
+def _warp_run(image, stages):
+    """Участок цепочки без уменьшений, обрезка — только в начале или в конце.
+       - Ведущая обрезка выполняется срезом без копирования
+       - Без интерполяции или с одним увеличением стадии выполняются по очереди:
+         cv2.flip и cv2.resize быстрее warpAffine и совпадают с последовательными
+       - Один поворот вместе с отражениями и конечной обрезкой — один warpAffine
+         с черной границей, как у rotate_image: перестановки пикселей точно сводятся в матрицу
+       - Несколько поворотов без увеличения делятся на участки по одному повороту
+       - Увеличение вместе с другими интерполяциями — один warpAffine: одна интерполяция и только выходная
+         область. Край кадра повторяется (BORDER_REPLICATE), как у cv2.resize
+         в последовательном масштабе, поэтому увеличение не затемняет края; черные углы
+         поворотов и смешивание с ними на краю воспроизводятся маской покрытия"""
+    stages = list(stages)
+    while stages and stages[0].name == "crop":
+        h, w = image.shape[:2]
+        _, (x1, y1, x2, y2) = stages.pop(0)
+        crop_transform(w, h, x1, y1, x2, y2)
+        image = image[y1:y2, x1:x2]
+    if not stages:
+        return image
+
+    resampling = [stage.name for stage in stages if stage.name in RESAMPLING]
+    if resampling in ([], ["scale"]):
+        for name, params in stages:
+            if name == "crop":
+                h, w = image.shape[:2]
+                x1, y1, x2, y2 = params
+                crop_transform(w, h, x1, y1, x2, y2)
+                image = image[y1:y2, x1:x2]
+            elif name == "flip":
+                image = _flip(image, *params)
+            else:
+                image = _resize(image, *params)
+        return image
+
+    if "scale" not in resampling and len(resampling) > 1:
+        # Одни повороты: маски покрытия стоят дороже сэкономленной деформации
+        second = [i for i, stage in enumerate(stages) if stage.name == "rotation"][1]
+        return _warp_run(_warp_run(image, stages[:second]), stages[second:])
+
+    h, w = image.shape[:2]
+    steps = compose(stages, w, h)
+    M, out_size = steps[-1]
+
+    if resampling == ["rotation"]:
+        with profiler.span("cv2.warpAffine"):
+            return cv2.warpAffine(image, M[:2], out_size, flags=cv2.INTER_LINEAR)
+
+    with profiler.span("cv2.warpAffine"):
+        result = cv2.warpAffine(image, M[:2], out_size, flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+    coverage = _rotation_coverage(steps, stages, w, h, out_size)
+    if coverage is not None:
+        if result.ndim == 3:
+            coverage = cv2.merge([coverage] * result.shape[2])
+        result = cv2.multiply(result, coverage, scale=1 / 255)
+    return result
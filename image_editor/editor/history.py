@@ -0,0 +1,172 @@
+import threading
+import weakref
+from collections import deque, namedtuple
+
+import cv2
+
+DEFAULT_HISTORY_BUDGET = 256 * 1024 * 1024
+
+# Состояние редактора: идентификатор исходного изображения, стадии конвейера
+# и снимок слоя аннотаций (число записей и маска видимости)
+HistoryState = namedtuple("HistoryState", ["source", "stages", "annotations"], defaults=((0, b""),))
+
+# Оценка накладных расходов на одну запись истории
+STATE_OVERHEAD = 256
+
+
+def state_nbytes(state):
+    """Примерный размер параметрической записи истории"""
+    return STATE_OVERHEAD + 64 * len(state.stages) + len(state.annotations[1])
+
+
+class Keyframe:
+    """Пиксели исходного изображения для истории.
+       - Пока изображение текущее, хранится ссылка на него (без копии)
+       - При смене источника сжимается в PNG без потерь (см. History.park, в фоновом потоке);
+         после сжатия остается слабая ссылка: пока массив жив (например, в кэше
+         декодированных кадров сессии), он возвращается без распаковки и лишней памяти
+       - Иначе при возврате распаковывается один раз"""
+
+    def __init__(self, image):
+        self.image = image
+        self.data = None
+        self.refs = 0
+        self._ref = None
+
+    @property
+    def nbytes(self):
+        # Текущее изображение принадлежит ImageProcessor и в бюджет истории не входит
+        return self.data.nbytes if self.data is not None else 0
+
+    def compress(self):
+        # Может выполняться в фоновом потоке одновременно с restore(): сжатые данные
+        # и слабая ссылка появляются раньше, чем снимается сильная ссылка
+        image = self.image
+        if image is None:
+            return
+        if self.data is None:
+            ok, data = cv2.imencode(".png", image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+            if not ok:
+                raise RuntimeError("Не удалось сжать снимок истории")
+            self.data = data
+        self._ref = weakref.ref(image)
+        self.image = None
+
+    def restore(self):
+        image = self.image
+        if image is None:
+            image = self._ref() if self._ref is not None else None
+            if image is None:
+                image = cv2.imdecode(self.data, cv2.IMREAD_UNCHANGED)
+            self.image = image
+        return image
+
+
+class History:
+    """История отмены/повтора с ограничением по памяти.
+       - Операции хранятся как параметры стадий конвейера
+       - Пиксели хранятся только для исходных изображений (ключевые кадры)
+       - При превышении бюджета удаляются самые старые записи
+       - Отмена и повтор выполняются за O(1) независимо от глубины истории"""
+
+    def __init__(self, budget_bytes=DEFAULT_HISTORY_BUDGET):
+        self.budget_bytes = budget_bytes
+        self.current = None
+        self._undo = deque()
+        self._redo = []
+        self._keyframes = {}
+        self._total = 0
+
+    @property
+    def total_bytes(self):
+        return self._total + sum(k.nbytes for k in self._keyframes.values())
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def __len__(self):
+        return len(self._undo) + len(self._redo) + (self.current is not None)
+
+    def add_keyframe(self, source, image):
+        """Регистрирует пиксели нового исходного изображения"""
+        self._keyframes[source] = Keyframe(image)
+
+    def keyframe_image(self, source):
+        return self._keyframes[source].restore()
+
+    def park(self):
+        """Документ с этой историей уходит из редактора: ключевой кадр текущего
+           источника сжимается, как при смене источника"""
+        if self.current is not None:
+            self._compress(self.current.source)
+
+    def clear(self):
+        self.current = None
+        self._undo.clear()
+        self._redo.clear()
+        self._keyframes.clear()
+        self._total = 0
+
+    def push(self, state):
+        """Записывает новое состояние; ветка повтора сбрасывается"""
+        if state == self.current:
+            return
+        if self.current is not None:
+            self._undo.append(self.current)
+        while self._redo:
+            self._release(self._redo.pop())
+        self._switch(state)
+        self._retain(state)
+        self._evict()
+
+    def undo(self):
+        if not self._undo:
+            return None
+        self._redo.append(self.current)
+        self._switch(self._undo.pop())
+        return self.current
+
+    def redo(self):
+        if not self._redo:
+            return None
+        self._undo.append(self.current)
+        self._switch(self._redo.pop())
+        return self.current
+
+    def _switch(self, state):
+        """Делает состояние текущим; ключевой кадр прежнего источника сжимается"""
+        previous = self.current
+        self.current = state
+        if previous is not None and previous.source != state.source:
+            self._compress(previous.source)
+
+    def _compress(self, source):
+        """Сжимает ключевой кадр в фоновом потоке: PNG большого кадра — сотни миллисекунд,
+           и поток Tk их не ждет. Поток не фоновый для интерпретатора (daemon=False):
+           завершение процесса посреди cv2.imencode аварийно"""
+        keyframe = self._keyframes.get(source)
+        if keyframe is not None and keyframe.image is not None:
+            threading.Thread(target=keyframe.compress, name="history-compress").start()
+
+    def _retain(self, state):
+        self._total += state_nbytes(state)
+        keyframe = self._keyframes.get(state.source)
+        if keyframe is not None:
+            keyframe.refs += 1
+
+    def _release(self, state):
+        self._total -= state_nbytes(state)
+        keyframe = self._keyframes.get(state.source)
+        if keyframe is not None:
+            keyframe.refs -= 1
+            if keyframe.refs <= 0:
+                del self._keyframes[state.source]
+
+    def _evict(self):
+        while self._undo and self.total_bytes > self.budget_bytes:
+            self._release(self._undo.popleft())
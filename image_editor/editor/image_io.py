@@ -0,0 +1,66 @@
+import os
+
+import cv2
+import numpy as np
+
+from .instrumentation import profiler
+
+# Уменьшенное декодирование: JPEG декодируется сразу в 1/2, 1/4 или 1/8 размера
+REDUCED_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# Файлы меньше этого размера декодируются сразу целиком
+PROGRESSIVE_MIN_BYTES = 1024 * 1024
+
+
+def read_bytes(file_path):
+    """Читает файл целиком (в отличие от cv2.imread работает с путями не в ASCII)"""
+    with profiler.span("read_bytes"):
+        return np.fromfile(file_path, dtype=np.uint8)
+
+
+def is_jpeg(data):
+    return data.size > 2 and data[0] == 0xFF and data[1] == 0xD8
+
+
+def decode_image(data, reduction=1):
+    """Декодирует изображение из байтов; reduction — 1, 2, 4 или 8"""
+    flags = REDUCED_FLAGS.get(reduction, cv2.IMREAD_COLOR)
+    with profiler.span("cv2.imdecode"):
+        return cv2.imdecode(data, flags)
+
+
+def preview_reduction(data):
+    """Коэффициент быстрого предварительного декодирования или None, если оно не нужно.
+       Ускорение дает только JPEG: он масштабируется на этапе обратного DCT"""
+    if not is_jpeg(data) or data.size < PROGRESSIVE_MIN_BYTES:
+        return None
+    return 8 if data.size >= 8 * PROGRESSIVE_MIN_BYTES else 4
+
+
+def encode_params(ext, quality=None, png_compression=None):
+    """Параметры кодирования для выбранного формата"""
+    ext = ext.lower()
+    if ext in (".jpg", ".jpeg") and quality is not None:
+        return [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    if ext == ".png" and png_compression is not None:
+        return [cv2.IMWRITE_PNG_COMPRESSION, int(png_compression)]
+    return []
+
+
+def encode_image(image, ext, params=()):
+    with profiler.span("cv2.imencode"):
+        ok, data = cv2.imencode(ext, image, list(params))
+    if not ok:
+        raise RuntimeError(f"Не удалось закодировать изображение в формат {ext}")
+    return data
+
+
+def write_bytes(data, file_path):
+    """Запись через временный файл: при ошибке прежний файл не портится"""
+    tmp = file_path + ".part"
+    data.tofile(tmp)
+    os.replace(tmp, file_path)
@@ -1,30 +1,170 @@
+import os
+import threading
+
 import cv2
-import numpy as np
+
+from .annotations import AnnotationLayer, DEFAULT_COLOR, DEFAULT_THICKNESS
+from .buffer import ImageBuffer, channel_frame, freeze
+from .filters import gaussian_blur, box_blur, unsharp_mask, sobel_edges, canny_edges, adjust_colors
+from .image_io import read_bytes, decode_image, encode_params, encode_image, write_bytes
+from .instrumentation import instrumented, profiler
+from .history import History, HistoryState, DEFAULT_HISTORY_BUDGET
+from .geometry import TRANSFORMS, scaled_size, warp_stages
+from .pipeline import Pipeline, Stage, DEFAULT_CACHE_BUDGET
+from .stats import StatsTracker
+
+PREVIEW_MAX_SIDE = 1024
+MAX_SCALE = 8.0
+
+# Индекс канала в порядке хранения OpenCV (BGR)
+CHANNEL_INDEX = {"Синий": 0, "Зеленый": 1, "Красный": 2}
+
+
+def crop_image(image, x1, y1, x2, y2):
+    """Вырезает прямоугольную область (без копирования данных)"""
+    h, w = image.shape[:2]
+    if x2 > w or y2 > h:
+        raise ValueError(f"Координаты выходят за границы изображения ({w}x{h})")
+    return image[y1:y2, x1:x2]
+
+
+def rotate_image(image, angle):
+    """Поворачивает изображение вокруг центра с сохранением размеров"""
+    (h, w) = image.shape[:2]
+    center = (w // 2, h // 2)
+
+    M = cv2.getRotationMatrix2D(center, angle, 1.0)
+    with profiler.span("cv2.warpAffine"):
+        return cv2.warpAffine(image, M, (w, h))
+
+
+def scale_image(image, factor):
+    """Масштабирование с билинейной интерполяцией"""
+    h, w = image.shape[:2]
+    with profiler.span("cv2.resize"):
+        return cv2.resize(image, scaled_size(w, h, factor), interpolation=cv2.INTER_LINEAR)
+
+
+def flip_image(image, horizontal, vertical):
+    """Отражение по горизонтали и/или вертикали"""
+    if horizontal and vertical:
+        return cv2.flip(image, -1)
+    if horizontal:
+        return cv2.flip(image, 1)
+    if vertical:
+        return cv2.flip(image, 0)
+    return image
+
+
+def isolate_channel(image, channel):
+    """Оставляет один цветовой канал, остальные обнуляются.
+       Результат — трехканальный кадр, выделяемый один раз (см. buffer.channel_frame)"""
+    if channel not in CHANNEL_INDEX:
+        raise ValueError(f"Неизвестный канал: {channel}")
+    if image.ndim != 3 or image.shape[2] < 3:
+        raise ValueError("Выбор канала доступен только для цветных изображений")
+
+    with profiler.span("channel_frame"):
+        return channel_frame(image, CHANNEL_INDEX[channel])
+
+
+def scale_coordinates(params, factor):
+    """Масштабирует целочисленные координаты/радиус для уменьшенной копии"""
+    return tuple(int(v * factor) for v in params)
+
+
+def scale_crop(params, factor):
+    x1, y1, x2, y2 = scale_coordinates(params, factor)
+    return x1, y1, max(x2, x1 + 1), max(y2, y1 + 1)
+
+
+def scale_sigma(params, factor):
+    """Сигма размытия для уменьшенной копии (остальные параметры не меняются)"""
+    return (max(0.3, params[0] * factor),) + tuple(params[1:])
+
+
+def scale_radius(params, factor):
+    return (max(1, round(params[0] * factor)),)
+
+
+OPERATIONS = {
+    "channel": isolate_channel,
+    "crop": crop_image,
+    "rotation": rotate_image,
+    "scale": scale_image,
+    "flip": flip_image,
+    "gaussian_blur": gaussian_blur,
+    "box_blur": box_blur,
+    "sharpen": unsharp_mask,
+    "sobel": sobel_edges,
+    "canny": canny_edges,
+    "adjust": adjust_colors,
+}
+
+# Фильтры: имя стадии -> типы параметров
+FILTERS = {
+    "gaussian_blur": (float,),       # сигма
+    "box_blur": (int,),              # радиус
+    "sharpen": (float, float),       # сигма, сила
+    "sobel": (),
+    "canny": (int, int),             # нижний и верхний пороги
+}
+
+# Пересчет параметров стадий для превью на уменьшенной копии
+PREVIEW_SCALERS = {
+    "crop": scale_crop,
+    "gaussian_blur": scale_sigma,
+    "box_blur": scale_radius,
+    "sharpen": scale_sigma,
+}
+
+CHANNELS = ("Оригинал", "Красный", "Зеленый", "Синий")
 
 
 class ImageProcessor:
-    def __init__(self):
+    def __init__(self, cache_budget=DEFAULT_CACHE_BUDGET, history_budget=DEFAULT_HISTORY_BUDGET,
+                 share_results=False):
         self.image = None
-        self.original_image = None
+        # Исходник (buffer.ImageBuffer): пиксели только для чтения, принадлежат процессору
+        self.source = None
         self.current_channel = "Оригинал"
+        # Подряд идущие обрезка/поворот/масштаб/отражение сводятся в один warpAffine
+        self.pipeline = Pipeline(OPERATIONS, cache_budget, fusable=TRANSFORMS, fuse=warp_stages)
+        self._source_version = 0
+        self._version_counter = 0
+        self._proxy = None
+        # Исходник, его версия и фигуры меняются в потоке Tk, а превью читает их
+        # из фонового потока: и запись, и чтение идут под этой блокировкой
+        self._lock = threading.Lock()
+        self.history = History(history_budget)
+        # Фигуры поверх результата конвейера; сводятся с ним при показе и сохранении
+        self.annotations = AnnotationLayer()
+        self.stats = StatsTracker()
+        # True — операции возвращают display_output() без копии (интерфейс сам
+        # перерисовывает измененные области); иначе — независимый output()
+        self.share_results = share_results
+        self._stats_generation = 0
+        self.camera = None
 
+    @instrumented()
     def load_image(self, file_path):
         """Загрузка изображения с обработкой ошибок"""
         try:
             if not file_path:
                 raise ValueError("Путь к файлу не указан")
 
-            self.original_image = cv2.imread(file_path)
-            if self.original_image is None:
+            image = decode_image(read_bytes(file_path))
+            if image is None:
                 raise ValueError(f"Не удалось загрузить изображение по пути: {file_path}")
 
-            self.image = self.original_image.copy()
-            return self.image
+            self._set_source(ImageBuffer(image, copy=False))
+            return self._result()
         except Exception as e:
             raise RuntimeError(f"Ошибка загрузки изображения: {str(e)}")
 
-    def save_image(self, file_path):
-        """Сохранение изображения"""
+    @instrumented()
+    def save_image(self, file_path, quality=None, png_compression=None):
+        """Сохранение изображения (quality — качество JPEG 0-100, png_compression — 0-9)"""
         try:
             if self.image is None:
                 raise ValueError("Нет изображения для сохранения")
@@ -32,97 +172,329 @@ class ImageProcessor:
             if not file_path:
                 raise ValueError("Путь для сохранения не указан")
 
-            if not cv2.imwrite(file_path, self.image):
-                raise RuntimeError("Ошибка при сохранении файла")
-
+            ext = os.path.splitext(file_path)[1]
+            data = encode_image(self.display_output(), ext, encode_params(ext, quality, png_compression))
+            write_bytes(data, file_path)
             return True
         except Exception as e:
             raise RuntimeError(f"Ошибка сохранения изображения: {str(e)}")
 
-    def capture_from_camera(self):
-        """Захват с камеры"""
-        try:
-            cap = cv2.VideoCapture(0)
-            if not cap.isOpened():
-                raise RuntimeError("Не удалось подключиться к камере. Проверьте подключение.")
+    def open_camera(self, source=0):
+        """Открывает долгоживущий сеанс захвата (индекс устройства или путь к видеофайлу)"""
+        from .camera import CameraSession
+
+        if self.camera is not None and self.camera.running and self.camera.source == source:
+            return self.camera
+        self.close_camera()
+        self.camera = CameraSession(source).start()
+        return self.camera
 
-            ret, frame = cap.read()
-            cap.release()
+    def close_camera(self):
+        if self.camera is not None:
+            self.camera.close()
+            self.camera = None
 
-            if not ret:
+    def release(self):
+        """Забывает изображение, стадии, аннотации и историю.
+           После вызова процессор не держит ссылок на пиксели и готов к новому изображению"""
+        self.image = None
+        with self._lock:
+            self.source = None
+            self._proxy = None
+            self.annotations = AnnotationLayer()
+        self.pipeline.clear()
+        self.pipeline.cache.clear()
+        self._stats_generation = 0
+        self.stats.clear()
+        self.history.clear()
+        self.current_channel = "Оригинал"
+
+    @instrumented()
+    def capture_from_camera(self, source=0, keep_stages=False):
+        """Захват с камеры (keep_stages — применить к снимку текущие настройки)"""
+        try:
+            camera = self.open_camera(source)
+            result = camera.read()
+            if result is None:
                 raise RuntimeError("Не удалось получить кадр с камеры")
 
-            self.original_image = frame
-            self.image = self.original_image.copy()
-            return self.image
+            frame, _ = result
+            # read() уже вернул копию кадра из кольцевого буфера камеры
+            self._set_source(ImageBuffer(frame, copy=False), self.pipeline.stages if keep_stages else ())
+            return self._result()
         except Exception as e:
             raise RuntimeError(f"Ошибка захвата с камеры: {str(e)}")
 
+    @instrumented()
+    def render_frame(self, frame):
+        """Применяет текущие настройки (канал, поворот, обрезку) к кадру видеопотока"""
+        return self.pipeline.render(frame, None, use_cache=False)
+
+    @instrumented()
+    def set_image(self, image, stages=(), annotations=None, copy=True, history=None):
+        """Установка исходного изображения из массива (камера, пакетная обработка, сессия).
+           stages и annotations — состояние, сохраненное для этого изображения
+           (при переключении документов, см. document_state).
+           Изменяемый массив копируется, чтобы последующие изменения у вызывающего
+           не попали в документ и историю; copy=False — массив передается процессору
+           во владение и становится доступен только для чтения.
+           history — история документа (см. ImageSession.switch): заменяет историю процессора,
+           поэтому отмена не переходит на другой документ. Если в ней уже есть состояние,
+           документ восстанавливается из нее, а image не используется"""
+        try:
+            if image is None or getattr(image, "ndim", 0) not in (2, 3):
+                raise ValueError("Ожидается изображение в виде массива numpy")
+
+            if history is not None:
+                self.history = history
+                if history.current is not None:
+                    return self._restore_state(history.current)
+            self._set_source(ImageBuffer(image, copy), stages, annotations)
+            return self._result()
+        except Exception as e:
+            raise RuntimeError(f"Ошибка установки изображения: {str(e)}")
+
+    def _set_source(self, source, stages=(), annotations=None):
+        """Устанавливает новый исходник (ImageBuffer), заменяет стадии конвейера и аннотации"""
+        with self._lock:
+            self.source = source
+            self._version_counter += 1
+            self._source_version = self._version_counter
+            self._proxy = None
+        self.pipeline.stages = list(stages)
+        channel = self.pipeline.get_stage("channel")
+        self.current_channel = channel.params[0] if channel else "Оригинал"
+        # Без стадий результат — сам исходник: он только для чтения, копия не нужна
+        self.image = self.render()
+        with self._lock:
+            if annotations is None:
+                self.annotations.clear()
+            else:
+                self.annotations.restore(annotations)
+        self.history.add_keyframe(self._source_version, source.array)
+        self._record_history()
+
+    def _record_history(self):
+        self.history.push(HistoryState(self._source_version, tuple(self.pipeline.stages),
+                                       self.annotations.snapshot()))
+
+    def _restore_state(self, state):
+        """Восстанавливает исходник и стадии из записи истории"""
+        if state.source != self._source_version:
+            source = ImageBuffer(self.history.keyframe_image(state.source), copy=False)
+            with self._lock:
+                self.source = source
+                self._source_version = state.source
+                self._proxy = None
+        self.pipeline.stages = list(state.stages)
+        channel = self.pipeline.get_stage("channel")
+        self.current_channel = channel.params[0] if channel else "Оригинал"
+        self.image = self.render()
+        with self._lock:
+            self.annotations.restore(state.annotations)
+        return self._result()
+
+    @instrumented()
+    def undo(self):
+        """Отмена последней операции"""
+        try:
+            state = self.history.undo()
+            return None if state is None else self._restore_state(state)
+        except Exception as e:
+            raise RuntimeError(f"Ошибка отмены операции: {str(e)}")
+
+    @instrumented()
+    def redo(self):
+        """Повтор отмененной операции"""
+        try:
+            state = self.history.redo()
+            return None if state is None else self._restore_state(state)
+        except Exception as e:
+            raise RuntimeError(f"Ошибка повтора операции: {str(e)}")
+
+    @property
+    def original_image(self):
+        """Пиксели исходника (только для чтения) или None"""
+        return None if self.source is None else self.source.array
+
+    def output(self):
+        """Результат конвейера с наложенными аннотациями (для сохранения и вызывающих).
+           Массив только для чтения, последующие правки его не меняют: при наличии
+           аннотаций возвращается копия буфера слоя (см. display_output)"""
+        output = self.display_output()
+        if output is None or output is self.image:
+            return output
+        return freeze(output.copy())
+
+    def display_output(self):
+        """То же, что output(), но без копии: буфер слоя аннотаций, который обновляется
+           на месте при их правке. Только для показа и статистики, которые перерисовывают
+           изменившиеся области (annotations.changes_since) и не хранят прежний кадр"""
+        if self.image is None:
+            return None
+        return self.annotations.composite(self.image)
+
+    def _result(self):
+        """Результат операции: output() или display_output() (см. share_results)"""
+        return self.display_output() if self.share_results else self.output()
+
+    @instrumented()
+    def statistics(self):
+        """Гистограммы и статистика каналов результата с аннотациями (stats.ImageStats).
+           - Считается по прореженной выборке и кэшируется по состоянию документа
+           - После правки аннотаций пересчитываются только измененные области"""
+        try:
+            if self.image is None:
+                raise ValueError("Изображение не загружено")
+
+            output = self.display_output()
+            layer = self.annotations
+            dirty = layer.changes_since(self._stats_generation)
+            self._stats_generation = layer.generation
+            key = (self.source_key, tuple(self.pipeline.stages), layer.snapshot())
+            return self.stats.update(output, key, dirty)
+        except ValueError as ve:
+            raise ValueError(f"Ошибка расчета статистики: {str(ve)}")
+
+    def document_state(self):
+        """Состояние документа для set_image: стадии конвейера и снимок аннотаций"""
+        return tuple(self.pipeline.stages), self.annotations.snapshot()
+
+    @property
+    def source_key(self):
+        return ("source", self._source_version)
+
+    def render(self):
+        """Пересчитывает результат конвейера (с использованием кэша стадий)"""
+        if self.original_image is None:
+            raise ValueError("Изображение не загружено")
+        return self.pipeline.render(self.original_image, self.source_key)
+
+    def preview_stages(self, name, params):
+        """Копия стадий конвейера с подставленными параметрами одной стадии"""
+        stages = list(self.pipeline.stages)
+        stage = Stage(name, tuple(params))
+        i = self.pipeline.index_of(name)
+        if i >= 0:
+            stages[i] = stage
+        else:
+            stages.append(stage)
+        return stages
+
+    def _preview_source(self):
+        """(версия, уменьшенная копия исходника, множитель, фигуры в масштабе копии) или None.
+           - Версия, исходник и фигуры читаются вместе под блокировкой, поэтому правка
+             из потока Tk не сочетает новую версию со старым исходником
+           - Копия создается один раз на источник (вне блокировки); сохраняется, только
+             если источник за это время не сменился"""
+        with self._lock:
+            version, source, proxy = self._source_version, self.original_image, self._proxy
+            if source is None:
+                return None
+            h, w = source.shape[:2]
+            factor = min(1.0, PREVIEW_MAX_SIDE / max(h, w))
+            annotations = self.annotations.scaled(factor)
+        if proxy is None or proxy[0] != version:
+            proxy = source
+            if factor < 1.0:
+                size = (max(1, round(w * factor)), max(1, round(h * factor)))
+                proxy = freeze(cv2.resize(source, size, interpolation=cv2.INTER_AREA))
+            proxy = (version, proxy, factor)
+            with self._lock:
+                if self._source_version == version:
+                    self._proxy = proxy
+        return proxy + (annotations,)
+
+    @instrumented()
+    def render_preview(self, stages):
+        """Отрисовка стадий на уменьшенной копии с наложенными аннотациями
+           (может вызываться из фонового потока)"""
+        preview = self._preview_source()
+        if preview is None:
+            return None
+        version, proxy, factor, annotations = preview
+        scaled = [
+            Stage(st.name, PREVIEW_SCALERS[st.name](st.params, factor))
+            if st.name in PREVIEW_SCALERS else st
+            for st in stages
+        ]
+        # Фигуры заданы в координатах результата, поэтому накладываются поверх кадра превью
+        return annotations.composite(self.pipeline.render(proxy, ("proxy", version), scaled))
+
+    def _apply_stage(self, name, params):
+        """Добавляет/изменяет стадию; при ошибке конвейер возвращается в прежнее состояние"""
+        previous = list(self.pipeline.stages)
+        self.pipeline.set_stage(name, params)
+        try:
+            self.image = self.render()
+        except Exception:
+            self.pipeline.stages = previous
+            raise
+        self._record_history()
+        return self._result()
+
+    @instrumented()
     def reset_image(self):
         """Сброс к исходному изображению"""
         try:
             if self.original_image is None:
                 raise ValueError("Нет загруженного изображения")
 
-            self.image = self.original_image.copy()
+            self.pipeline.clear()
+            self.image = self.render()
             self.current_channel = "Оригинал"
-            return self.image
+            with self._lock:
+                self.annotations.clear()
+            self._record_history()
+            return self._result()
         except Exception as e:
             raise RuntimeError(f"Ошибка сброса изображения: {str(e)}")
 
+    @instrumented()
     def show_channel(self, channel):
         """Отображение цветового канала"""
         try:
             if self.original_image is None:
                 raise ValueError("Изображение не загружено")
-
-            self.current_channel = channel
+            if channel not in CHANNELS:
+                raise ValueError(f"Неизвестный канал: {channel}")
 
             if channel == "Оригинал":
-                self.image = self.original_image.copy()
+                self.pipeline.remove_stage("channel")
+                self.image = self.render()
+                self._record_history()
             else:
-                channels = cv2.split(self.original_image)
-                blank = np.zeros_like(channels[0])
-
-                if channel == "Красный":
-                    self.image = cv2.merge([blank, blank, channels[2]])
-                elif channel == "Зеленый":
-                    self.image = cv2.merge([blank, channels[1], blank])
-                elif channel == "Синий":
-                    self.image = cv2.merge([channels[0], blank, blank])
-                else:
-                    raise ValueError(f"Неизвестный канал: {channel}")
-
-            return self.image
+                self._apply_stage("channel", (channel,))
+
+            self.current_channel = channel
+            return self._result()
         except ValueError as ve:
             raise ValueError(f"Ошибка выбора канала: {str(ve)}")
         except Exception as e:
             raise RuntimeError(f"Ошибка обработки цветового канала: {str(e)}")
 
+    @instrumented()
     def apply_crop(self, x1, y1, x2, y2):
-        """Обрезка изображения с валидацией координат"""
+        """Обрезка изображения"""
         try:
             if self.original_image is None:
                 raise ValueError("Изображение не загружено")
 
             # Валидация координат
             x1, y1, x2, y2 = map(int, [x1, y1, x2, y2])
-            h, w = self.original_image.shape[:2]
 
-            if any(coord < 0 for coord in [x1, y1, x2, y2]):
+            if x1 < 0 or y1 < 0:
                 raise ValueError("Координаты не могут быть отрицательными")
             if x1 >= x2 or y1 >= y2:
                 raise ValueError("Некорректные координаты: x2 должно быть > x1, y2 > y1")
-            if x2 > w or y2 > h:
-                raise ValueError(f"Координаты выходят за границы изображения ({w}x{h})")
 
-            self.image = self.original_image[y1:y2, x1:x2]
-            return self.image
+            return self._apply_stage("crop", (x1, y1, x2, y2))
         except ValueError as ve:
             raise ValueError(f"Ошибка в параметрах обрезки: {str(ve)}")
         except Exception as e:
             raise RuntimeError(f"Ошибка при обрезке изображения: {str(e)}")
 
+    @instrumented()
     def apply_rotation(self, angle):
         """Поворот изображения"""
         try:
@@ -130,37 +502,177 @@ class ImageProcessor:
                 raise ValueError("Изображение не загружено")
 
             angle = float(angle)
-            (h, w) = self.original_image.shape[:2]
-            center = (w // 2, h // 2)
-
-            M = cv2.getRotationMatrix2D(center, angle, 1.0)
-            self.image = cv2.warpAffine(self.original_image, M, (w, h))
-            return self.image
+            return self._apply_stage("rotation", (angle,))
         except ValueError as ve:
             raise ValueError(f"Некорректный угол поворота: {str(ve)}")
         except Exception as e:
             raise RuntimeError(f"Ошибка при повороте изображения: {str(e)}")
 
-    def draw_circle(self, x, y, radius):
-        """Рисование круга"""
+    @instrumented()
+    def apply_scale(self, factor):
+        """Масштабирование изображения"""
         try:
             if self.original_image is None:
                 raise ValueError("Изображение не загружено")
 
+            factor = float(factor)
+            if not 0 < factor <= MAX_SCALE:
+                raise ValueError(f"Масштаб должен быть в диапазоне (0, {MAX_SCALE:g}]")
+
+            if factor == 1.0:
+                self.pipeline.remove_stage("scale")
+                self.image = self.render()
+                self._record_history()
+                return self._result()
+            return self._apply_stage("scale", (factor,))
+        except ValueError as ve:
+            raise ValueError(f"Некорректный масштаб: {str(ve)}")
+        except Exception as e:
+            raise RuntimeError(f"Ошибка при масштабировании изображения: {str(e)}")
+
+    @instrumented()
+    def apply_flip(self, horizontal, vertical):
+        """Отражение изображения"""
+        try:
+            if self.original_image is None:
+                raise ValueError("Изображение не загружено")
+
+            horizontal, vertical = bool(horizontal), bool(vertical)
+            if not horizontal and not vertical:
+                self.pipeline.remove_stage("flip")
+                self.image = self.render()
+                self._record_history()
+                return self._result()
+            return self._apply_stage("flip", (horizontal, vertical))
+        except Exception as e:
+            raise RuntimeError(f"Ошибка при отражении изображения: {str(e)}")
+
+    @instrumented()
+    def apply_filter(self, name, *params):
+        """Фильтр как стадия конвейера (см. FILTERS).
+           Выполняется полосами в пуле потоков, результат не зависит от числа потоков"""
+        try:
+            if self.original_image is None:
+                raise ValueError("Изображение не загружено")
+            if name not in FILTERS:
+                raise ValueError(f"Неизвестный фильтр: {name}")
+
+            types = FILTERS[name]
+            if len(params) != len(types):
+                raise ValueError(f"Фильтр {name} ожидает параметров: {len(types)}")
+            return self._apply_stage(name, tuple(cast(v) for cast, v in zip(types, params)))
+        except ValueError as ve:
+            raise ValueError(f"Ошибка в параметрах фильтра: {str(ve)}")
+        except Exception as e:
+            raise RuntimeError(f"Ошибка при применении фильтра: {str(e)}")
+
+    @instrumented()
+    def remove_filter(self, name):
+        """Удаление стадии фильтра"""
+        try:
+            if self.original_image is None:
+                raise ValueError("Изображение не загружено")
+
+            self.pipeline.remove_stage(name)
+            self.image = self.render()
+            self._record_history()
+            return self._result()
+        except Exception as e:
+            raise RuntimeError(f"Ошибка при удалении фильтра: {str(e)}")
+
+    @instrumented()
+    def apply_adjustments(self, brightness=0.0, contrast=1.0, gamma=1.0):
+        """Яркость (-255..255), контраст и гамма (таблица подстановки на 256 значений)"""
+        try:
+            if self.original_image is None:
+                raise ValueError("Изображение не загружено")
+
+            params = brightness, contrast, gamma = float(brightness), float(contrast), float(gamma)
+            if contrast < 0 or gamma <= 0:
+                raise ValueError("Контраст не может быть отрицательным, гамма должна быть положительной")
+
+            if params == (0.0, 1.0, 1.0):
+                return self.remove_filter("adjust")
+            return self._apply_stage("adjust", params)
+        except ValueError as ve:
+            raise ValueError(f"Некорректные параметры коррекции: {str(ve)}")
+        except Exception as e:
+            raise RuntimeError(f"Ошибка цветокоррекции: {str(e)}")
+
+    @instrumented()
+    def add_annotation(self, shape, params, text=None, color=DEFAULT_COLOR, thickness=DEFAULT_THICKNESS):
+        """Добавление фигуры (circle, rect, line, text) в слой аннотаций.
+           Координаты задаются в текущем (обработанном) изображении"""
+        try:
+            if self.image is None:
+                raise ValueError("Изображение не загружено")
+
+            with self._lock:
+                self.annotations.add(shape, [int(v) for v in params], color, int(thickness), text)
+            self._record_history()
+            return self._result()
+        except ValueError as ve:
+            raise ValueError(f"Ошибка в параметрах аннотации: {str(ve)}")
+        except Exception as e:
+            raise RuntimeError(f"Ошибка при добавлении аннотации: {str(e)}")
+
+    @instrumented()
+    def add_annotations(self, shape, params, color=DEFAULT_COLOR, thickness=DEFAULT_THICKNESS):
+        """Пакетное добавление фигур одного типа (params — массив N x k, например метки).
+           Одна запись истории и один проход отрисовки на весь пакет"""
+        try:
+            if self.image is None:
+                raise ValueError("Изображение не загружено")
+
+            with self._lock:
+                self.annotations.add_many(shape, params, color, int(thickness))
+            self._record_history()
+            return self._result()
+        except ValueError as ve:
+            raise ValueError(f"Ошибка в параметрах аннотаций: {str(ve)}")
+        except Exception as e:
+            raise RuntimeError(f"Ошибка при добавлении аннотаций: {str(e)}")
+
+    @instrumented()
+    def remove_annotation(self, index):
+        """Удаление фигуры по номеру (см. annotations.shapes())"""
+        try:
+            with self._lock:
+                self.annotations.remove(int(index))
+            self._record_history()
+            return self._result()
+        except ValueError as ve:
+            raise ValueError(f"Ошибка удаления аннотации: {str(ve)}")
+
+    @instrumented()
+    def clear_annotations(self):
+        """Удаление всех фигур"""
+        if self.image is None or not len(self.annotations):
+            return self._result()
+        with self._lock:
+            self.annotations.clear()
+        self._record_history()
+        return self._result()
+
+    @instrumented()
+    def draw_circle(self, x, y, radius):
+        """Рисование круга (фигура слоя аннотаций)"""
+        try:
+            if self.image is None:
+                raise ValueError("Изображение не загружено")
+
             # Валидация параметров
             x, y, radius = map(int, [x, y, radius])
-            h, w = self.original_image.shape[:2]
 
             if radius <= 0:
                 raise ValueError("Радиус должен быть положительным числом")
             if x < 0 or y < 0:
                 raise ValueError("Координаты центра не могут быть отрицательными")
+            h, w = self.image.shape[:2]
             if x - radius < 0 or x + radius > w or y - radius < 0 or y + radius > h:
                 raise ValueError("Круг выходит за границы изображения")
 
-            self.image = self.original_image.copy()
-            cv2.circle(self.image, (x, y), radius, (0, 0, 255), 2)
-            return self.image
+            return self.add_annotation("circle", (x, y, radius))
         except ValueError as ve:
             raise ValueError(f"Ошибка в параметрах круга: {str(ve)}")
         except Exception as e:
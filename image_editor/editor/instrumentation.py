@@ -0,0 +1,176 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque, namedtuple
+
+DEFAULT_CAPACITY = 4096
+
+# Запись профилировщика: имя, начало и длительность (с), прирост памяти (байт),
+# размер результата (байт), форма результата, поток и глубина вложенности
+Record = namedtuple("Record", ["name", "start", "duration", "alloc_bytes", "nbytes", "shape", "thread", "depth"])
+
+
+class _NullSpan:
+    """Пустой интервал: используется, когда профилирование выключено"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_result(self, result):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.result = None
+
+    def __enter__(self):
+        local = self.profiler._local
+        self.depth = getattr(local, "depth", 0)
+        local.depth = self.depth + 1
+        self.memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        self.start = time.perf_counter()
+        return self
+
+    def set_result(self, result):
+        self.result = result
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self.start
+        self.profiler._local.depth = self.depth
+        alloc = None
+        if self.memory is not None and tracemalloc.is_tracing():
+            alloc = tracemalloc.get_traced_memory()[0] - self.memory
+        result = self.result
+        self.profiler.records.append(Record(
+            self.name, self.start, duration, alloc,
+            getattr(result, "nbytes", None), getattr(result, "shape", None),
+            threading.get_ident(), self.depth,
+        ))
+        return False
+
+
+class Profiler:
+    """Сбор замеров по операциям в кольцевой буфер.
+       - Выключенный профилировщик стоит одной проверки флага на вызов
+       - Прирост памяти считается через tracemalloc (track_memory=True)
+       - Замеры выгружаются в формате Chrome Trace (chrome://tracing, Perfetto)"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.enabled = False
+        self.records = deque(maxlen=capacity)
+        self._local = threading.local()
+        self._started_tracemalloc = False
+        self._origin = time.perf_counter()
+
+    def enable(self, track_memory=False):
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def clear(self):
+        self.records.clear()
+
+    def span(self, name):
+        """Контекст для замера участка кода"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def latest(self, depth=0):
+        """Последняя запись верхнего уровня (для строки состояния)"""
+        for record in reversed(self.records):
+            if record.depth == depth:
+                return record
+        return None
+
+    def summary(self):
+        """Агрегаты по именам: число вызовов, суммарное и максимальное время (мс)"""
+        stats = {}
+        for record in list(self.records):
+            entry = stats.setdefault(record.name, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+            ms = record.duration * 1000
+            entry["calls"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+        return stats
+
+    def export_trace(self, file_path):
+        """Выгрузка в формате Chrome Trace Event (JSON)"""
+        pid = os.getpid()
+        events = []
+        for record in list(self.records):
+            args = {"shape": list(record.shape) if record.shape else None, "nbytes": record.nbytes}
+            if record.alloc_bytes is not None:
+                args["alloc_bytes"] = record.alloc_bytes
+            events.append({
+                "name": record.name,
+                "cat": "image_editor",
+                "ph": "X",
+                "ts": (record.start - self._origin) * 1e6,
+                "dur": record.duration * 1e6,
+                "pid": pid,
+                "tid": record.thread,
+                "args": args,
+            })
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": {"summary": self.summary()}}, f, ensure_ascii=False)
+        return len(events)
+
+
+profiler = Profiler()
+if os.environ.get("IMAGE_EDITOR_PROFILE"):
+    profiler.enable(track_memory=os.environ.get("IMAGE_EDITOR_PROFILE") == "memory")
+
+
+def instrumented(name=None):
+    """Декоратор замера вызова функции/метода глобальным профилировщиком"""
+
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            with _Span(profiler, label) as span:
+                result = func(*args, **kwargs)
+                span.set_result(result)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def format_record(record):
+    """Строка для строки состояния: имя, время, форма, объем результата"""
+    if record is None:
+        return ""
+    text = f"{record.name}: {record.duration * 1000:.1f} мс"
+    if record.shape:
+        text += " · " + "×".join(str(v) for v in record.shape)
+    if record.nbytes:
+        text += f" · {record.nbytes / (1024 * 1024):.1f} МБ"
+    if record.alloc_bytes is not None:
+        text += f" · выделено {record.alloc_bytes / (1024 * 1024):+.1f} МБ"
+    return text
@@ -0,0 +1,91 @@
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .image_io import read_bytes, decode_image, preview_reduction, encode_image, write_bytes
+
+DEFAULT_IO_WORKERS = 2
+
+# Событие ввода-вывода для потока Tk:
+# kind — progress | preview | loaded | saved | error; token — номер запроса
+IOEvent = namedtuple("IOEvent", ["kind", "token", "payload", "progress", "message"])
+
+
+class IOWorker:
+    """Загрузка и сохранение изображений в пуле потоков.
+       - Загрузка прогрессивная: сначала быстрое уменьшенное декодирование JPEG,
+         затем полное изображение
+       - Прогресс, результаты и ошибки передаются через очередь,
+         которую поток Tk опрашивает методом poll()"""
+
+    def __init__(self, max_workers=DEFAULT_IO_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-io")
+        self._events = queue.Queue()
+        self._active = 0
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self):
+        return self._active > 0 or not self._events.empty()
+
+    def _post(self, kind, token, payload=None, progress=None, message=""):
+        self._events.put(IOEvent(kind, token, payload, progress, message))
+
+    def _submit(self, job, *args):
+        with self._lock:
+            self._active += 1
+        future = self._pool.submit(job, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, _future):
+        with self._lock:
+            self._active -= 1
+
+    def load(self, file_path, token):
+        return self._submit(self._load_job, file_path, token)
+
+    def save(self, image, file_path, ext, params, token):
+        return self._submit(self._save_job, image, file_path, ext, params, token)
+
+    def _load_job(self, file_path, token):
+        try:
+            self._post("progress", token, progress=5, message="Чтение файла...")
+            data = read_bytes(file_path)
+
+            reduction = preview_reduction(data)
+            if reduction is not None:
+                self._post("progress", token, progress=30, message="Быстрый предпросмотр...")
+                preview = decode_image(data, reduction)
+                if preview is not None:
+                    self._post("preview", token, preview, progress=50, message="Загрузка полного изображения...")
+
+            image = decode_image(data)
+            if image is None:
+                raise ValueError("Не удалось открыть изображение! Поддерживаемые форматы: JPG, JPEG, PNG, BMP")
+            self._post("loaded", token, image, progress=100, message="Готово")
+        except Exception as e:
+            self._post("error", token, message=f"Ошибка загрузки изображения: {str(e)}")
+
+    def _save_job(self, image, file_path, ext, params, token):
+        try:
+            self._post("progress", token, progress=10, message="Кодирование...")
+            data = encode_image(image, ext, params)
+            self._post("progress", token, progress=80, message="Запись файла...")
+            write_bytes(data, file_path)
+            self._post("saved", token, file_path, progress=100, message=f"Сохранено: {data.nbytes / 1024:.0f} КБ")
+        except Exception as e:
+            self._post("error", token, message=f"Ошибка сохранения изображения: {str(e)}")
+
+    def poll(self):
+        """Все накопившиеся события (без ожидания)"""
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,110 @@
+from collections import namedtuple
+
+from .buffer import freeze
+from .cache import LRUCache
+
+DEFAULT_CACHE_BUDGET = 512 * 1024 * 1024
+
+Stage = namedtuple("Stage", ["name", "params"])
+
+
+class Pipeline:
+    """Упорядоченный редактируемый список операций над исходным изображением.
+       - Каждая стадия хранит имя операции и ее параметры
+       - Результат стадии кэшируется по ключу (ключ предыдущей стадии, имя, параметры)
+       - При изменении стадии пересчитываются только она и последующие
+       - Подряд идущие стадии из fusable выполняются одним вызовом fuse
+       - Результаты стадий доступны только для чтения: закэшированный кадр
+         (или срез исходника после обрезки) нельзя испортить по ошибке"""
+
+    def __init__(self, operations, cache_budget=DEFAULT_CACHE_BUDGET, fusable=(), fuse=None):
+        self.operations = operations
+        self.cache = LRUCache(cache_budget)
+        self.fusable = frozenset(fusable) if fuse is not None else frozenset()
+        self.fuse = fuse
+        self.stages = []
+
+    def index_of(self, name):
+        for i, stage in enumerate(self.stages):
+            if stage.name == name:
+                return i
+        return -1
+
+    def get_stage(self, name):
+        i = self.index_of(name)
+        return self.stages[i] if i >= 0 else None
+
+    def set_stage(self, name, params):
+        """Заменяет параметры существующей стадии или добавляет новую в конец"""
+        if name not in self.operations:
+            raise ValueError(f"Неизвестная операция: {name}")
+
+        stage = Stage(name, tuple(params))
+        i = self.index_of(name)
+        if i >= 0:
+            self.stages[i] = stage
+        else:
+            self.stages.append(stage)
+        return stage
+
+    def remove_stage(self, name):
+        i = self.index_of(name)
+        if i >= 0:
+            del self.stages[i]
+
+    def clear(self):
+        self.stages = []
+
+    @staticmethod
+    def stage_keys(source_key, stages):
+        """Ключи кэша для каждой стадии: ключ зависит от всех предыдущих стадий"""
+        keys = []
+        key = source_key
+        for stage in stages:
+            key = (key, stage.name, stage.params)
+            keys.append(key)
+        return keys
+
+    def _runs(self, stages, start=0):
+        """Разбивает стадии на группы: одиночные и цепочки объединяемых"""
+        i = start
+        while i < len(stages):
+            j = i
+            if stages[i].name in self.fusable:
+                while j + 1 < len(stages) and stages[j + 1].name in self.fusable:
+                    j += 1
+            yield i, j
+            i = j + 1
+
+    def _apply(self, image, stages):
+        if len(stages) > 1:
+            return freeze(self.fuse(image, stages))
+        stage = stages[0]
+        return freeze(self.operations[stage.name](image, *stage.params))
+
+    def render(self, source, source_key, stages=None, use_cache=True):
+        """Применяет стадии к источнику, начиная с самой глубокой закэшированной.
+           use_cache=False — для потоковых кадров, которые не повторяются.
+           Для объединенной цепочки кэшируется только результат последней стадии."""
+        stages = self.stages if stages is None else stages
+        if not use_cache:
+            image = source
+            for i, j in self._runs(stages):
+                image = self._apply(image, stages[i:j + 1])
+            return image
+
+        keys = self.stage_keys(source_key, stages)
+
+        image = source
+        start = 0
+        for i in range(len(keys) - 1, -1, -1):
+            cached = self.cache.get(keys[i])
+            if cached is not None:
+                image = cached
+                start = i + 1
+                break
+
+        for i, j in self._runs(stages, start):
+            image = self._apply(image, stages[i:j + 1])
+            self.cache.put(keys[j], image)
+        return image
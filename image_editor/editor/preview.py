@@ -0,0 +1,121 @@
+import threading
+import time
+
+FRAME_BUDGET_MS = 16.0
+
+
+class FrameLatency:
+    """Статистика задержки кадров превью (от запроса до отображения)"""
+
+    def __init__(self, budget_ms=FRAME_BUDGET_MS):
+        self.budget_ms = budget_ms
+        self.count = 0
+        self.over_budget = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self._total_ms = 0.0
+
+    @property
+    def mean_ms(self):
+        return self._total_ms / self.count if self.count else 0.0
+
+    def record(self, seconds):
+        ms = seconds * 1000.0
+        self.count += 1
+        self.last_ms = ms
+        self.max_ms = max(self.max_ms, ms)
+        self._total_ms += ms
+        if ms > self.budget_ms:
+            self.over_budget += 1
+
+    def reset(self):
+        self.__init__(self.budget_ms)
+
+    def summary(self):
+        return f"{self.last_ms:.1f} мс (ср. {self.mean_ms:.1f}, макс. {self.max_ms:.1f})"
+
+
+class PreviewRenderer:
+    """Фоновая отрисовка превью для непрерывных элементов управления.
+       - В очереди хранится только последний запрос: промежуточные заменяются
+       - Результат устаревшего запроса отбрасывается
+       - Вызовы poll() выполняются из потока Tk"""
+
+    def __init__(self, render_func):
+        self._render = render_func
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._pending = None
+        self._result = None
+        self._closed = False
+        self._rendering = False
+        self.dropped = 0
+        self.latency = FrameLatency()
+
+        self._thread = threading.Thread(target=self._worker, name="preview-renderer", daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self):
+        with self._cond:
+            return self._pending is not None or self._result is not None or self._rendering
+
+    def submit(self, *args):
+        """Ставит запрос на отрисовку, вытесняя еще не начатый предыдущий"""
+        with self._cond:
+            self._seq += 1
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = (self._seq, args, time.perf_counter())
+            self._cond.notify()
+
+    def cancel(self):
+        """Делает устаревшими все отправленные запросы"""
+        with self._cond:
+            self._seq += 1
+            self._pending = None
+            self._result = None
+
+    def poll(self):
+        """Возвращает (изображение, время запроса) для актуального результата или None"""
+        with self._cond:
+            result, self._result = self._result, None
+        if result is None:
+            return None
+
+        seq, image, submitted = result
+        if seq != self._seq:
+            self.dropped += 1
+            return None
+        return image, submitted
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending = None
+            self._cond.notify()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                seq, args, submitted = self._pending
+                self._pending = None
+                self._rendering = True
+
+            try:
+                image = self._render(*args)
+            except Exception:
+                image = None
+
+            with self._cond:
+                self._rendering = False
+                if image is None:
+                    continue
+                if seq != self._seq:
+                    self.dropped += 1
+                    continue
+                self._result = (seq, image, submitted)
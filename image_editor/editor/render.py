@@ -0,0 +1,175 @@
+import weakref
+
+import cv2
+
+from .cache import LRUCache
+from .instrumentation import instrumented, profiler
+
+PYRAMID_BUDGET = 256 * 1024 * 1024
+FRAME_BUDGET = 64 * 1024 * 1024
+PYRAMID_MIN_SIDE = 64
+
+
+def image_key(image):
+    """Ключ версии изображения: объект, буфер данных и форма"""
+    return id(image), image.__array_interface__["data"][0], image.shape
+
+
+def fit_size(width, height, canvas_width, canvas_height):
+    """Размер, в который изображение вписывается в холст с сохранением пропорций"""
+    if canvas_width <= 1 or canvas_height <= 1:
+        return width, height
+
+    img_ratio = width / height
+    canvas_ratio = canvas_width / canvas_height
+    if img_ratio > canvas_ratio:
+        return canvas_width, max(1, int(canvas_width / img_ratio))
+    return max(1, int(canvas_height * img_ratio)), canvas_height
+
+
+def to_rgb(image):
+    """Конвертирует BGR/BGRA/серое изображение OpenCV в RGB"""
+    if image.ndim == 2:
+        code = cv2.COLOR_GRAY2RGB
+    elif image.shape[2] == 4:
+        code = cv2.COLOR_BGRA2RGB
+    else:
+        code = cv2.COLOR_BGR2RGB
+    with profiler.span("cv2.cvtColor"):
+        return cv2.cvtColor(image, code)
+
+
+def _pyr_down_region(src, dst, rect):
+    """Пересчитывает часть dst = pyrDown(src), зависящую от прямоугольника rect источника.
+       Источник берется с запасом под ядро 5x5, поэтому результат совпадает с полным пересчетом.
+       Возвращает затронутый прямоугольник dst"""
+    x1, y1, x2, y2 = rect
+    sh, sw = src.shape[:2]
+    dh, dw = dst.shape[:2]
+    # Пиксель j уровня зависит от пикселей 2j-2..2j+2 источника
+    dx1, dy1 = max(0, (x1 - 2) // 2), max(0, (y1 - 2) // 2)
+    dx2, dy2 = min(dw, (x2 + 1) // 2 + 1), min(dh, (y2 + 1) // 2 + 1)
+    sx1, sy1 = max(0, 2 * dx1 - 2), max(0, 2 * dy1 - 2)
+    sx2, sy2 = min(sw, 2 * dx2 + 2), min(sh, 2 * dy2 + 2)
+    part = cv2.pyrDown(src[sy1:sy2, sx1:sx2])
+    ox, oy = dx1 - sx1 // 2, dy1 - sy1 // 2
+    dst[dy1:dy2, dx1:dx2] = part[oy:oy + dy2 - dy1, ox:ox + dx2 - dx1]
+    return dx1, dy1, dx2, dy2
+
+
+class _Pyramid:
+    """Уровни уменьшения изображения вдвое; достраиваются по мере надобности.
+       На исходник хранится слабая ссылка, чтобы кэш не удерживал его в памяти"""
+
+    def __init__(self, image):
+        self.image_ref = weakref.ref(image)
+        self.levels = []
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels)
+
+    def level_for(self, image, width, height):
+        """Самый мелкий уровень, который не меньше требуемого размера"""
+        last = self.levels[-1] if self.levels else image
+        while True:
+            h, w = last.shape[:2]
+            if w // 2 < width or h // 2 < height or min(w, h) // 2 < PYRAMID_MIN_SIDE:
+                return last
+            with profiler.span("cv2.pyrDown"):
+                last = cv2.pyrDown(last)
+            self.levels.append(last)
+
+    def update(self, image, rects):
+        """Пересчитывает уровни в областях, где изображение изменено на месте"""
+        for rect in rects:
+            source = image
+            for level in self.levels:
+                with profiler.span("cv2.pyrDown"):
+                    rect = _pyr_down_region(source, level, rect)
+                source = level
+
+
+class _Frame:
+    """Готовый RGB-кадр со слабой ссылкой на исходник"""
+
+    def __init__(self, image, rgb):
+        self.image_ref = weakref.ref(image)
+        self.rgb = rgb
+        self.nbytes = rgb.nbytes
+
+
+def _forget_image(renderer_ref, key):
+    renderer = renderer_ref()
+    if renderer is not None:
+        renderer.forget(key)
+
+
+class ViewRenderer:
+    """Подготовка изображения к показу без зависимости от Tk.
+       - Для каждого изображения строится пирамида уровней (один раз)
+       - Масштабирование выполняется от ближайшего уровня пирамиды
+       - Готовые RGB-кадры кэшируются по (версия изображения, размер холста)
+       - Когда изображение удаляется сборщиком, его пирамида и кадры сразу
+         убираются из кэшей (weakref.finalize), а не ждут вытеснения по бюджету"""
+
+    def __init__(self, pyramid_budget=PYRAMID_BUDGET, frame_budget=FRAME_BUDGET):
+        self.pyramids = LRUCache(pyramid_budget, size_of=lambda p: p.nbytes)
+        self.frames = LRUCache(frame_budget)
+
+    def pyramid(self, image):
+        key = image_key(image)
+        pyramid = self.pyramids.get(key)
+        if pyramid is None or pyramid.image_ref() is not image:
+            pyramid = _Pyramid(image)
+            # Слабая ссылка на себя: финализатор не должен удерживать рендерер
+            finalizer = weakref.finalize(image, _forget_image, weakref.ref(self), key)
+            finalizer.atexit = False
+        return key, pyramid
+
+    def forget(self, key):
+        """Убирает пирамиду и кадры изображения с ключом key, если оно уже удалено"""
+        pyramid = self.pyramids.get(key)
+        if pyramid is not None and pyramid.image_ref() is None:
+            self.pyramids.pop(key)
+        for frame_key in self.frames.keys():
+            if frame_key[0] == key:
+                frame = self.frames.get(frame_key)
+                if frame is not None and frame.image_ref() is None:
+                    self.frames.pop(frame_key)
+
+    def invalidate(self, image, rects):
+        """Учитывает изменение изображения на месте (например, слоем аннотаций):
+           пирамида пересчитывается только в областях rects, готовые кадры сбрасываются"""
+        key = image_key(image)
+        pyramid = self.pyramids.get(key)
+        if pyramid is not None and pyramid.image_ref() is image:
+            pyramid.update(image, rects)
+        for frame_key in self.frames.keys():
+            if frame_key[0] == key:
+                self.frames.pop(frame_key)
+
+    @instrumented()
+    def render(self, image, canvas_width, canvas_height):
+        """RGB-кадр, вписанный в холст заданного размера"""
+        h, w = image.shape[:2]
+        size = fit_size(w, h, canvas_width, canvas_height)
+        key, pyramid = self.pyramid(image)
+        frame_key = (key, size)
+
+        frame = self.frames.get(frame_key)
+        if frame is not None and frame.image_ref() is image:
+            return frame.rgb
+
+        level = pyramid.level_for(image, *size)
+        lh, lw = level.shape[:2]
+        if (lw, lh) != size:
+            interpolation = cv2.INTER_AREA if lw > size[0] else cv2.INTER_LANCZOS4
+            with profiler.span("cv2.resize"):
+                level = cv2.resize(level, size, interpolation=interpolation)
+        rgb = to_rgb(level)
+
+        # Пирамида кладется в кэш после достройки, чтобы учесть ее размер
+        self.pyramids.put(key, pyramid)
+        self.frames.put(frame_key, _Frame(image, rgb))
+        return rgb
@@ -0,0 +1,442 @@
+import json
+import os
+import queue
+import signal
+import socket
+import struct
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from .batch import parse_operation
+from .image_processor import ImageProcessor
+
+DEFAULT_PORT = 8765
+# Больше запросов с одинаковыми операциями в одну группу не собирается
+MAX_GROUP = 32
+# Сколько сегментов разделяемой памяти сервер держит подключенными
+ATTACHED_SEGMENTS = 64
+
+_HEADER = struct.Struct("!I")
+
+
+def default_address():
+    """Unix-сокет во временном каталоге; где их нет — порт на localhost"""
+    if hasattr(socket, "AF_UNIX"):
+        return os.path.join(tempfile.gettempdir(), f"image-editor-{os.getuid()}.sock")
+    return "127.0.0.1", DEFAULT_PORT
+
+
+def parse_address(text):
+    """'host:port' или ':port' — TCP, иначе путь к Unix-сокету"""
+    host, sep, port = text.rpartition(":")
+    if sep and port.isdigit() and os.sep not in text:
+        return host or "127.0.0.1", int(port)
+    return text
+
+
+def _family(address):
+    return socket.AF_INET if isinstance(address, tuple) else socket.AF_UNIX
+
+
+def send_message(sock, message):
+    data = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock):
+    """Сообщение протокола: длина (4 байта) и JSON; None — соединение закрыто"""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    data = _recv_exact(sock, _HEADER.unpack(header)[0])
+    return None if data is None else json.loads(data.decode("utf-8"))
+
+
+def open_segment(name=None, size=0, track=True):
+    """Создает (name=None) или подключает сегмент разделяемой памяти.
+       - track=True: сегмент принадлежит процессу, resource_tracker удалит его,
+         если процесс завершится, не вызвав unlink()
+       - track=False (сервер): сегмент снимается с учета, иначе трекер сервера
+         удалил бы сегменты клиентов при своем выходе"""
+    segment = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+    if not track:
+        resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+def segment_array(segment, shape, dtype):
+    """Массив numpy поверх сегмента (без копирования)"""
+    return np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=segment.buf)
+
+
+class _Job:
+    """Запрос, ожидающий обработки: группируется по операциям и формату изображения"""
+
+    def __init__(self, message):
+        image = message["image"]
+        self.message = message
+        self.key = (tuple(message["operations"]), tuple(image["shape"]), image["dtype"])
+        self.future = Future()
+
+
+class ImageService:
+    """Локальный сервер операций ImageProcessor.
+       - Пиксели передаются через multiprocessing.shared_memory, по сокету идут только
+         имена сегментов, формы и операции (в формате batch --op)
+       - Запросы с одинаковыми операциями и формой изображения, скопившиеся в очереди,
+         обрабатываются одной группой: операции разбираются и проверяются один раз,
+         остальные изображения группы проходят конвейер за один проход.
+         Кадры группы выполняются одним потоком по очереди, поэтому группа не больше
+         доли очереди на один поток пула (см. _group_limit)
+       - Группы выполняются в пуле потоков (OpenCV отпускает GIL)"""
+
+    def __init__(self, address=None, workers=None, max_group=MAX_GROUP):
+        self.address = address or default_address()
+        self.workers = workers or os.cpu_count() or 1
+        self.max_group = max_group
+        self.requests = 0
+        self.groups = 0
+        self.largest_group = 0
+        self._queue = queue.Queue()
+        self._slots = threading.Semaphore(self.workers)
+        # Прием запросов и остановка согласуются под этой блокировкой: после close()
+        # в очередь ничего не попадает, и каждый принятый запрос получает ответ
+        self._queue_lock = threading.Lock()
+        self._dispatcher = None
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="service")
+        self._local = threading.local()
+        self._segments = OrderedDict()
+        self._segments_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._listener = None
+        self._closed = threading.Event()
+        self._stop = threading.Event()
+
+    def start(self):
+        """Открывает сокет и запускает прием соединений в фоновых потоках"""
+        if not isinstance(self.address, tuple) and os.path.exists(self.address):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.address)
+            except OSError:
+                # Сокет, оставшийся от прошлого запуска
+                os.unlink(self.address)
+            else:
+                raise RuntimeError(f"Сервис уже запущен: {self.address}")
+            finally:
+                probe.close()
+        listener = socket.socket(_family(self.address), socket.SOCK_STREAM)
+        if isinstance(self.address, tuple):
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(self.address)
+        listener.listen()
+        self._listener = listener
+        threading.Thread(target=self._accept, name="service-accept", daemon=True).start()
+        self._dispatcher = threading.Thread(target=self._dispatch, name="service-dispatch", daemon=True)
+        self._dispatcher.start()
+        return self
+
+    def serve_forever(self):
+        if self._listener is None:
+            self.start()
+        try:
+            self._stop.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def stop(self):
+        """Просит serve_forever завершиться (можно вызывать из обработчика сигнала)"""
+        self._stop.set()
+
+    def close(self):
+        """Останавливает сервис: новые запросы отклоняются, диспетчер отклоняет
+           оставшиеся в очереди и завершается, затем дожидаются выполняемые группы"""
+        with self._queue_lock:
+            if self._closed.is_set():
+                return
+            self._closed.set()
+            self._queue.put(None)
+        self._stop.set()
+        if self._listener is not None:
+            try:
+                # Будит поток, ожидающий в accept()
+                self._listener.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._listener.close()
+            self._listener = None
+            if not isinstance(self.address, tuple) and os.path.exists(self.address):
+                os.unlink(self.address)
+        # Пул закрывается только после диспетчера: иначе его submit() упал бы с RuntimeError
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+        self._pool.shutdown(wait=True)
+        with self._segments_lock:
+            for segment in self._segments.values():
+                segment.close()
+            self._segments.clear()
+
+    def stats(self):
+        with self._stats_lock:
+            return {"requests": self.requests, "groups": self.groups, "largest_group": self.largest_group,
+                    "workers": self.workers}
+
+    def _accept(self):
+        while not self._closed.is_set():
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve_connection, args=(conn,), name="service-conn", daemon=True).start()
+
+    def _serve_connection(self, conn):
+        """Один клиент — одно соединение; запросы в нем обрабатываются по очереди"""
+        with conn:
+            while True:
+                try:
+                    message = recv_message(conn)
+                except (OSError, ValueError):
+                    return
+                if message is None:
+                    return
+                try:
+                    if message.get("command") == "stats":
+                        response = {"ok": True, "stats": self.stats()}
+                    else:
+                        job = _Job(message)
+                        self._submit(job)
+                        response = job.future.result()
+                except (KeyError, TypeError) as e:
+                    response = {"ok": False, "error": f"Некорректный запрос: {e}"}
+                try:
+                    send_message(conn, response)
+                except OSError:
+                    return
+
+    def _submit(self, job):
+        with self._queue_lock:
+            if self._closed.is_set():
+                job.future.set_result({"ok": False, "error": "Сервер остановлен"})
+            else:
+                self._queue.put(job)
+
+    def _group_limit(self, depth):
+        """Наибольшая группа при depth ждущих запросах: очередь делится поровну между потоками пула.
+           Группа выполняется одним потоком по очереди и разделяет только разбор операций,
+           поэтому одна большая группа держала бы запросы, пока остальные потоки простаивают"""
+        return max(1, min(self.max_group, -(-depth // self.workers)))
+
+    def _dispatch(self):
+        """Раздает группы свободным потокам пула.
+           Группа собирается только из уже ждущих запросов: пока все потоки заняты,
+           очередь растет и группы укрупняются, а одиночный запрос не ждет попутчиков"""
+        pending = deque()
+        while True:
+            self._slots.acquire()
+            if not pending:
+                pending.append(self._queue.get())
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            first = pending.popleft()
+            if first is None:
+                for job in pending:
+                    if job is not None:
+                        job.future.set_result({"ok": False, "error": "Сервер остановлен"})
+                return
+
+            limit = self._group_limit(len(pending) + 1)
+            group, rest = [first], deque()
+            for job in pending:
+                if job is not None and job.key == first.key and len(group) < limit:
+                    group.append(job)
+                else:
+                    rest.append(job)
+            pending = rest
+            future = self._pool.submit(self._run_group, group)
+            future.add_done_callback(lambda _: self._slots.release())
+
+    def _attach(self, name):
+        """Подключенный сегмент клиента (подключения переиспользуются между запросами)"""
+        with self._segments_lock:
+            segment = self._segments.get(name)
+            if segment is not None:
+                self._segments.move_to_end(name)
+                return segment
+            segment = open_segment(name, track=False)
+            self._segments[name] = segment
+            while len(self._segments) > ATTACHED_SEGMENTS:
+                _, old = self._segments.popitem(last=False)
+                try:
+                    old.close()
+                except BufferError:
+                    # Сегмент еще используется группой в другом потоке
+                    pass
+            return segment
+
+    def _processor(self):
+        processor = getattr(self._local, "processor", None)
+        if processor is None:
+            # Ни промежуточные стадии, ни история сервису не нужны
+            processor = ImageProcessor(cache_budget=0, history_budget=0)
+            self._local.processor = processor
+        return processor
+
+    def _run_group(self, group):
+        with self._stats_lock:
+            self.requests += len(group)
+            self.groups += 1
+            self.largest_group = max(self.largest_group, len(group))
+        processor = self._processor()
+        operations, template = None, None
+        try:
+            for job in group:
+                try:
+                    if operations is None:
+                        operations = [parse_operation(spec) for spec in job.key[0]]
+                    image = job.message["image"]
+                    source = segment_array(self._attach(image["shm"]), image["shape"], image["dtype"])
+                    processor.history.clear()
+                    # Клиент ждет ответа и не пишет в свой сегмент, пока запрос выполняется,
+                    # поэтому кадр не копируется; после группы процессор его забывает
+                    if template is None:
+                        processor.set_image(source, copy=False)
+                        for method, args in operations:
+                            getattr(processor, method)(*args)
+                        template = processor.document_state()
+                    else:
+                        # Те же операции на изображении той же формы: стадии уже проверены
+                        processor.set_image(source, *template, copy=False)
+                    response = self._write_result(processor.output(), job.message.get("output"))
+                except (ValueError, RuntimeError, OSError) as e:
+                    response = {"ok": False, "error": str(e)}
+                job.future.set_result(response)
+        except Exception as e:
+            for job in group:
+                if not job.future.done():
+                    job.future.set_result({"ok": False, "error": f"Ошибка сервера: {e}"})
+        finally:
+            processor.release()
+
+    def _write_result(self, result, output):
+        """Копирует результат в выходной сегмент клиента; если он мал — в новый сегмент,
+           который переходит во владение клиента"""
+        if output is not None and output["size"] >= result.nbytes:
+            name = output["shm"]
+            segment_array(self._attach(name), result.shape, result.dtype)[...] = result
+        else:
+            segment = open_segment(size=max(result.nbytes, 1), track=False)
+            segment_array(segment, result.shape, result.dtype)[...] = result
+            name = segment.name
+            segment.close()
+        return {"ok": True, "image": {"shm": name, "shape": list(result.shape), "dtype": result.dtype.str}}
+
+
+class ServiceClient:
+    """Клиент сервиса для одного потока.
+       Входной и выходной сегменты разделяемой памяти принадлежат клиенту
+       и переиспользуются между запросами (растут по необходимости)"""
+
+    def __init__(self, address=None, timeout=None):
+        self.address = address or default_address()
+        self._sock = socket.socket(_family(self.address), socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(self.address)
+        self._input = None
+        self._output = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _request(self, message):
+        send_message(self._sock, message)
+        response = recv_message(self._sock)
+        if response is None:
+            raise RuntimeError("Сервер закрыл соединение")
+        return response
+
+    def stats(self):
+        return self._request({"command": "stats"})["stats"]
+
+    def process(self, image, operations):
+        """Применяет операции (строки в формате batch --op, например 'rotate:15')
+           и возвращает результат как новый массив"""
+        image = np.ascontiguousarray(image)
+        if self._input is None or self._input.size < image.nbytes:
+            self._replace("_input", open_segment(size=max(image.nbytes, 1)))
+        segment_array(self._input, image.shape, image.dtype)[...] = image
+
+        message = {
+            "operations": list(operations),
+            "image": {"shm": self._input.name, "shape": list(image.shape), "dtype": image.dtype.str},
+            "output": None if self._output is None else {"shm": self._output.name, "size": self._output.size},
+        }
+        response = self._request(message)
+        if not response["ok"]:
+            raise RuntimeError(f"Ошибка сервиса: {response['error']}")
+
+        result = response["image"]
+        if self._output is None or result["shm"] != self._output.name:
+            self._replace("_output", open_segment(result["shm"]))
+        return segment_array(self._output, result["shape"], result["dtype"]).copy()
+
+    def _replace(self, attr, segment):
+        old = getattr(self, attr)
+        if old is not None:
+            old.close()
+            old.unlink()
+        setattr(self, attr, segment)
+
+    def close(self):
+        self._sock.close()
+        for attr in ("_input", "_output"):
+            self._replace(attr, None)
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser(
+        "serve",
+        help="локальный сервер операций для других программ",
+        description="Принимает запросы через Unix-сокет (или localhost TCP); "
+                    "пиксели передаются через разделяемую память.",
+    )
+    parser.add_argument("--address", type=parse_address, default=None,
+                        help="путь к Unix-сокету или host:port (по умолчанию — сокет во временном каталоге)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="число потоков (по умолчанию — все ядра)")
+    parser.add_argument("--max-group", type=int, default=MAX_GROUP,
+                        help="наибольшее число запросов в одной группе")
+    parser.set_defaults(func=main)
+    return parser
+
+
+def main(args):
+    service = ImageService(args.address, args.workers, args.max_group).start()
+    address = service.address if isinstance(service.address, str) else "%s:%d" % service.address
+    print(f"Сервис слушает {address} (потоков: {service.workers})", flush=True)
+    # SIGTERM завершает сервис так же, как Ctrl+C: сокет удаляется, сегменты отключаются
+    signal.signal(signal.SIGTERM, lambda *_: service.stop())
+    service.serve_forever()
+    return 0
@@ -0,0 +1,190 @@
+import hashlib
+import os
+import queue
+import threading
+
+import cv2
+
+from .batch import collect_inputs
+from .cache import LRUCache
+from .history import History, DEFAULT_HISTORY_BUDGET
+from .image_io import read_bytes, decode_image, is_jpeg, encode_image, write_bytes
+
+DEFAULT_DECODED_BUDGET = 1024 * 1024 * 1024
+THUMB_SIZE = 96
+
+
+def default_thumbnail_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "image_editor", "thumbnails")
+
+
+def make_thumbnail(image, size=THUMB_SIZE):
+    """Уменьшает изображение так, чтобы большая сторона была не больше size"""
+    h, w = image.shape[:2]
+    factor = min(1.0, size / max(h, w))
+    if factor >= 1.0:
+        return image
+    return cv2.resize(image, (max(1, round(w * factor)), max(1, round(h * factor))), interpolation=cv2.INTER_AREA)
+
+
+class ThumbnailCache:
+    """Миниатюры на диске.
+       Ключ — путь, время изменения и размер файла, поэтому измененный файл
+       получает новую миниатюру, а повторное открытие папки не декодирует исходники"""
+
+    def __init__(self, directory=None, size=THUMB_SIZE):
+        self.directory = directory or default_thumbnail_dir()
+        self.size = size
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, path):
+        st = os.stat(path)
+        raw = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|{self.size}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def cached_path(self, path):
+        return os.path.join(self.directory, self.key(path) + ".png")
+
+    def get(self, path):
+        cached = self.cached_path(path)
+        if not os.path.exists(cached):
+            return None
+        return decode_image(read_bytes(cached))
+
+    def create(self, path):
+        """Декодирует исходник (JPEG — сразу в 1/8 размера) и сохраняет миниатюру"""
+        data = read_bytes(path)
+        image = decode_image(data, 8 if is_jpeg(data) else 1)
+        if image is None:
+            raise ValueError(f"Не удалось декодировать изображение: {path}")
+        thumb = make_thumbnail(image, self.size)
+        write_bytes(encode_image(thumb, ".png"), self.cached_path(path))
+        return thumb
+
+    def get_or_create(self, path):
+        thumb = self.get(path)
+        return thumb if thumb is not None else self.create(path)
+
+
+class ThumbnailLoader:
+    """Фоновая параллельная подготовка миниатюр.
+       Запросы обслуживаются по приоритету: видимые в ленте — первыми.
+       Готовые миниатюры забираются из потока Tk методом poll()"""
+
+    VISIBLE = 0
+    BACKGROUND = 1
+
+    def __init__(self, cache, workers=None):
+        self.cache = cache
+        self._queue = queue.PriorityQueue()
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._priority = {}
+        self._seq = 0
+        self._generation = 0
+        self._threads = []
+        for i in range(workers or min(8, os.cpu_count() or 1)):
+            thread = threading.Thread(target=self._worker, name=f"thumbnails-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def request(self, paths, priority=BACKGROUND):
+        """Ставит пути в очередь; уже запрошенные с более высоким приоритетом
+           и уже готовые (или готовящиеся) миниатюры пропускаются"""
+        with self._lock:
+            for path in paths:
+                queued = self._priority.get(path, priority + 1)
+                # None — миниатюру уже забрал рабочий поток
+                if queued is None or queued <= priority:
+                    continue
+                self._priority[path] = priority
+                self._seq += 1
+                self._queue.put((priority, self._seq, self._generation, path))
+
+    def prioritize(self, paths):
+        self.request(paths, self.VISIBLE)
+
+    def cancel(self):
+        """Отменяет все незавершенные запросы (например, при открытии другой папки)"""
+        with self._lock:
+            self._generation += 1
+            self._priority.clear()
+
+    def poll(self):
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def close(self):
+        self.cancel()
+        for _ in self._threads:
+            self._queue.put((-1, 0, -1, None))
+
+    def _worker(self):
+        while True:
+            priority, _, generation, path = self._queue.get()
+            if path is None:
+                return
+            with self._lock:
+                # Устаревший запрос или дубликат, уже обработанный с более высоким приоритетом
+                if generation != self._generation or self._priority.get(path) is None:
+                    continue
+                self._priority[path] = None
+            try:
+                self._results.put((path, self.cache.get_or_create(path)))
+            except Exception:
+                self._results.put((path, None))
+
+
+class ImageSession:
+    """Несколько открытых изображений (например, папка).
+       - Декодированные изображения хранятся в LRU-кэше с ограничением по байтам
+       - Для каждого документа запоминается состояние правок (стадии и аннотации)
+         и своя история отмены"""
+
+    def __init__(self, decoded_budget=DEFAULT_DECODED_BUDGET, history_budget=DEFAULT_HISTORY_BUDGET):
+        self.history_budget = history_budget
+        self.paths = []
+        self.current = None
+        self.decoded = LRUCache(decoded_budget)
+        self.states = {}
+
+    def open_folder(self, folder, recursive=False):
+        return self.open_files(collect_inputs([folder], recursive))
+
+    def open_files(self, paths):
+        self.paths = list(paths)
+        self.current = None
+        self.states.clear()
+        return self.paths
+
+    def index_of(self, path):
+        return self.paths.index(path) if path in self.paths else -1
+
+    def neighbour(self, step):
+        """Путь соседнего документа (step = -1 / +1) или None"""
+        if not self.paths:
+            return None
+        i = self.index_of(self.current)
+        return self.paths[(i + step) % len(self.paths)] if i >= 0 else self.paths[0]
+
+    def cached_image(self, path):
+        return self.decoded.get(path)
+
+    def remember(self, path, image):
+        self.decoded.put(path, image)
+
+    def switch(self, path, current_state, history=None):
+        """Запоминает состояние текущего документа (ImageProcessor.document_state) и его историю,
+           возвращает сохраненные для нового: (стадии, снимок аннотаций, история).
+           Новый документ получает пустую историю: отмена не переходит между документами"""
+        if self.current is not None:
+            self.states[self.current] = tuple(current_state) + (history,)
+            if history is not None:
+                history.park()
+        self.current = path
+        return self.states.get(path) or ((), None, History(self.history_budget))
@@ -0,0 +1,175 @@
+import math
+import weakref
+from collections import namedtuple
+
+import numpy as np
+
+from .cache import LRUCache
+from .instrumentation import profiler
+
+# Не больше стольких пикселей в выборке: шаг прореживания подбирается по размеру кадра
+DEFAULT_SAMPLES = 1024 * 1024
+STATS_CACHE_BUDGET = 4 * 1024 * 1024
+
+# Названия каналов в порядке хранения OpenCV
+CHANNEL_NAMES = {
+    1: ("Яркость",),
+    3: ("Синий", "Зеленый", "Красный"),
+    4: ("Синий", "Зеленый", "Красный", "Альфа"),
+}
+
+# Статистика кадра; поля по каналам — массивы в порядке channels.
+# histogram — C x 256 отсчетов, clipped_low/high — доля пикселей со значением 0 / 255,
+# step — шаг прореживания выборки
+ImageStats = namedtuple("ImageStats", ["channels", "histogram", "count", "min", "max", "mean",
+                                       "clipped_low", "clipped_high", "step"])
+
+
+def sample_step(height, width, max_samples=DEFAULT_SAMPLES):
+    """Шаг прореживания по обеим осям, при котором выборка не больше max_samples"""
+    return max(1, math.ceil(math.sqrt(height * width / max_samples)))
+
+
+def _as_uint8(image):
+    if image.dtype == np.uint8:
+        return image
+    if image.dtype == np.uint16:
+        return (image >> 8).astype(np.uint8)
+    raise ValueError(f"Статистика поддерживает изображения uint8 и uint16, получено {image.dtype}")
+
+
+def _channel_count(image):
+    return 1 if image.ndim == 2 else image.shape[2]
+
+
+def histograms(pixels):
+    """Гистограммы всех каналов одним вызовом np.bincount (C x 256)"""
+    channels = _channel_count(pixels)
+    flat = pixels.reshape(-1, channels)
+    if channels == 1:
+        return np.bincount(flat.ravel(), minlength=256).reshape(1, 256)
+    offsets = np.arange(channels, dtype=np.uint16) * 256
+    return np.bincount((flat + offsets).ravel(), minlength=256 * channels).reshape(channels, 256)
+
+
+def summarize(histogram, step=1):
+    """ImageStats по гистограммам: все величины выводятся из отсчетов,
+       поэтому после частичного пересчета гистограмм их не нужно считать по пикселям"""
+    channels = len(histogram)
+    count = int(histogram[0].sum())
+    levels = np.arange(256)
+    present = histogram > 0
+    total = max(count, 1)
+    return ImageStats(
+        channels=CHANNEL_NAMES.get(channels, tuple(f"Канал {i + 1}" for i in range(channels))),
+        histogram=histogram,
+        count=count,
+        min=np.where(present.any(axis=1), present.argmax(axis=1), 0),
+        max=np.where(present.any(axis=1), 255 - present[:, ::-1].argmax(axis=1), 0),
+        mean=histogram @ levels / total,
+        clipped_low=histogram[:, 0] / total,
+        clipped_high=histogram[:, 255] / total,
+        step=step,
+    )
+
+
+def image_stats(image, max_samples=DEFAULT_SAMPLES):
+    """Статистика кадра по прореженной выборке (без кэша)"""
+    step = sample_step(*image.shape[:2], max_samples)
+    with profiler.span("image_stats"):
+        return summarize(histograms(_as_uint8(image[::step, ::step])), step)
+
+
+def stats_summary(stats):
+    """Сводка для JSON: по каналам минимум, максимум, среднее и проценты недосвета/пересвета"""
+    return {
+        "samples": stats.count,
+        "step": stats.step,
+        "channels": {
+            name: {
+                "min": int(stats.min[i]),
+                "max": int(stats.max[i]),
+                "mean": round(float(stats.mean[i]), 2),
+                "clipped_low_pct": round(100.0 * float(stats.clipped_low[i]), 3),
+                "clipped_high_pct": round(100.0 * float(stats.clipped_high[i]), 3),
+            }
+            for i, name in enumerate(stats.channels)
+        },
+    }
+
+
+class StatsTracker:
+    """Статистика результата редактора.
+       - Считается по прореженной копии кадра (каждый step-й пиксель по обеим осям)
+       - Готовая статистика кэшируется по ключу состояния (источник, стадии, аннотации),
+         поэтому отмена и повтор не пересчитывают ее
+       - Если кадр изменился на месте в известных областях (слой аннотаций),
+         гистограммы пересчитываются только для этих областей выборки"""
+
+    def __init__(self, max_samples=DEFAULT_SAMPLES, cache_budget=STATS_CACHE_BUDGET):
+        self.max_samples = max_samples
+        self.cache = LRUCache(cache_budget, size_of=lambda stats: stats.histogram.nbytes)
+        self._frame = None
+        self._key = None
+        self._stats = None
+        self._sample = None
+        self._histogram = None
+        self._step = 1
+
+    def _is_current(self, image):
+        return self._frame is not None and self._frame() is image
+
+    def update(self, image, key=None, dirty=None):
+        """Статистика кадра image.
+           key — ключ состояния для кэша (None — не кэшировать);
+           dirty — области (x1, y1, x2, y2), измененные на месте с прошлого вызова для этого же
+           массива; None — кадр новый или изменения неизвестны"""
+        if key is not None and key == self._key and self._is_current(image) and not dirty:
+            return self._stats
+        cached = self.cache.get(key) if key is not None else None
+        if cached is not None:
+            # Выборка остается от другого состояния: следующее изменение посчитается целиком
+            self._frame = None
+            self._key = None
+            return cached
+
+        if dirty is not None and self._is_current(image):
+            with profiler.span("stats.update"):
+                for rect in dirty:
+                    self._update_region(image, rect)
+        else:
+            with profiler.span("stats.full"):
+                self._step = sample_step(*image.shape[:2], self.max_samples)
+                # Всегда копия: при шаге 1 срез — сам кадр (только для чтения и меняется на месте)
+                self._sample = np.array(_as_uint8(image[::self._step, ::self._step]), order="C")
+                self._histogram = histograms(self._sample)
+            self._frame = weakref.ref(image)
+
+        self._key = key
+        self._stats = summarize(self._histogram.copy(), self._step)
+        if key is not None:
+            self.cache.put(key, self._stats)
+        return self._stats
+
+    def _update_region(self, image, rect):
+        """Заменяет в выборке и гистограммах отсчеты, попавшие в область rect кадра"""
+        x1, y1, x2, y2 = rect
+        s = self._step
+        # Отсчет выборки (r, c) — это пиксель кадра (r·s, c·s)
+        r1, r2 = -(-y1 // s), -(-y2 // s)
+        c1, c2 = -(-x1 // s), -(-x2 // s)
+        if r1 >= r2 or c1 >= c2:
+            return
+        old = self._sample[r1:r2, c1:c2]
+        new = _as_uint8(image[r1 * s:r2 * s:s, c1 * s:c2 * s:s])
+        self._histogram -= histograms(old)
+        self._histogram += histograms(new)
+        old[...] = new
+
+    def clear(self):
+        self.cache.clear()
+        self._frame = None
+        self._key = None
+        self._stats = None
+        self._sample = None
+        self._histogram = None
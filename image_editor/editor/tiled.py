@@ -0,0 +1,279 @@
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from .cache import LRUCache
+from .image_processor import isolate_channel, CHANNELS
+
+DEFAULT_TILE_SIZE = 512
+DEFAULT_TILE_CACHE = 256 * 1024 * 1024
+
+
+def _read_pnm_header(path):
+    """Разбор заголовка бинарного PGM/PPM (P5/P6, 8 бит). Возвращает (h, w, каналы, смещение)"""
+    with open(path, "rb") as f:
+        head = f.read(512)
+    tokens = []
+    pos = 0
+    while len(tokens) < 4:
+        while pos < len(head) and head[pos:pos + 1].isspace():
+            pos += 1
+        if head[pos:pos + 1] == b"#":
+            pos = head.index(b"\n", pos) + 1
+            continue
+        end = pos
+        while end < len(head) and not head[end:end + 1].isspace():
+            end += 1
+        tokens.append(head[pos:end])
+        pos = end
+    magic, width, height, maxval = tokens[0], int(tokens[1]), int(tokens[2]), int(tokens[3])
+    if magic not in (b"P5", b"P6") or maxval != 255:
+        raise ValueError("Поддерживаются только бинарные 8-битные PGM/PPM")
+    return height, width, 3 if magic == b"P6" else 1, pos + 1
+
+
+class ImageSource:
+    """Источник пикселей: форма, тип и чтение прямоугольной области"""
+
+    def __init__(self, shape, dtype, reader):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._reader = reader
+
+    def read(self, y0, y1, x0, x1):
+        return self._reader(y0, y1, x0, x1)
+
+    @classmethod
+    def from_array(cls, array):
+        return cls(array.shape, array.dtype, lambda y0, y1, x0, x1: array[y0:y1, x0:x1])
+
+    @classmethod
+    def open(cls, path):
+        """Открывает файл как источник.
+           - .npy, .ppm, .pgm читаются лениво через отображение в память
+           - остальные форматы декодируются целиком (ограничение кодеков OpenCV)"""
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".npy":
+            return cls.from_array(np.load(path, mmap_mode="r"))
+
+        if ext in (".ppm", ".pgm", ".pnm"):
+            h, w, channels, offset = _read_pnm_header(path)
+            shape = (h, w, 3) if channels == 3 else (h, w)
+            data = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=shape)
+            if channels == 1:
+                return cls.from_array(data)
+            # В PPM порядок RGB, в остальном редакторе — BGR
+            return cls(shape, np.uint8, lambda y0, y1, x0, x1: data[y0:y1, x0:x1, ::-1])
+
+        image = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise ValueError(f"Не удалось загрузить изображение по пути: {path}")
+        return cls.from_array(image)
+
+
+class TileStore:
+    """Хранилище плиток на numpy.memmap во временном файле.
+       - Плитка копируется из источника при первом обращении
+       - Недавно использованные плитки держатся в памяти в пределах cache_bytes"""
+
+    def __init__(self, source, tile_size=DEFAULT_TILE_SIZE, cache_bytes=DEFAULT_TILE_CACHE, directory=None):
+        self.source = source
+        self.shape = source.shape
+        self.dtype = source.dtype
+        self.tile_size = tile_size
+        self.cache = LRUCache(cache_bytes)
+
+        fd, self.path = tempfile.mkstemp(prefix="image-editor-tiles-", suffix=".raw", dir=directory)
+        os.close(fd)
+        self.data = np.memmap(self.path, dtype=self.dtype, mode="w+", shape=self.shape)
+        tiles_y = -(-self.shape[0] // tile_size)
+        tiles_x = -(-self.shape[1] // tile_size)
+        self.filled = np.zeros((tiles_y, tiles_x), dtype=bool)
+
+    def tile_bounds(self, ty, tx):
+        ts = self.tile_size
+        return ty * ts, min((ty + 1) * ts, self.shape[0]), tx * ts, min((tx + 1) * ts, self.shape[1])
+
+    def tile(self, ty, tx):
+        tile = self.cache.get((ty, tx))
+        if tile is not None:
+            return tile
+
+        y0, y1, x0, x1 = self.tile_bounds(ty, tx)
+        if not self.filled[ty, tx]:
+            self.data[y0:y1, x0:x1] = self.source.read(y0, y1, x0, x1)
+            self.filled[ty, tx] = True
+        tile = np.array(self.data[y0:y1, x0:x1])
+        self.cache.put((ty, tx), tile)
+        return tile
+
+    def read(self, y0, y1, x0, x1):
+        """Собирает область из плиток"""
+        out = np.empty((y1 - y0, x1 - x0) + self.shape[2:], dtype=self.dtype)
+        ts = self.tile_size
+        for ty in range(y0 // ts, -(-y1 // ts)):
+            for tx in range(x0 // ts, -(-x1 // ts)):
+                ty0, ty1, tx0, tx1 = self.tile_bounds(ty, tx)
+                sy0, sy1 = max(y0, ty0), min(y1, ty1)
+                sx0, sx1 = max(x0, tx0), min(x1, tx1)
+                out[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0] = self.tile(ty, tx)[sy0 - ty0:sy1 - ty0, sx0 - tx0:sx1 - tx0]
+        return out
+
+    def close(self):
+        self.cache.clear()
+        del self.data
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class TiledImage:
+    """Изображение, обрабатываемое по плиткам.
+       Операции возвращают ленивые представления: пиксели вычисляются
+       только при чтении областей, поэтому пиковая память ограничена
+       размером кэша плиток и одной полосы, а не размерами изображения."""
+
+    def __init__(self, shape, dtype, reader, tile_size=DEFAULT_TILE_SIZE, store=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.tile_size = tile_size
+        self.store = store
+        self._reader = reader
+
+    @classmethod
+    def open(cls, path, tile_size=DEFAULT_TILE_SIZE, cache_bytes=DEFAULT_TILE_CACHE, directory=None):
+        return cls.from_source(ImageSource.open(path), tile_size, cache_bytes, directory)
+
+    @classmethod
+    def from_array(cls, array, tile_size=DEFAULT_TILE_SIZE, cache_bytes=DEFAULT_TILE_CACHE, directory=None):
+        return cls.from_source(ImageSource.from_array(array), tile_size, cache_bytes, directory)
+
+    @classmethod
+    def from_source(cls, source, tile_size=DEFAULT_TILE_SIZE, cache_bytes=DEFAULT_TILE_CACHE, directory=None):
+        store = TileStore(source, tile_size, cache_bytes, directory)
+        return cls(store.shape, store.dtype, store.read, tile_size, store)
+
+    @property
+    def width(self):
+        return self.shape[1]
+
+    @property
+    def height(self):
+        return self.shape[0]
+
+    def _derive(self, shape, reader):
+        return TiledImage(shape, self.dtype, reader, self.tile_size, self.store)
+
+    def read(self, y0, y1, x0, x1):
+        return self._reader(y0, y1, x0, x1)
+
+    def strips(self):
+        """Полосы строк высотой в одну плитку: (y0, y1)"""
+        for y0 in range(0, self.height, self.tile_size):
+            yield y0, min(y0 + self.tile_size, self.height)
+
+    def to_array(self):
+        """Полная материализация (только для изображений, помещающихся в память)"""
+        return self.read(0, self.height, 0, self.width)
+
+    def crop(self, x1, y1, x2, y2):
+        """Обрезка без чтения пикселей"""
+        x1, y1, x2, y2 = map(int, [x1, y1, x2, y2])
+        if x1 < 0 or y1 < 0:
+            raise ValueError("Координаты не могут быть отрицательными")
+        if x1 >= x2 or y1 >= y2:
+            raise ValueError("Некорректные координаты: x2 должно быть > x1, y2 > y1")
+        if x2 > self.width or y2 > self.height:
+            raise ValueError(f"Координаты выходят за границы изображения ({self.width}x{self.height})")
+
+        parent = self.read
+        return self._derive(
+            (y2 - y1, x2 - x1) + self.shape[2:],
+            lambda a0, a1, b0, b1: parent(a0 + y1, a1 + y1, b0 + x1, b1 + x1),
+        )
+
+    def show_channel(self, channel):
+        """Выделение цветового канала по областям"""
+        if channel not in CHANNELS:
+            raise ValueError(f"Неизвестный канал: {channel}")
+        if channel == "Оригинал":
+            return self
+        if len(self.shape) != 3:
+            raise ValueError("Выбор канала доступен только для цветных изображений")
+
+        parent = self.read
+        return self._derive(self.shape, lambda *region: isolate_channel(parent(*region), channel))
+
+    def _blocks(self, y0, y1, x0, x1):
+        """Делит область на блоки не больше плитки: (y0, y1, x0, x1)"""
+        ts = self.tile_size
+        for by in range(y0, y1, ts):
+            for bx in range(x0, x1, ts):
+                yield by, min(by + ts, y1), bx, min(bx + ts, x1)
+
+    def rotate(self, angle):
+        """Поворот вокруг центра с сохранением размеров (как rotate_image).
+           Запрошенная область считается блоками размером с плитку: каждый блок
+           читает из исходника только ограничивающий прямоугольник своего прообраза,
+           поэтому полоса во всю ширину не тянет за собой почти весь исходник."""
+        h, w = self.height, self.width
+        M = cv2.getRotationMatrix2D((w // 2, h // 2), float(angle), 1.0)
+        inverse = cv2.invertAffineTransform(M)
+        parent = self.read
+
+        def block(y0, y1, x0, x1):
+            corners = np.array([[x0, y0, 1], [x1, y0, 1], [x0, y1, 1], [x1, y1, 1]], dtype=np.float64)
+            src = corners @ inverse.T
+            sx0 = max(int(np.floor(src[:, 0].min())) - 2, 0)
+            sy0 = max(int(np.floor(src[:, 1].min())) - 2, 0)
+            sx1 = min(int(np.ceil(src[:, 0].max())) + 3, w)
+            sy1 = min(int(np.ceil(src[:, 1].max())) + 3, h)
+            if sx0 >= sx1 or sy0 >= sy1:
+                return None
+
+            region = parent(sy0, sy1, sx0, sx1)
+            # Обратное отображение: выходной блок -> локальные координаты области
+            local = inverse.copy()
+            local[:, 2] += inverse[:, 0] * x0 + inverse[:, 1] * y0 - (sx0, sy0)
+            return cv2.warpAffine(region, local, (x1 - x0, y1 - y0),
+                                  flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP)
+
+        def reader(y0, y1, x0, x1):
+            out = np.zeros((y1 - y0, x1 - x0) + self.shape[2:], dtype=self.dtype)
+            for by0, by1, bx0, bx1 in self._blocks(y0, y1, x0, x1):
+                result = block(by0, by1, bx0, bx1)
+                if result is not None:
+                    out[by0 - y0:by1 - y0, bx0 - x0:bx1 - x0] = result
+            return out
+
+        return self._derive(self.shape, reader)
+
+    def save(self, file_path):
+        """Сохранение полосами.
+           - .npy, .ppm, .pgm записываются потоково, без сборки изображения в памяти
+           - остальные форматы требуют полной материализации (ограничение cv2.imwrite)"""
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext == ".npy":
+            out = np.lib.format.open_memmap(file_path, mode="w+", dtype=self.dtype, shape=self.shape)
+            for y0, y1 in self.strips():
+                out[y0:y1] = self.read(y0, y1, 0, self.width)
+                out.flush()
+            del out
+        elif ext in (".ppm", ".pgm", ".pnm"):
+            if self.dtype != np.uint8:
+                raise ValueError("PGM/PPM поддерживает только 8-битные изображения")
+            color = len(self.shape) == 3
+            with open(file_path, "wb") as f:
+                f.write(b"P6" if color else b"P5")
+                f.write(f"\n{self.width} {self.height}\n255\n".encode("ascii"))
+                for y0, y1 in self.strips():
+                    strip = self.read(y0, y1, 0, self.width)
+                    f.write(np.ascontiguousarray(strip[..., ::-1] if color else strip).tobytes())
+        elif not cv2.imwrite(file_path, self.to_array()):
+            raise RuntimeError("Ошибка при сохранении файла")
+        return True
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
@@ -0,0 +1,133 @@
+import os
+import tkinter as tk
+from tkinter import ttk
+from PIL import Image, ImageTk
+
+from ..render import to_rgb
+from ..session import THUMB_SIZE
+
+SLOT_PADDING = 6
+SLOT_WIDTH = THUMB_SIZE + 2 * SLOT_PADDING
+STRIP_HEIGHT = THUMB_SIZE + 2 * SLOT_PADDING + 16
+# Сколько миниатюр за краем видимой области держать как PhotoImage
+VISIBLE_MARGIN = 4
+
+
+class Filmstrip(ttk.Frame):
+    """Горизонтальная лента миниатюр.
+       - Для всех файлов рисуются только рамки и подписи
+       - PhotoImage создаются лишь для видимых миниатюр (и небольшого запаса)
+       - При прокрутке сообщает видимые пути, чтобы их миниатюры готовились первыми"""
+
+    def __init__(self, parent, on_select=None, on_visible=None):
+        super().__init__(parent)
+        self.on_select = on_select
+        self.on_visible = on_visible
+        self.canvas = tk.Canvas(self, height=STRIP_HEIGHT, bg='#303030', highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self._on_scroll)
+        self.canvas.configure(xscrollcommand=self._on_xscroll)
+        self.canvas.pack(side=tk.TOP, fill=tk.X)
+        self.scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+
+        self.paths = []
+        self._index = {}
+        self.thumbs = {}
+        self._photos = {}
+        self._selected = None
+        self._visible = (0, 0)
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Configure>", lambda _: self._refresh_visible())
+        self.canvas.bind("<MouseWheel>", lambda e: self._on_scroll(tk.SCROLL, -1 if e.delta > 0 else 1, tk.UNITS))
+        self.canvas.bind("<Button-4>", lambda _: self._on_scroll(tk.SCROLL, -1, tk.UNITS))
+        self.canvas.bind("<Button-5>", lambda _: self._on_scroll(tk.SCROLL, 1, tk.UNITS))
+
+    def set_paths(self, paths):
+        """Заполняет ленту рамками для всех файлов (без миниатюр)"""
+        self.paths = list(paths)
+        self._index = {path: i for i, path in enumerate(self.paths)}
+        self.thumbs.clear()
+        self._photos.clear()
+        self._selected = None
+        self._visible = (0, 0)
+        self.canvas.delete("all")
+        for i, path in enumerate(self.paths):
+            x = i * SLOT_WIDTH + SLOT_PADDING
+            self.canvas.create_rectangle(x, SLOT_PADDING, x + THUMB_SIZE, SLOT_PADDING + THUMB_SIZE,
+                                         outline='#606060', tags=("frame", f"frame{i}"))
+            self.canvas.create_text(x + THUMB_SIZE // 2, STRIP_HEIGHT - 8, text=os.path.basename(path)[:14],
+                                    fill='#d0d0d0', font=("TkDefaultFont", 7))
+        self.canvas.configure(scrollregion=(0, 0, len(self.paths) * SLOT_WIDTH, STRIP_HEIGHT))
+        self.canvas.xview_moveto(0)
+        self._refresh_visible()
+
+    def set_thumbnail(self, path, thumb):
+        """Принимает готовую миниатюру; на холсте показывается, только если она видима"""
+        i = self._index.get(path)
+        if thumb is None or i is None:
+            return
+        self.thumbs[path] = thumb
+        if self._visible[0] <= i < self._visible[1]:
+            self._show(i)
+
+    def select(self, path):
+        if self._selected is not None:
+            self.canvas.itemconfigure(f"frame{self._selected}", outline='#606060', width=1)
+        self._selected = self._index.get(path)
+        if self._selected is not None:
+            self.canvas.itemconfigure(f"frame{self._selected}", outline='#4a90e2', width=3)
+            self._scroll_into_view(self._selected)
+
+    def visible_paths(self):
+        first, last = self._visible
+        return self.paths[first:last]
+
+    def _scroll_into_view(self, i):
+        total = len(self.paths) * SLOT_WIDTH
+        left, right = (fraction * total for fraction in self.canvas.xview())
+        x = i * SLOT_WIDTH
+        if x < left or x + SLOT_WIDTH > right:
+            self.canvas.xview_moveto(max(0.0, (x - (right - left) / 2) / total))
+
+    def _show(self, i):
+        path = self.paths[i]
+        if path in self._photos:
+            return
+        photo = ImageTk.PhotoImage(Image.fromarray(to_rgb(self.thumbs[path])))
+        self._photos[path] = photo
+        cx = i * SLOT_WIDTH + SLOT_PADDING + THUMB_SIZE // 2
+        self.canvas.create_image(cx, SLOT_PADDING + THUMB_SIZE // 2, image=photo, tags=("thumb", f"thumb{i}"))
+        self.canvas.tag_raise("frame")
+
+    def _refresh_visible(self):
+        """Пересчитывает видимый диапазон, создает/освобождает PhotoImage"""
+        if not self.paths:
+            return
+        total = len(self.paths) * SLOT_WIDTH
+        left, right = self.canvas.xview()
+        first = max(0, int(left * total) // SLOT_WIDTH - VISIBLE_MARGIN)
+        last = min(len(self.paths), int(right * total) // SLOT_WIDTH + 1 + VISIBLE_MARGIN)
+        if (first, last) == self._visible:
+            return
+        self._visible = (first, last)
+
+        keep = set(self.paths[first:last])
+        for path in [p for p in self._photos if p not in keep]:
+            del self._photos[path]
+            self.canvas.delete(f"thumb{self._index[path]}")
+        for i in range(first, last):
+            if self.paths[i] in self.thumbs:
+                self._show(i)
+        if self.on_visible:
+            self.on_visible(self.paths[first:last])
+
+    def _on_scroll(self, *args):
+        self.canvas.xview(*args)
+
+    def _on_xscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self._refresh_visible()
+
+    def _on_click(self, event):
+        i = int(self.canvas.canvasx(event.x)) // SLOT_WIDTH
+        if 0 <= i < len(self.paths) and self.on_select:
+            self.on_select(self.paths[i])
@@ -0,0 +1,65 @@
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+
+HIST_WIDTH = 256
+HIST_HEIGHT = 120
+CHANNEL_COLORS = {
+    "Красный": "#e04040",
+    "Зеленый": "#30a030",
+    "Синий": "#4070e0",
+    "Яркость": "#606060",
+    "Альфа": "#a0a0a0",
+}
+
+
+class HistogramPanel(ttk.LabelFrame):
+    """Гистограммы каналов и сводка по ним.
+       - Каналы рисуются ломаными поверх друг друга (красный, зеленый, синий)
+       - Высота нормируется без крайних значений 0 и 255, иначе пик пересвета
+         или недосвета сплющивает остальную гистограмму
+       - Под графиком: минимум, максимум, среднее и доли недосвета/пересвета"""
+
+    def __init__(self, parent):
+        super().__init__(parent, text="Гистограмма", padding=10)
+        self.canvas = tk.Canvas(self, width=HIST_WIDTH, height=HIST_HEIGHT, bg='#202020', highlightthickness=0)
+        self.canvas.pack(fill=tk.X)
+        self.log_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self, text="Логарифмическая шкала", variable=self.log_var,
+                        command=self._draw).pack(anchor=tk.W, pady=2)
+        self.summary_label = ttk.Label(self, font=("TkFixedFont", 8), justify=tk.LEFT)
+        self.summary_label.pack(anchor=tk.W)
+        self.stats = None
+
+    def show(self, stats):
+        """Отображает stats.ImageStats"""
+        self.stats = stats
+        self._draw()
+
+    def _draw(self):
+        self.canvas.delete("all")
+        stats = self.stats
+        if stats is None:
+            self.summary_label.config(text="")
+            return
+
+        values = stats.histogram.astype(np.float64)
+        if self.log_var.get():
+            values = np.log1p(values)
+        top = values[:, 1:255].max() or values.max() or 1.0
+        heights = HIST_HEIGHT - np.minimum(values / top, 1.0) * (HIST_HEIGHT - 2)
+        xs = np.arange(256) * (HIST_WIDTH / 256.0)
+
+        lines = []
+        # Порядок показа обратен порядку хранения BGR: красный, зеленый, синий
+        for i in reversed(range(len(stats.channels))):
+            name = stats.channels[i]
+            points = np.column_stack([xs, heights[i]]).ravel().tolist()
+            self.canvas.create_line(points, fill=CHANNEL_COLORS.get(name, "#c0c0c0"))
+            lines.append(f"{name[:3]:3s} {int(stats.min[i]):3d}..{int(stats.max[i]):3d}  "
+                         f"ср {stats.mean[i]:6.1f}  "
+                         f"тени {100 * stats.clipped_low[i]:5.2f}%  света {100 * stats.clipped_high[i]:5.2f}%")
+        if stats.step > 1:
+            lines.append(f"выборка: каждый {stats.step}-й пиксель, {stats.count} отсчетов")
+        self.summary_label.config(text="\n".join(lines))
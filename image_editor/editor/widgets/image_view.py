@@ -1,7 +1,16 @@
+import weakref
 import tkinter as tk
 from tkinter import ttk
-import cv2
-from PIL import Image, ImageTk
+
+from ..cache import LRUCache
+from ..instrumentation import instrumented, profiler
+
+PHOTO_BUDGET = 64 * 1024 * 1024
+
+
+def _photo_nbytes(entry):
+    photo = entry[1]
+    return photo.width() * photo.height() * 3
 
 
 class ImageView(ttk.Frame):
@@ -10,38 +19,68 @@ class ImageView(ttk.Frame):
         self.canvas = tk.Canvas(self, bg='white')
         self.canvas.pack(fill=tk.BOTH, expand=True)
         self.image_tk = None
+        self.cv_image = None
+        # Создается при первом показе: render тянет OpenCV, а PIL нужен только для PhotoImage
+        self.renderer = None
+        self._photos = LRUCache(PHOTO_BUDGET, size_of=_photo_nbytes)
+        self._canvas_size = (0, 0)
+        self._redraw_pending = False
+        self.canvas.bind("<Configure>", self._on_configure)
 
-    def display_image(self, cv_image):
+    @instrumented()
+    def display_image(self, cv_image, dirty=None):
         """- Отображает OpenCV изображение на холсте
            - Автоматически масштабирует под размер окна
            - Сохраняет пропорции изображения
-           - Центрирует изображение на холсте"""
+           - Центрирует изображение на холсте
+           - dirty — области, измененные на месте с прошлого показа (слой аннотаций)"""
         if cv_image is not None:
-            # Конвертируем из BGR в RGB
-            image = Image.fromarray(cv2.cvtColor(cv_image, cv2.COLOR_BGR2RGB))
-
-            # Масштабируем изображение под размер канваса
-            canvas_width = self.canvas.winfo_width()
-            canvas_height = self.canvas.winfo_height()
-
-            if canvas_width > 1 and canvas_height > 1:
-                img_ratio = image.width / image.height
-                canvas_ratio = canvas_width / canvas_height
-
-                if img_ratio > canvas_ratio:
-                    new_width = canvas_width
-                    new_height = int(canvas_width / img_ratio)
-                else:
-                    new_height = canvas_height
-                    new_width = int(canvas_height * img_ratio)
-
-                image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-            self.image_tk = ImageTk.PhotoImage(image)
-            self.canvas.delete("all")
-            self.canvas.create_image(
-                canvas_width // 2,
-                canvas_height // 2,
-                anchor=tk.CENTER,
-                image=self.image_tk
-            )
\ No newline at end of file
+            if dirty and self.renderer is not None:
+                self.renderer.invalidate(cv_image, dirty)
+            self.cv_image = cv_image
+            self._draw()
+
+    def _photo_for(self, rgb):
+        """PhotoImage для готового RGB-кадра (кэшируется вместе с кадром)"""
+        entry = self._photos.get(id(rgb))
+        if entry is not None and entry[0]() is rgb:
+            return entry[1]
+
+        from PIL import Image, ImageTk
+
+        with profiler.span("ImageTk.PhotoImage"):
+            photo = ImageTk.PhotoImage(Image.fromarray(rgb))
+        self._photos.put(id(rgb), (weakref.ref(rgb), photo))
+        return photo
+
+    def _draw(self):
+        canvas_width = self.canvas.winfo_width()
+        canvas_height = self.canvas.winfo_height()
+        self._canvas_size = (canvas_width, canvas_height)
+
+        if self.renderer is None:
+            from ..render import ViewRenderer
+
+            self.renderer = ViewRenderer()
+        rgb = self.renderer.render(self.cv_image, canvas_width, canvas_height)
+        self.image_tk = self._photo_for(rgb)
+        self.canvas.delete("all")
+        self.canvas.create_image(
+            canvas_width // 2,
+            canvas_height // 2,
+            anchor=tk.CENTER,
+            image=self.image_tk
+        )
+
+    def _on_configure(self, event):
+        """Перерисовка при изменении размера холста (не чаще раза за цикл событий)"""
+        if self.cv_image is None or (event.width, event.height) == self._canvas_size:
+            return
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self._redraw)
+
+    def _redraw(self):
+        self._redraw_pending = False
+        if self.cv_image is not None:
+            self._draw()
@@ -12,7 +12,8 @@ setup(
     long_description=long_description,
     long_description_content_type='text/markdown',
     url='https://github.com/shellie-py/fadeeva_practice2025.git',
-    packages=find_packages(include=['editor', 'editor.*']),
+    package_dir={'': 'image_editor'},
+    packages=find_packages('image_editor', include=['editor', 'editor.*']),
     install_requires=[
         'opencv-python>=4.5.5',
         'Pillow>=9.0.1',
@@ -26,7 +27,7 @@ setup(
     ],
     entry_points={
         'console_scripts': [
-            'image-editor=editor.app:main',
+            'image-editor=editor.cli:main',
         ],
     },
     keywords='image editor opencv tkinter',